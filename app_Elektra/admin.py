@@ -1,22 +1,256 @@
-from django.contrib import admin
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.auth import get_permission_codename
+from django.db import transaction
+from django.template.response import TemplateResponse
+from django.utils import timezone
 from django.utils.html import format_html
 from .models import *
+from .cambios import registrar_guardados_masivos
+from .ajustes import AjusteInvalido, aplicar_ajuste, deshacer_ajuste, validar_ajuste, vista_previa
+from .auditoria import auditar_masivo
+from .borrado import borrar_o_encolar, impacto_borrado
+from .opciones import invalidar_opciones
 
-class ProductoAdmin(admin.ModelAdmin):
+
+# ==================== ACCIONES MASIVAS ====================
+class AjusteMasivoForm(forms.Form):
+    campo = forms.ChoiceField(choices=AjusteMasivo.CAMPOS)
+    modo = forms.ChoiceField(choices=AjusteMasivo.MODOS)
+    valor = forms.DecimalField(
+        max_digits=12, decimal_places=2,
+        help_text='Porcentaje (8 sube 8%, -5 baja 5%) o cantidad a sumar (negativa para restar). '
+                  'El stock nunca queda por debajo de 0.'
+    )
+    descripcion = forms.CharField(max_length=200, required=False)
+
+    def clean(self):
+        datos = super().clean()
+        if not self.errors:
+            try:
+                validar_ajuste(datos['campo'], datos['modo'], datos['valor'])
+            except AjusteInvalido as e:
+                raise forms.ValidationError(str(e))
+        return datos
+
+
+def accion_con_formulario(modeladmin, request, queryset, form_class, titulo, aplicar, previa=None):
+    """
+    Muestra un formulario intermedio para la acción. "Vista previa" muestra
+    previa(queryset, datos) sin modificar nada; "Aplicar" llama
+    aplicar(queryset, datos), que devuelve el mensaje para el usuario.
+    """
+    resumen = None
+    if 'aplicar' in request.POST or 'vista_previa' in request.POST:
+        form = form_class(request.POST)
+        if form.is_valid():
+            if 'aplicar' in request.POST:
+                try:
+                    mensaje = aplicar(queryset, form.cleaned_data)
+                except ValueError as e:
+                    modeladmin.message_user(request, str(e), messages.ERROR)
+                else:
+                    modeladmin.message_user(request, mensaje, messages.SUCCESS)
+                return None
+            resumen = previa(queryset, form.cleaned_data)
+    else:
+        form = form_class()
+
+    return TemplateResponse(request, 'admin/app_Elektra/accion_masiva.html', {
+        **modeladmin.admin_site.each_context(request),
+        'title': titulo,
+        'opts': modeladmin.model._meta,
+        'form': form,
+        'queryset': queryset,
+        'total': queryset.count(),
+        'previa': previa is not None,
+        'resumen': resumen,
+        'accion': request.POST['action'],
+        'seleccion_completa': request.POST.get('select_across', '0'),
+        'action_checkbox_name': admin.helpers.ACTION_CHECKBOX_NAME,
+    })
+
+
+# ==================== BORRADO POR LOTES ====================
+class BorradoPorLotes:
+    """
+    Borrado del admin con borrado.py: la confirmación cuenta los registros
+    afectados con COUNT en lugar de cargarlos y el borrado va por lotes
+    (o al worker si es grande).
+    """
+
+    def get_deleted_objects(self, objs, request):
+        impacto = impacto_borrado(self.model._base_manager.filter(pk__in=[obj.pk for obj in objs]))
+        eliminados = [fila for fila in impacto if fila['accion'] == 'eliminados']
+        # Igual que el admin: solo se exige permiso sobre los modelos registrados
+        permisos_faltantes = {
+            fila['modelo']._meta.verbose_name for fila in eliminados
+            if fila['modelo'] in self.admin_site._registry
+            and not request.user.has_perm(
+                f"{fila['modelo']._meta.app_label}.{get_permission_codename('delete', fila['modelo']._meta)}"
+            )
+        }
+        conteo = {fila['nombre']: fila['cantidad'] for fila in eliminados}
+        return [str(obj) for obj in objs], conteo, permisos_faltantes, []
+
+    def delete_model(self, request, obj):
+        self.delete_queryset(request, self.model._base_manager.filter(pk=obj.pk))
+
+    def delete_queryset(self, request, queryset):
+        _, tarea = borrar_o_encolar(queryset)
+        if tarea:
+            self.message_user(
+                request, f'El borrado es grande y se hará en segundo plano (tarea #{tarea.id})', messages.WARNING
+            )
+
+
+# ==================== PROVEEDORES ====================
+class ProveedorAdmin(BorradoPorLotes, admin.ModelAdmin):
+    list_display = ('nombre', 'pais', 'email', 'telefono', 'activo')
+    list_filter = ('activo', 'pais')
+    search_fields = ('nombre', 'email')
+    show_full_result_count = False
+    actions = ['desactivar_proveedores']
+
+    @admin.action(description='Desactivar proveedores seleccionados')
+    def desactivar_proveedores(self, request, queryset):
+        ids = list(queryset.filter(activo=True).values_list('id', flat=True))
+        with transaction.atomic(), auditar_masivo(Proveedor, ids):
+            actualizados = Proveedor.objects.filter(id__in=ids).update(
+                activo=False, fecha_actualizacion=timezone.now()
+            )
+            registrar_guardados_masivos(Proveedor, ids)
+            transaction.on_commit(lambda: invalidar_opciones(Proveedor))
+        self.message_user(request, f'{actualizados} proveedor(es) desactivado(s)', messages.SUCCESS)
+
+
+# ==================== CATEGORÍAS ====================
+class CategoriaAdmin(BorradoPorLotes, admin.ModelAdmin):
+    list_display = ('nombre', 'color')
+    search_fields = ('nombre',)
+
+
+# ==================== PRODUCTOS ====================
+class ProductoAdmin(BorradoPorLotes, admin.ModelAdmin):
     list_display = ('nombre_producto', 'categoria', 'precio', 'stock', 'mostrar_imagen', 'proveedor')
     list_filter = ('categoria', 'proveedor')
     search_fields = ('nombre_producto', 'sku', 'descripcion')
-    
+    list_select_related = ('categoria', 'proveedor')
+    autocomplete_fields = ('categoria', 'proveedor')
+    show_full_result_count = False
+    actions = ['ajustar_precio_stock']
+
     def mostrar_imagen(self, obj):
         if obj.imagen:
             return format_html('<img src="{}" width="50" height="50" />', obj.imagen.url)
         return "Sin imagen"
     mostrar_imagen.short_description = 'Imagen'
 
+    @admin.action(description='Ajustar precio o stock (con vista previa)')
+    def ajustar_precio_stock(self, request, queryset):
+        def previa(productos, datos):
+            return vista_previa(productos, datos['campo'], datos['modo'], datos['valor'])
+
+        def aplicar(productos, datos):
+            ajuste = aplicar_ajuste(productos, datos['campo'], datos['modo'], datos['valor'],
+                                    datos['descripcion'], request.user.pk)
+            return f'Ajuste aplicado a {ajuste.productos} producto(s); se puede deshacer desde Ajustes masivos'
+
+        # Con "seleccionar todos" el queryset es el filtro de la lista
+        # (categoría, proveedor, búsqueda), no una lista de ids
+        return accion_con_formulario(self, request, queryset, AjusteMasivoForm,
+                                     'Ajustar precio o stock de productos', aplicar, previa)
+
+
+# ==================== VENDEDORES ====================
+class VendedorAdmin(admin.ModelAdmin):
+    list_display = ('nombre', 'email', 'telefono', 'activo')
+    list_filter = ('activo',)
+    search_fields = ('nombre', 'email')
+    show_full_result_count = False
+
+
+# ==================== CLIENTES ====================
+class ClienteAdmin(admin.ModelAdmin):
+    list_display = ('nombre', 'email', 'telefono', 'tipo_cliente')
+    list_filter = ('tipo_cliente',)
+    search_fields = ('nombre', 'email')
+    show_full_result_count = False
+
+
+# ==================== VENTAS ====================
+class VentaAdmin(admin.ModelAdmin):
+    list_display = ('folio', 'fecha_venta', 'producto', 'cliente', 'vendedor', 'total', 'metodo_pago', 'estado')
+    list_filter = ('estado', 'metodo_pago')
+    search_fields = ('folio',)
+    list_select_related = ('producto', 'cliente', 'vendedor')
+    # Con muchos productos/clientes, un <select> con todos sería enorme
+    raw_id_fields = ('producto', 'cliente', 'vendedor')
+    date_hierarchy = 'fecha_venta'
+    show_full_result_count = False
+
+
+# ==================== SUCURSALES ====================
+class SucursalAdmin(BorradoPorLotes, admin.ModelAdmin):
+    list_display = ('codigo', 'nombre', 'activa')
+    list_filter = ('activa',)
+    search_fields = ('codigo', 'nombre')
+
+    def get_readonly_fields(self, request, obj=None):
+        # El código es la llave de la sucursal en SUCURSALES_BASES
+        return ('codigo',) if obj else ()
+
+
+# ==================== AUDITORÍA ====================
+class AuditoriaAdmin(admin.ModelAdmin):
+    """Solo lectura: la bitácora es de solo inserción"""
+    list_display = ('fecha', 'modelo', 'objeto_id', 'operacion', 'usuario_id')
+    list_filter = ('modelo', 'operacion')
+    search_fields = ('=objeto_id',)
+    show_full_result_count = False
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+# ==================== AJUSTES MASIVOS ====================
+class AjusteMasivoAdmin(admin.ModelAdmin):
+    list_display = ('fecha', '__str__', 'descripcion', 'total_antes', 'total_despues', 'fecha_deshecho')
+    list_filter = ('campo', 'modo')
+    actions = ['deshacer_ajustes']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    @admin.action(description='Deshacer ajustes seleccionados')
+    def deshacer_ajustes(self, request, queryset):
+        # Del más reciente al más antiguo, como se aplicaron
+        for ajuste in queryset.order_by('-fecha'):
+            try:
+                revertidos = deshacer_ajuste(ajuste.pk)
+            except AjusteInvalido as e:
+                self.message_user(request, f'{ajuste}: {e}', messages.WARNING)
+            else:
+                self.message_user(request, f'{ajuste}: {revertidos} producto(s) revertido(s)', messages.SUCCESS)
+
+
 # Registrar modelos con configuraciones personalizadas
-admin.site.register(Proveedor)
-admin.site.register(Categoria)
+admin.site.register(Proveedor, ProveedorAdmin)
+admin.site.register(Categoria, CategoriaAdmin)
 admin.site.register(Producto, ProductoAdmin)
-admin.site.register(Vendedor)
-admin.site.register(Cliente)
-admin.site.register(Venta)
\ No newline at end of file
+admin.site.register(Vendedor, VendedorAdmin)
+admin.site.register(Cliente, ClienteAdmin)
+admin.site.register(Venta, VentaAdmin)
+admin.site.register(Sucursal, SucursalAdmin)
+admin.site.register(ReporteGuardado)
+admin.site.register(Auditoria, AuditoriaAdmin)
+admin.site.register(AjusteMasivo, AjusteMasivoAdmin)
@@ -0,0 +1,178 @@
+"""
+Ajustes masivos de precio y stock.
+
+Una selección de productos (cualquier queryset: categoría, proveedor,
+búsqueda) recibe un cambio porcentual o absoluto. La vista previa es un
+solo aggregate; al aplicar, los valores anteriores se copian a
+AjusteMasivoDetalle con un INSERT ... SELECT y el cambio es un solo
+UPDATE sobre los productos de ese detalle, todo en una transacción.
+"""
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import Count, ExpressionWrapper, F, IntegerField, OuterRef, Subquery, Sum
+from django.db.models.functions import Cast, Greatest, Round
+from django.db.models.lookups import LessThanOrEqual
+from django.utils import timezone
+
+from . import auditoria
+from .alertas import recalcular_alertas
+from .cambios import registrar_guardados_masivos
+from .inventario import DINERO, valor_inventario
+from .models import Producto, AjusteMasivo, AjusteMasivoDetalle
+from .precios import registrar_precios
+
+
+class AjusteInvalido(ValueError):
+    """El ajuste dejaría datos inválidos o ya no se puede deshacer"""
+
+
+def validar_ajuste(campo, modo, valor):
+    if campo not in dict(AjusteMasivo.CAMPOS) or modo not in dict(AjusteMasivo.MODOS):
+        raise AjusteInvalido('Campo o modo de ajuste desconocido')
+    if campo == 'precio' and modo == 'porcentaje' and valor <= -100:
+        raise AjusteInvalido('El precio debe seguir siendo mayor a 0')
+    if campo == 'stock' and modo == 'absoluto' and valor != int(valor):
+        raise AjusteInvalido('El ajuste de stock debe ser un número entero de unidades')
+
+
+def valor_nuevo(campo, modo, valor):
+    """Expresión SQL con el valor que tendrá `campo` después del ajuste"""
+    valor = Decimal(valor)
+    if campo == 'precio':
+        if modo == 'porcentaje':
+            return Round(F('precio') * (1 + valor / 100), 2)
+        return F('precio') + valor
+    # El stock nunca queda por debajo de 0
+    if modo == 'porcentaje':
+        escalado = ExpressionWrapper(F('stock') * (1 + valor / 100), output_field=DINERO)
+        return Greatest(Cast(Round(escalado), IntegerField()), 0)
+    return Greatest(F('stock') + int(valor), 0)
+
+
+def vista_previa(productos, campo, modo, valor):
+    """
+    Productos afectados, suma del campo y valor del inventario antes y
+    después, y cuántos precios quedarían en 0 o menos, en un aggregate.
+    """
+    nuevo = valor_nuevo(campo, modo, valor)
+    precio = nuevo if campo == 'precio' else F('precio')
+    stock = nuevo if campo == 'stock' else F('stock')
+    resumen = productos.order_by().aggregate(
+        productos=Count('id'),
+        total_antes=Sum(campo),
+        total_despues=Sum(nuevo),
+        inventario_antes=Sum(valor_inventario()),
+        inventario_despues=Sum(valor_inventario(precio, stock)),
+        invalidos=Count('id', filter=LessThanOrEqual(precio, 0)),
+    )
+    return {clave: valor if valor is not None else 0 for clave, valor in resumen.items()}
+
+
+def _copiar_anteriores(ajuste, productos):
+    """INSERT ... SELECT: los valores anteriores se copian sin pasar por Python"""
+    sql, params = productos.order_by().values_list('pk', ajuste.campo).query.sql_with_params()
+    nombre = connection.ops.quote_name
+    columnas = ', '.join(nombre(columna) for columna in ('ajuste_id', 'producto_id', 'anterior'))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {nombre(AjusteMasivoDetalle._meta.db_table)} ({columnas}) '
+            f'SELECT %s, seleccion.* FROM ({sql}) seleccion',
+            [ajuste.pk, *params]
+        )
+
+
+def _efectos(campo, cambios):
+    """
+    update() no dispara señales: registro de cambios, auditoría, alertas
+    e historial de precios de los productos tocados. `cambios` es
+    [(producto_id, antes, despues)].
+    """
+    ids = [producto_id for producto_id, _, _ in cambios]
+    convertir = int if campo == 'stock' else Decimal
+    registrar_guardados_masivos(Producto, ids)
+    auditoria.registrar_varios(Producto, 'modificado', [
+        (producto_id, {campo: [convertir(antes), convertir(despues)]})
+        for producto_id, antes, despues in cambios if antes != despues
+    ])
+    if campo == 'stock':
+        recalcular_alertas(ids)
+    else:
+        registrar_precios(Producto.objects.filter(
+            id__in=[producto_id for producto_id, antes, despues in cambios if antes != despues]
+        ))
+
+
+def aplicar_ajuste(productos, campo, modo, valor, descripcion='', usuario_id=None):
+    """Aplica el ajuste a los productos del queryset y devuelve el AjusteMasivo"""
+    validar_ajuste(campo, modo, valor)
+    with transaction.atomic():
+        resumen = vista_previa(productos, campo, modo, valor)
+        if resumen['invalidos']:
+            raise AjusteInvalido(f"{resumen['invalidos']} producto(s) quedarían con precio menor o igual a 0")
+
+        ajuste = AjusteMasivo.objects.create(
+            campo=campo,
+            modo=modo,
+            valor=valor,
+            descripcion=descripcion,
+            productos=resumen['productos'],
+            total_antes=resumen['total_antes'],
+            total_despues=resumen['total_despues'],
+            usuario_id=usuario_id
+        )
+        _copiar_anteriores(ajuste, productos)
+
+        detalle = ajuste.detalle.all()
+        Producto.objects.filter(id__in=detalle.values('producto_id')).update(**{
+            campo: valor_nuevo(campo, modo, valor),
+            'fecha_actualizacion': timezone.now(),
+        })
+        # El valor que quedó: para deshacer y para la auditoría
+        detalle.update(nuevo=Subquery(Producto.objects.filter(pk=OuterRef('producto_id')).values(campo)[:1]))
+
+        _efectos(campo, list(detalle.values_list('producto_id', 'anterior', 'nuevo')))
+    return ajuste
+
+
+def deshacer_ajuste(ajuste_id):
+    """
+    Revierte un ajuste con un solo UPDATE. Los precios vuelven al valor
+    anterior solo donde siguen como los dejó el ajuste (un cambio posterior
+    no se pisa); al stock se le resta lo que sumó el ajuste, así las
+    ventas registradas después se respetan. Devuelve cuántos productos
+    se revirtieron.
+    """
+    with transaction.atomic():
+        ajuste = AjusteMasivo.objects.select_for_update().get(pk=ajuste_id)
+        if ajuste.fecha_deshecho:
+            raise AjusteInvalido('Este ajuste ya se deshizo')
+        campo = ajuste.campo
+        detalle = ajuste.detalle.all()
+        ahora = timezone.now()
+
+        if campo == 'precio':
+            vigentes = detalle.filter(producto__precio=F('nuevo'))
+            cambios = list(vigentes.values_list('producto_id', 'nuevo', 'anterior'))
+            Producto.objects.filter(id__in=vigentes.values('producto_id')).update(
+                precio=Subquery(detalle.filter(producto_id=OuterRef('pk')).values('anterior')[:1]),
+                fecha_actualizacion=ahora
+            )
+        else:
+            cambios = [
+                (producto_id, actual, max(actual + int(anterior - nuevo), 0))
+                for producto_id, actual, anterior, nuevo
+                in detalle.values_list('producto_id', 'producto__stock', 'anterior', 'nuevo')
+            ]
+            diferencia = detalle.filter(producto_id=OuterRef('pk')).values(
+                diferencia=Cast(F('anterior') - F('nuevo'), IntegerField())
+            )[:1]
+            Producto.objects.filter(id__in=detalle.values('producto_id')).update(
+                stock=Greatest(F('stock') + Subquery(diferencia), 0),
+                fecha_actualizacion=ahora
+            )
+
+        _efectos(campo, cambios)
+        ajuste.fecha_deshecho = ahora
+        ajuste.save(update_fields=['fecha_deshecho'])
+    return len(cambios)
@@ -0,0 +1,131 @@
+"""
+Motor de alertas de reorden.
+
+El umbral de cada producto es su stock_minimo o, si no lo tiene, el de su
+categoría. La tabla AlertaStock guarda solo los productos por debajo del
+umbral: se actualiza fila por fila al guardar un producto y por conjuntos
+(un DELETE y un INSERT) cuando cambia el umbral de una categoría o después
+de un UPDATE masivo.
+"""
+from django.db import transaction
+from django.db.models import F, Q
+from django.db.models.functions import Coalesce
+
+from .models import Categoria, Producto, Proveedor, AlertaStock
+
+
+def nivel_alerta(stock, umbral):
+    """'agotado', 'bajo' o None si el stock es suficiente"""
+    if stock <= 0:
+        return 'agotado'
+    if stock < umbral:
+        return 'bajo'
+    return None
+
+
+def umbral_producto(producto):
+    if producto.stock_minimo is not None:
+        return producto.stock_minimo
+    return Categoria.objects.values_list('stock_minimo', flat=True).get(pk=producto.categoria_id)
+
+
+def evaluar_producto(producto):
+    """
+    Actualiza la alerta de un solo producto tras guardarlo. Devuelve el
+    umbral aplicado para que quien llama pueda publicarlo.
+    """
+    umbral = umbral_producto(producto)
+    nivel = nivel_alerta(producto.stock, umbral)
+    if nivel is None:
+        AlertaStock.objects.filter(producto_id=producto.pk).delete()
+    else:
+        AlertaStock.objects.update_or_create(
+            producto_id=producto.pk,
+            defaults={
+                'proveedor_id': producto.proveedor_id,
+                'stock': producto.stock,
+                'umbral': umbral,
+                'nivel': nivel,
+            }
+        )
+    return umbral
+
+
+def con_umbral(productos):
+    """Anota `umbral` (stock mínimo efectivo) en un queryset de productos"""
+    return productos.annotate(umbral=Coalesce('stock_minimo', 'categoria__stock_minimo'))
+
+
+def recalcular_alertas(productos=None):
+    """
+    Reconstruye las alertas de un conjunto de productos (todos si es None)
+    con una sola consulta de los que están bajo su umbral. Devuelve
+    cuántas alertas quedaron activas en ese conjunto.
+    """
+    if productos is None:
+        productos = Producto.objects.all()
+    elif not hasattr(productos, 'model'):
+        productos = Producto.objects.filter(pk__in=list(productos))
+
+    bajo_umbral = (
+        con_umbral(productos)
+        .filter(Q(stock__lte=0) | Q(stock__lt=F('umbral')))
+        .values_list('id', 'proveedor_id', 'stock', 'umbral')
+    )
+
+    with transaction.atomic():
+        AlertaStock.objects.filter(producto__in=productos.values('pk')).delete()
+        alertas = AlertaStock.objects.bulk_create(
+            [
+                AlertaStock(
+                    producto_id=producto_id,
+                    proveedor_id=proveedor_id,
+                    stock=stock,
+                    umbral=umbral,
+                    nivel=nivel_alerta(stock, umbral)
+                )
+                for producto_id, proveedor_id, stock, umbral in bajo_umbral.iterator(chunk_size=2000)
+            ],
+            batch_size=500
+        )
+    return len(alertas)
+
+
+def resumen_alertas():
+    """Contadores del dashboard leídos de la tabla de alertas"""
+    return {
+        'productos_bajo_stock': AlertaStock.objects.count(),
+        'productos_sin_stock': AlertaStock.objects.filter(nivel='agotado').count(),
+    }
+
+
+def sugerencias_compra():
+    """
+    Alertas agrupadas por proveedor como sugerencias de compra, con las
+    unidades a pedir para volver al doble del stock mínimo.
+    """
+    alertas = (
+        AlertaStock.objects.select_related('producto', 'producto__pronostico')
+        .order_by('proveedor_id', 'stock')
+    )
+    proveedores = Proveedor.objects.in_bulk(
+        AlertaStock.objects.values_list('proveedor_id', flat=True).distinct()
+    )
+
+    sugerencias = {}
+    for alerta in alertas:
+        grupo = sugerencias.setdefault(alerta.proveedor_id, {
+            'proveedor': proveedores.get(alerta.proveedor_id),
+            'alertas': [],
+            'agotados': 0,
+            'unidades': 0,
+            'valor_estimado': 0,
+        })
+        alerta.valor_estimado = alerta.cantidad_sugerida * alerta.producto.precio
+        grupo['alertas'].append(alerta)
+        grupo['agotados'] += alerta.nivel == 'agotado'
+        grupo['unidades'] += alerta.cantidad_sugerida
+        grupo['valor_estimado'] += alerta.valor_estimado
+
+    # Primero los proveedores con más productos agotados
+    return sorted(sugerencias.values(), key=lambda g: (-g['agotados'], -len(g['alertas'])))
@@ -3,3 +3,12 @@ from django.apps import AppConfig
 
 class AppElektraConfig(AppConfig):
     name = 'app_Elektra'
+
+    def ready(self):
+        # Conectar las señales del registro de cambios
+        from . import signals  # noqa: F401
+        # Revisiones de despliegue (manage.py check --deploy)
+        from . import checks  # noqa: F401
+        # Caché de consultas por petición (middleware_cache_consultas)
+        from . import cache_consultas
+        cache_consultas.instalar()
@@ -0,0 +1,66 @@
+"""
+Archivo de ventas antiguas en una partición fría (VentaArchivada).
+
+Las ventas cerradas con fecha anterior al horizonte se mueven por lotes:
+cada lote copia las filas con bulk_create y las borra de Venta en su
+propia transacción corta, así los bloqueos de escritura duran lo que un
+lote y no lo que todo el archivo. Las ventas pendientes nunca se archivan.
+
+Para los clientes que sincronizan por cursor una venta archivada deja de
+existir: cada lote deja su entrada 'borrado' en el registro de cambios,
+con datos {'archivada': True}. Los reportes siguen leyéndola del archivo,
+así que esas entradas no vuelven obsoletos los snapshots.
+"""
+import time as reloj
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .cambios import registrar_borrados_masivos
+from .models import Venta, VentaArchivada
+
+ESTADOS_CERRADOS = ['completada', 'cancelada']
+
+# Datos de la entrada 'borrado' de una venta que pasó al archivo
+ARCHIVADA = {'archivada': True}
+
+CAMPOS = [campo.attname for campo in Venta._meta.concrete_fields]
+
+
+def corte_archivo(dias=None):
+    """Medianoche local de hace `dias` días (ARCHIVO_VENTAS_DIAS por defecto)"""
+    dias = settings.ARCHIVO_VENTAS_DIAS if dias is None else dias
+    dia = timezone.localdate() - timedelta(days=dias)
+    return timezone.make_aware(datetime.combine(dia, time.min))
+
+
+def por_archivar(antes_de):
+    return Venta.objects.filter(fecha_venta__lt=antes_de, estado__in=ESTADOS_CERRADOS)
+
+
+def archivar_ventas(antes_de, tamano_lote=1000, pausa=0):
+    """
+    Mueve a VentaArchivada las ventas cerradas anteriores a `antes_de`, de
+    la más antigua a la más nueva. `pausa` (segundos) deja pasar a otros
+    escritores entre lotes. Devuelve cuántas ventas se movieron.
+    """
+    movidas = 0
+    while True:
+        with transaction.atomic():
+            filas = list(por_archivar(antes_de).order_by('fecha_venta', 'id').values(*CAMPOS)[:tamano_lote])
+            if not filas:
+                break
+            ahora = timezone.now()
+            VentaArchivada.objects.bulk_create([VentaArchivada(**fila, fecha_archivado=ahora) for fila in filas])
+            # Borrado directo, sin señales: la venta no se eliminó, solo cambió
+            # de partición, así que no invalida tablas de vendedores. El
+            # registro de cambios sí recibe la baja, marcada como archivada
+            ids = [fila['id'] for fila in filas]
+            Venta.objects.filter(id__in=ids)._raw_delete(Venta.objects.db)
+            registrar_borrados_masivos(Venta, ids, ARCHIVADA)
+        movidas += len(filas)
+        if pausa:
+            reloj.sleep(pausa)
+    return movidas
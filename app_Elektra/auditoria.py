@@ -0,0 +1,248 @@
+"""
+Auditoría campo por campo de los modelos sincronizados.
+
+Cada cambio se convierte en una entrada de Auditoria que espera a que su
+transacción confirme (si se revierte, la entrada se descarta). Las entradas
+de una misma transacción se juntan en un lote con un solo callback de
+on_commit que las escribe con un INSERT (executemany) al confirmar, igual
+en una petición que en un comando o una tarea. Las que se registraron
+dentro de un savepoint que se revirtió no se escriben. Fuera de una
+transacción cada registro se escribe al momento.
+
+La petición solo aporta el usuario de las entradas (usuario_auditoria).
+"""
+import weakref
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction
+from django.db import connections, transaction
+from django.utils import timezone
+from django.utils.decorators import sync_and_async_middleware
+
+from .cambios import NOMBRES_MODELOS, serializar_objeto
+from .models import Auditoria, JSONCompacto
+
+# Las fechas automáticas solo agregarían ruido (la entrada tiene su propia
+# fecha) y el id ya va en objeto_id
+CAMPOS_IGNORADOS = {'id', 'fecha_creacion', 'fecha_actualizacion'}
+
+# Orden de las columnas en el INSERT de escribir()
+COLUMNAS = ('modelo', 'objeto_id', 'operacion', 'cambios', 'usuario_id', 'fecha')
+
+# El benchmark la apaga para medir el costo de la auditoría
+ACTIVA = True
+
+_usuario = ContextVar('usuario_auditoria', default=None)
+# {alias: weakref al lote pendiente de la transacción abierta}
+_pendientes = ContextVar('auditoria_pendiente', default=None)
+# {(modelo, alias): (sql, [(attname, columna, convertidores)])}
+_lecturas = {}
+
+
+def valores(instancia, campos=None):
+    """Valores a auditar de una instancia, sin vacíos ni campos ignorados"""
+    datos = serializar_objeto(instancia)
+    return {
+        campo: valor for campo, valor in datos.items()
+        if campo not in CAMPOS_IGNORADOS and valor not in (None, '') and (campos is None or campo in campos)
+    }
+
+
+def valores_guardados(modelo, pk):
+    """
+    Valores de la fila en la base como los daría values(), o {} si no
+    existe. El SELECT por llave primaria se arma una vez por modelo: en el
+    pre_save de cada guardado solo se ejecuta.
+    """
+    alias = modelo.objects.db
+    conexion = connections[alias]
+    lectura = _lecturas.get((modelo, alias))
+    if lectura is None:
+        nombre = conexion.ops.quote_name
+        campos = modelo._meta.concrete_fields
+        sql = 'SELECT {} FROM {} WHERE {} = %s'.format(
+            ', '.join(nombre(campo.column) for campo in campos),
+            nombre(modelo._meta.db_table),
+            nombre(modelo._meta.pk.column),
+        )
+        columnas = []
+        for campo in campos:
+            columna = campo.get_col(modelo._meta.db_table)
+            columnas.append((campo.attname, columna,
+                             conexion.ops.get_db_converters(columna) + columna.get_db_converters(conexion)))
+        lectura = _lecturas[(modelo, alias)] = (sql, columnas)
+
+    sql, columnas = lectura
+    with conexion.cursor() as cursor:
+        cursor.execute(sql, [modelo._meta.pk.get_db_prep_value(pk, conexion)])
+        fila = cursor.fetchone()
+    if fila is None:
+        return {}
+    datos = {}
+    for valor, (attname, columna, convertidores) in zip(fila, columnas):
+        for convertidor in convertidores:
+            valor = convertidor(valor, columna, conexion)
+        datos[attname] = valor
+    return datos
+
+
+def diferencias(antes, despues):
+    return {
+        campo: [antes.get(campo), valor]
+        for campo, valor in despues.items()
+        if campo not in CAMPOS_IGNORADOS and antes.get(campo) != valor
+    }
+
+
+def registrar(modelo, objeto_id, operacion, cambios):
+    """Agrega una entrada que se escribe solo si la transacción actual confirma"""
+    registrar_varios(modelo, operacion, [(objeto_id, cambios)])
+
+
+def registrar_varios(modelo, operacion, cambios):
+    """
+    Igual que registrar() para una lista [(objeto_id, cambios)]; es lo que
+    usan las rutas masivas.
+    """
+    if not ACTIVA or not cambios:
+        return
+    nombre = NOMBRES_MODELOS[modelo]
+    fecha = timezone.now()
+    # Tuplas y no instancias: el modelo se construye una vez, al escribir
+    entradas = [(nombre, objeto_id, operacion, datos, fecha) for objeto_id, datos in cambios]
+    alias = Auditoria.objects.db
+    if not transaction.get_connection(alias).in_atomic_block:
+        escribir(entradas, _usuario.get())
+        return
+    _lote_pendiente(alias).agregar(entradas)
+
+
+class _Marca:
+    """Callback vacío de on_commit: Django lo suelta si su savepoint se revierte"""
+    __slots__ = ('__weakref__',)
+
+    def __call__(self):
+        pass
+
+
+class _Lote:
+    """
+    Entradas de una transacción que esperan su commit. Es el único callback
+    que escribe; cada grupo de entradas lleva además una _Marca encolada
+    en el savepoint donde se registró. Las marcas se encolan después del
+    lote, así que al escribir siguen vivas las de los savepoints que
+    confirmaron y las de los revertidos ya se liberaron.
+    """
+
+    def __init__(self, alias, usuario_id):
+        self.alias = alias
+        self.usuario_id = usuario_id
+        self.grupos = []
+        self.escrito = False
+
+    def agregar(self, entradas):
+        marca = _Marca()
+        transaction.on_commit(marca, using=self.alias)
+        self.grupos.append((weakref.ref(marca), entradas))
+
+    def __call__(self):
+        self.escrito = True
+        escribir(
+            [entrada for marca, entradas in self.grupos if marca() is not None for entrada in entradas],
+            self.usuario_id
+        )
+
+
+def _lote_pendiente(alias):
+    """
+    El lote de la transacción abierta en `alias`. Se guarda solo una
+    referencia débil: si la transacción (o el savepoint donde se abrió el
+    lote) se revierte, Django suelta el callback, el lote se libera y la
+    siguiente entrada abre otro.
+    """
+    pendientes = _pendientes.get()
+    if pendientes is None:
+        pendientes = {}
+        _pendientes.set(pendientes)
+    referencia = pendientes.get(alias)
+    lote = referencia() if referencia is not None else None
+    if lote is None or lote.escrito:
+        lote = _Lote(alias, _usuario.get())
+        transaction.on_commit(lote, using=alias)
+        pendientes[alias] = weakref.ref(lote)
+    return lote
+
+
+def escribir(entradas, usuario_id=None):
+    """
+    Un INSERT con executemany: armar una instancia y preparar campo por
+    campo cada entrada costaba varias veces más que el INSERT mismo.
+    """
+    if not entradas:
+        return
+    conexion = connections[Auditoria.objects.db]
+    nombre = conexion.ops.quote_name
+    columnas = [Auditoria._meta.get_field(campo).column for campo in COLUMNAS]
+    sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+        nombre(Auditoria._meta.db_table),
+        ', '.join(nombre(columna) for columna in columnas),
+        ', '.join(['%s'] * len(columnas)),
+    )
+    codificador = JSONCompacto()
+    # Las entradas de un mismo registrar_varios comparten la fecha
+    fechas = {}
+    filas = []
+    for modelo, objeto_id, operacion, cambios, fecha in entradas:
+        if fecha not in fechas:
+            fechas[fecha] = conexion.ops.adapt_datetimefield_value(fecha)
+        filas.append((modelo, objeto_id, operacion, codificador.encode(cambios), usuario_id, fechas[fecha]))
+    with conexion.cursor() as cursor:
+        cursor.executemany(sql, filas)
+
+
+@contextmanager
+def usuario_auditoria(request):
+    """Las entradas registradas dentro del bloque llevan el usuario de la petición"""
+    usuario = getattr(request, 'user', None)
+    token = _usuario.set(usuario.pk if usuario is not None and usuario.is_authenticated else None)
+    try:
+        yield
+    finally:
+        _usuario.reset(token)
+
+
+@contextmanager
+def auditar_masivo(modelo, ids, tamano_lote=500):
+    """
+    Para queryset.update(), que no dispara señales: lee las filas antes y
+    después del bloque y registra las diferencias.
+    """
+    campos = [campo.attname for campo in modelo._meta.concrete_fields]
+    llave = modelo._meta.pk.attname
+    antes = {}
+    for inicio in range(0, len(ids), tamano_lote):
+        for fila in modelo.objects.filter(pk__in=ids[inicio:inicio + tamano_lote]).values(*campos):
+            antes[fila[llave]] = fila
+    yield
+    modificados = []
+    for inicio in range(0, len(ids), tamano_lote):
+        for fila in modelo.objects.filter(pk__in=ids[inicio:inicio + tamano_lote]).values(*campos):
+            cambios = diferencias(antes.get(fila[llave], {}), fila)
+            if cambios:
+                modificados.append((fila[llave], cambios))
+    registrar_varios(modelo, 'modificado', modificados)
+
+
+@sync_and_async_middleware
+def middleware_auditoria(get_response):
+    """Asocia las entradas de la petición a su usuario"""
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            # Las vistas asíncronas (eventos en vivo) solo leen
+            return await get_response(request)
+    else:
+        def middleware(request):
+            with usuario_auditoria(request):
+                return get_response(request)
+    return middleware
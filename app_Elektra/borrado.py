@@ -0,0 +1,157 @@
+"""
+Borrado en cascada por lotes, con vista previa del impacto.
+
+Producto cuelga de Proveedor y Categoria con CASCADE, y de Producto
+cuelgan las ventas (vigentes y archivadas), alertas y pronósticos: borrar
+un proveedor puede arrastrar miles de filas. El Collector de Django las
+carga todas en memoria y las borra en una sola transacción larga.
+
+Aquí el impacto se calcula con un COUNT por modelo alcanzado (subconsultas
+anidadas, sin traer filas) y el borrado avanza de las hojas a la raíz en
+lotes de TAMANO_LOTE, cada lote en su propia transacción corta. Los lotes
+se borran con delete(), así las señales (registro de cambios, auditoría,
+alertas) siguen funcionando.
+
+StockSucursal y VentaSucursal pueden vivir en la base de cada sucursal,
+donde el CASCADE de default no llega (las llaves no tienen db_constraint):
+al borrar productos o sucursales sus filas se borran aparte en cada base.
+"""
+from collections import Counter, defaultdict
+from functools import reduce
+from operator import or_
+
+from django.apps import apps
+from django.db import DEFAULT_DB_ALIAS, models, transaction
+from django.db.models import Q
+from django.db.models.deletion import get_candidate_relations_to_delete
+
+from .models import Producto, Sucursal, StockSucursal, VentaSucursal
+from .router import bases_sucursales
+from .tareas import encolar
+
+TAMANO_LOTE = 500
+
+# Filas afectadas a partir de las cuales el borrado se hace en el worker
+LIMITE_EN_PETICION = 2000
+
+# Columna con la que las filas de las bases de sucursal apuntan a cada modelo
+COLUMNAS_EN_SUCURSALES = {Producto: 'producto_id', Sucursal: 'sucursal_id'}
+
+
+def _relaciones(modelo):
+    """(modelo relacionado, campo, on_delete) de las llaves que apuntan a `modelo`"""
+    for relacion in get_candidate_relations_to_delete(modelo._meta):
+        yield relacion.related_model, relacion.field.name, relacion.on_delete
+
+
+def impacto_borrado(consulta):
+    """
+    Lo que arrastraría borrar las filas de la consulta: una fila por
+    modelo con {'modelo', 'nombre', 'cantidad', 'accion'}, donde accion es
+    'eliminados' (CASCADE) o 'desvinculados' (SET_NULL). Un COUNT por
+    modelo; si un modelo se alcanza por varios caminos (una alerta por su
+    producto y por su proveedor) las condiciones se unen con OR.
+    """
+    eliminados = defaultdict(list)
+    desvinculados = defaultdict(list)
+    pendientes = [(consulta.model, consulta)]
+    while pendientes:
+        modelo, filas = pendientes.pop(0)
+        for relacionado, campo, on_delete in _relaciones(modelo):
+            condicion = Q(**{f'{campo}__in': filas.values('pk')})
+            if on_delete is models.CASCADE:
+                eliminados[relacionado].append(condicion)
+                pendientes.append((relacionado, relacionado._base_manager.filter(condicion)))
+            elif on_delete is models.SET_NULL:
+                desvinculados[relacionado].append(condicion)
+
+    impacto = [_fila(consulta.model, consulta.count(), 'eliminados')]
+    for accion, modelos in (('eliminados', eliminados), ('desvinculados', desvinculados)):
+        for modelo, condiciones in modelos.items():
+            cantidad = modelo._base_manager.filter(reduce(or_, condiciones)).count()
+            if cantidad:
+                impacto.append(_fila(modelo, cantidad, accion))
+    return impacto
+
+
+def _fila(modelo, cantidad, accion):
+    return {
+        'modelo': modelo,
+        'nombre': modelo._meta.verbose_name_plural,
+        'cantidad': cantidad,
+        'accion': accion,
+    }
+
+
+def cantidad_afectada(impacto, modelo=None):
+    """Filas eliminadas en total, o solo las de `modelo`"""
+    return sum(
+        fila['cantidad'] for fila in impacto
+        if fila['accion'] == 'eliminados' and (modelo is None or fila['modelo'] is modelo)
+    )
+
+
+def borrar_por_lotes(consulta, tamano_lote=TAMANO_LOTE):
+    """
+    Borra las filas de la consulta y todo lo que cuelga de ellas con
+    CASCADE. Por cada lote de ids primero se borran (también por lotes)
+    sus dependientes y después el lote. Devuelve un Counter
+    {'app.Modelo': filas borradas}.
+    """
+    modelo = consulta.model
+    dependientes = [
+        (relacionado, campo) for relacionado, campo, on_delete in _relaciones(modelo)
+        if on_delete is models.CASCADE
+    ]
+    borrados = Counter()
+    while True:
+        ids = list(consulta.order_by('pk').values_list('pk', flat=True)[:tamano_lote])
+        if not ids:
+            return borrados
+        for relacionado, campo in dependientes:
+            borrados += borrar_por_lotes(relacionado._base_manager.filter(**{f'{campo}__in': ids}), tamano_lote)
+        if modelo in COLUMNAS_EN_SUCURSALES:
+            borrados += borrar_en_sucursales(modelo, ids)
+        with transaction.atomic():
+            _, por_modelo = modelo._base_manager.filter(pk__in=ids).delete()
+        borrados.update(por_modelo)
+
+
+def borrar_en_sucursales(modelo, ids):
+    """
+    Stock y ventas capturadas que apuntan a los ids en todas las bases
+    (VentaSucursal no tiene llave foránea ni en default). Devuelve un
+    Counter como borrar_por_lotes().
+    """
+    columna = COLUMNAS_EN_SUCURSALES[modelo]
+    borrados = Counter()
+    for base in {DEFAULT_DB_ALIAS, *bases_sucursales().values()}:
+        with transaction.atomic(using=base):
+            for dependiente in (StockSucursal, VentaSucursal):
+                _, por_modelo = dependiente._base_manager.using(base).filter(**{f'{columna}__in': ids}).delete()
+                borrados.update(por_modelo)
+    return borrados
+
+
+def borrar_o_encolar(consulta, impacto=None):
+    """
+    Borra en la petición si el impacto es chico; si no, encola el borrado
+    para el worker. Devuelve (borrados, tarea): uno de los dos es None.
+    """
+    impacto = impacto_borrado(consulta) if impacto is None else impacto
+    if cantidad_afectada(impacto) <= LIMITE_EN_PETICION:
+        return borrar_por_lotes(consulta), None
+    tarea = encolar(
+        'borrar_por_lotes',
+        modelo=consulta.model._meta.label,
+        ids=list(consulta.values_list('pk', flat=True))
+    )
+    return None, tarea
+
+
+def resumen_borrado(borrados):
+    """'1 Proveedores, 12 Productos, ...' a partir del Counter de borrar_por_lotes()"""
+    return ', '.join(
+        f'{cantidad} {apps.get_model(etiqueta)._meta.verbose_name_plural}'
+        for etiqueta, cantidad in borrados.items() if cantidad
+    )
@@ -0,0 +1,134 @@
+"""
+Caché de consultas por petición.
+
+Durante una petición GET o HEAD los resultados de las consultas SELECT se
+guardan por (SQL, parámetros): si la plantilla repite la misma consulta
+(producto.venta_set.count en tres lugares, un conteo por fila) la segunda
+vez se responde desde memoria. La caché vive solo lo que dura la vista y
+se apaga y vacía con la primera escritura (INSERT, UPDATE, DELETE...) en
+cualquier conexión, así nunca devuelve datos anteriores a un cambio hecho
+en la misma petición.
+
+No se guardan las lecturas con select_for_update ni las de iterator()
+(chunked), ni resultados de más de MAX_FILAS filas. La respuesta lleva el
+encabezado X-Cache-Consultas con los aciertos y las consultas que sí
+llegaron a la base de datos.
+"""
+import logging
+import re
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core.exceptions import EmptyResultSet, FullResultSet
+from django.db import connections
+from django.db.models.sql.compiler import SQLCompiler
+from django.db.models.sql.constants import GET_ITERATOR_CHUNK_SIZE, MULTI, SINGLE
+from django.utils.decorators import sync_and_async_middleware
+
+logger = logging.getLogger(__name__)
+
+MAX_ENTRADAS = 500
+MAX_FILAS = 1000
+
+ESCRITURA = re.compile(r'^\s*(INSERT|UPDATE|DELETE|REPLACE|CREATE|DROP|ALTER|TRUNCATE)\b', re.IGNORECASE)
+
+_cache = ContextVar('cache_consultas', default=None)
+
+
+class CacheConsultas:
+    def __init__(self):
+        self.resultados = {}
+        self.activa = True
+        self.aciertos = 0
+        self.consultas = 0
+
+    def desactivar(self):
+        self.activa = False
+        self.resultados.clear()
+
+    def resumen(self):
+        estado = '' if self.activa else ', desactivada por escritura'
+        return f'{self.aciertos} aciertos, {self.consultas} consultas{estado}'
+
+
+# ==================== LECTURAS ====================
+_execute_sql = SQLCompiler.execute_sql
+
+
+def _execute_sql_con_cache(self, result_type=MULTI, chunked_fetch=False, chunk_size=GET_ITERATOR_CHUNK_SIZE):
+    cache = _cache.get()
+    if (cache is None or not cache.activa or chunked_fetch
+            or result_type not in (MULTI, SINGLE) or self.query.select_for_update):
+        return _execute_sql(self, result_type, chunked_fetch, chunk_size)
+
+    try:
+        sql, params = self.as_sql()
+        llave = (self.using, result_type, sql, tuple(params))
+        hash(llave)
+    except (EmptyResultSet, FullResultSet, TypeError):
+        return _execute_sql(self, result_type, chunked_fetch, chunk_size)
+
+    if llave in cache.resultados:
+        cache.aciertos += 1
+        resultado = cache.resultados[llave]
+        # Lista nueva: quien la recorre no debe afectar a la guardada
+        return list(resultado) if result_type == MULTI else resultado
+
+    # execute_sql() vuelve a llamar a as_sql(): se le da el SQL ya compilado
+    self.as_sql = lambda *args, **kwargs: (sql, params)
+    try:
+        resultado = _execute_sql(self, result_type, chunked_fetch, chunk_size)
+    finally:
+        del self.as_sql
+    cache.consultas += 1
+
+    filas = sum(len(bloque) for bloque in resultado) if result_type == MULTI else 1
+    if cache.activa and filas <= MAX_FILAS and len(cache.resultados) < MAX_ENTRADAS:
+        cache.resultados[llave] = list(resultado) if result_type == MULTI else resultado
+    return resultado
+
+
+def instalar():
+    """Conecta la caché al compilador de consultas (una vez, desde AppConfig.ready)"""
+    SQLCompiler.execute_sql = _execute_sql_con_cache
+
+
+# ==================== ESCRITURAS ====================
+def _vigilar_escrituras(cache):
+    def envoltura(execute, sql, params, many, context):
+        if cache.activa and ESCRITURA.match(sql):
+            cache.desactivar()
+        return execute(sql, params, many, context)
+    return envoltura
+
+
+# ==================== MIDDLEWARE ====================
+@sync_and_async_middleware
+def middleware_cache_consultas(get_response):
+    """Una caché por petición de lectura, activa solo mientras corre la vista"""
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            # Las vistas asíncronas (eventos en vivo) no pasan por la caché
+            return await get_response(request)
+        return middleware
+
+    def middleware(request):
+        if not getattr(settings, 'CACHE_CONSULTAS', True) or request.method not in ('GET', 'HEAD'):
+            return get_response(request)
+
+        cache = CacheConsultas()
+        token = _cache.set(cache)
+        try:
+            with ExitStack() as pila:
+                for conexion in connections.all():
+                    pila.enter_context(conexion.execute_wrapper(_vigilar_escrituras(cache)))
+                response = get_response(request)
+        finally:
+            _cache.reset(token)
+
+        response['X-Cache-Consultas'] = cache.resumen()
+        logger.debug('%s %s: %s', request.method, request.path, cache.resumen())
+        return response
+    return middleware
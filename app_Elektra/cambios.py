@@ -0,0 +1,142 @@
+from django.db import transaction
+from django.db.models import FileField
+
+from .models import Proveedor, Categoria, Producto, Vendedor, Cliente, Venta, RegistroCambio
+
+# Modelos que se publican en el registro de cambios (nombre público -> modelo)
+MODELOS_SINCRONIZADOS = {
+    'proveedor': Proveedor,
+    'categoria': Categoria,
+    'producto': Producto,
+    'vendedor': Vendedor,
+    'cliente': Cliente,
+    'venta': Venta,
+}
+
+NOMBRES_MODELOS = {modelo: nombre for nombre, modelo in MODELOS_SINCRONIZADOS.items()}
+
+
+def serializar_objeto(instancia):
+    """Convierte una instancia en un diccionario apto para JSON"""
+    datos = {}
+    for campo in instancia._meta.concrete_fields:
+        valor = getattr(instancia, campo.attname)
+        if isinstance(campo, FileField):
+            valor = valor.name if valor else None
+        datos[campo.attname] = valor
+    return datos
+
+
+def registrar_cambio(modelo, objeto_id, operacion, datos=None):
+    """
+    Guarda la última operación de un registro. La entrada anterior del
+    mismo objeto se elimina para que las actualizaciones repetidas se
+    compacten en una sola fila con un cursor nuevo.
+    """
+    with transaction.atomic():
+        RegistroCambio.objects.filter(modelo=modelo, objeto_id=objeto_id).delete()
+        RegistroCambio.objects.create(
+            modelo=modelo,
+            objeto_id=objeto_id,
+            operacion=operacion,
+            datos=datos
+        )
+
+
+def registrar_guardado(instancia):
+    registrar_cambio(NOMBRES_MODELOS[type(instancia)], instancia.pk, 'guardado',
+                     serializar_objeto(instancia))
+
+
+def registrar_borrado(instancia):
+    registrar_cambio(NOMBRES_MODELOS[type(instancia)], instancia.pk, 'borrado')
+
+
+def registrar_guardados_masivos(modelo, ids, tamano_lote=500):
+    """
+    Equivalente a registrar_guardado para actualizaciones con
+    queryset.update(), que no disparan señales. Trabaja por lotes: un
+    DELETE, un SELECT y un bulk_create por cada `tamano_lote` registros.
+    """
+    nombre = NOMBRES_MODELOS[modelo]
+    for inicio in range(0, len(ids), tamano_lote):
+        lote = ids[inicio:inicio + tamano_lote]
+        with transaction.atomic():
+            RegistroCambio.objects.filter(modelo=nombre, objeto_id__in=lote).delete()
+            RegistroCambio.objects.bulk_create([
+                RegistroCambio(
+                    modelo=nombre,
+                    objeto_id=instancia.pk,
+                    operacion='guardado',
+                    datos=serializar_objeto(instancia)
+                )
+                for instancia in modelo.objects.filter(pk__in=lote).order_by('pk')
+            ])
+
+
+def registrar_borrados_masivos(modelo, ids, datos=None, tamano_lote=500):
+    """
+    Equivalente a registrar_borrado para filas eliminadas sin señales.
+    `datos` se guarda en cada entrada (por ejemplo, para marcar que la
+    fila se archivó en lugar de eliminarse).
+    """
+    nombre = NOMBRES_MODELOS[modelo]
+    for inicio in range(0, len(ids), tamano_lote):
+        lote = ids[inicio:inicio + tamano_lote]
+        with transaction.atomic():
+            RegistroCambio.objects.filter(modelo=nombre, objeto_id__in=lote).delete()
+            RegistroCambio.objects.bulk_create([
+                RegistroCambio(modelo=nombre, objeto_id=objeto_id, operacion='borrado', datos=datos)
+                for objeto_id in lote
+            ])
+
+
+def cambios_desde(cursor, modelos=None, limite=500):
+    """
+    Devuelve (cambios, nuevo_cursor, hay_mas) con los registros posteriores
+    al cursor indicado, en orden de aplicación.
+    """
+    registros = RegistroCambio.objects.filter(id__gt=cursor).order_by('id')
+    if modelos:
+        registros = registros.filter(modelo__in=modelos)
+
+    registros = list(registros.values('id', 'modelo', 'objeto_id', 'operacion', 'datos')[:limite + 1])
+    hay_mas = len(registros) > limite
+    registros = registros[:limite]
+
+    nuevo_cursor = registros[-1]['id'] if registros else cursor
+    return registros, nuevo_cursor, hay_mas
+
+
+def sembrar_registro(tamano_lote=1000):
+    """
+    Registra el estado actual de todas las tablas (carga inicial). Solo
+    reemplaza las entradas de guardado: las de borrado se conservan para
+    que los clientes que sincronizan por cursor se enteren de las bajas.
+    """
+    total = 0
+    for nombre, modelo in MODELOS_SINCRONIZADOS.items():
+        RegistroCambio.objects.filter(modelo=nombre).exclude(operacion='borrado').delete()
+        lote = []
+        for instancia in modelo.objects.order_by('pk').iterator(chunk_size=tamano_lote):
+            lote.append(RegistroCambio(
+                modelo=nombre,
+                objeto_id=instancia.pk,
+                operacion='guardado',
+                datos=serializar_objeto(instancia)
+            ))
+            if len(lote) >= tamano_lote:
+                total += _guardar_semilla(nombre, lote)
+                lote = []
+        if lote:
+            total += _guardar_semilla(nombre, lote)
+    return total
+
+
+def _guardar_semilla(nombre, lote):
+    # Un id que sigue existiendo no debe quedar además como borrado
+    RegistroCambio.objects.filter(
+        modelo=nombre, operacion='borrado', objeto_id__in=[registro.objeto_id for registro in lote]
+    ).delete()
+    RegistroCambio.objects.bulk_create(lote)
+    return len(lote)
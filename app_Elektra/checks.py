@@ -0,0 +1,43 @@
+import os
+
+from django.conf import settings
+from django.core.checks import Error, Warning, register
+
+
+@register(deploy=True)
+def revisar_directorios(app_configs, **kwargs):
+    """Carpetas de media y snapshots que settings.py ya no crea al importarse"""
+    carpetas = [settings.MEDIA_ROOT, settings.SNAPSHOTS_ROOT]
+    carpetas += [os.path.join(settings.MEDIA_ROOT, nombre) for nombre in settings.MEDIA_SUBCARPETAS]
+
+    faltantes = [carpeta for carpeta in carpetas if not os.path.isdir(carpeta)]
+    if not faltantes:
+        return []
+    return [
+        Warning(
+            f"Faltan {len(faltantes)} carpeta(s) de archivos: {', '.join(faltantes)}",
+            hint='Ejecuta "python manage.py preparar_directorios" durante el despliegue.',
+            id='app_Elektra.W001',
+        )
+    ]
+
+
+@register()
+def revisar_bases_sucursales(app_configs, **kwargs):
+    """Cada base de SUCURSALES_BASES debe estar en DATABASES y pasar por el router"""
+    bases = getattr(settings, 'SUCURSALES_BASES', {})
+    errores = [
+        Error(
+            f"La sucursal {codigo} usa la base '{alias}', que no está en DATABASES",
+            hint=f"Agrega DATABASES['{alias}'] en settings.py.",
+            id='app_Elektra.E001',
+        )
+        for codigo, alias in bases.items() if alias not in settings.DATABASES
+    ]
+    if bases and 'app_Elektra.router.RouterSucursales' not in settings.DATABASE_ROUTERS:
+        errores.append(Error(
+            'SUCURSALES_BASES requiere el router de sucursales',
+            hint="Agrega 'app_Elektra.router.RouterSucursales' a DATABASE_ROUTERS.",
+            id='app_Elektra.E002',
+        ))
+    return errores
@@ -0,0 +1,138 @@
+"""
+Desempeño y comisiones de vendedores por periodo.
+
+Una sola consulta agrupada calcula ingresos, tickets, ticket promedio y la
+posición de cada vendedor (RANK() OVER, SQLite >= 3.25). El resultado se
+guarda como TablaVendedores/DesempenoVendedor, así la página lee una fila
+por vendedor sin importar cuántas ventas tenga el periodo. Las señales de
+Venta borran las tablas cuyo periodo incluye la venta modificada.
+"""
+from datetime import datetime, time, timedelta
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.db import IntegrityError, transaction
+from django.db.models import Avg, Count, F, Sum, Window
+from django.db.models.functions import Rank, RowNumber
+from django.utils import timezone
+
+from .models import Venta, ReporteGuardado, TablaVendedores, DesempenoVendedor
+
+# (ingresos mínimos del periodo, tasa aplicada a todos los ingresos)
+TRAMOS_COMISION = [
+    (Decimal('0'), Decimal('0.0200')),
+    (Decimal('50000'), Decimal('0.0300')),
+    (Decimal('150000'), Decimal('0.0500')),
+]
+
+# Respaldo por si una venta cambió sin pasar por las señales (update masivo)
+VIGENCIA_TABLA = timedelta(minutes=10)
+
+CENTAVOS = Decimal('0.01')
+
+
+def tasa_comision(ingresos):
+    tasa = TRAMOS_COMISION[0][1]
+    for minimo, tasa_tramo in TRAMOS_COMISION:
+        if ingresos >= minimo:
+            tasa = tasa_tramo
+    return tasa
+
+
+def rango_periodo(periodo, hoy=None):
+    """Mismos periodos que los reportes guardados (mes_actual, mes_anterior, anio_actual)"""
+    return ReporteGuardado(periodo=periodo).rango(hoy)
+
+
+def _limites(fecha_inicio, fecha_fin):
+    desde = timezone.make_aware(datetime.combine(fecha_inicio, time.min))
+    hasta = timezone.make_aware(datetime.combine(fecha_fin + timedelta(days=1), time.min))
+    return desde, hasta
+
+
+def calcular_posiciones(fecha_inicio, fecha_fin):
+    """Totales y posición de cada vendedor en el periodo, en una consulta"""
+    desde, hasta = _limites(fecha_inicio, fecha_fin)
+    return list(
+        Venta.objects.filter(
+            estado='completada',
+            vendedor__isnull=False,
+            fecha_venta__gte=desde,
+            fecha_venta__lt=hasta
+        )
+        .order_by()
+        .values('vendedor_id')
+        .annotate(
+            ingresos=Sum('total'),
+            tickets=Count('id'),
+            ticket_promedio=Avg('total'),
+            posicion=Window(Rank(), order_by=Sum('total').desc()),
+        )
+        .order_by('posicion', 'vendedor_id')
+    )
+
+
+def generar_tabla(fecha_inicio, fecha_fin):
+    filas = calcular_posiciones(fecha_inicio, fecha_fin)
+    total_ingresos = sum((fila['ingresos'] for fila in filas), Decimal('0'))
+
+    try:
+        with transaction.atomic():
+            TablaVendedores.objects.filter(fecha_inicio=fecha_inicio, fecha_fin=fecha_fin).delete()
+            tabla = TablaVendedores.objects.create(
+                fecha_inicio=fecha_inicio,
+                fecha_fin=fecha_fin,
+                total_ingresos=total_ingresos,
+                total_tickets=sum(fila['tickets'] for fila in filas)
+            )
+            desempenos = []
+            for fila in filas:
+                ingresos = Decimal(fila['ingresos'])
+                tasa = tasa_comision(ingresos)
+                desempenos.append(DesempenoVendedor(
+                    tabla=tabla,
+                    vendedor_id=fila['vendedor_id'],
+                    posicion=fila['posicion'],
+                    ingresos=ingresos,
+                    tickets=fila['tickets'],
+                    ticket_promedio=Decimal(fila['ticket_promedio']).quantize(CENTAVOS, ROUND_HALF_UP),
+                    participacion=float(ingresos / total_ingresos * 100) if total_ingresos else 0,
+                    tasa_comision=tasa,
+                    comision=(ingresos * tasa).quantize(CENTAVOS, ROUND_HALF_UP)
+                ))
+            DesempenoVendedor.objects.bulk_create(desempenos)
+    except IntegrityError:
+        # Otra petición generó la misma tabla al mismo tiempo
+        tabla = TablaVendedores.objects.get(fecha_inicio=fecha_inicio, fecha_fin=fecha_fin)
+    return tabla
+
+
+def obtener_tabla(fecha_inicio, fecha_fin):
+    """(tabla, filas) del periodo, recalculando solo si no existe o venció"""
+    tabla = TablaVendedores.objects.filter(fecha_inicio=fecha_inicio, fecha_fin=fecha_fin).first()
+    if tabla is None or tabla.fecha_calculo < timezone.now() - VIGENCIA_TABLA:
+        tabla = generar_tabla(fecha_inicio, fecha_fin)
+    return tabla, list(tabla.filas.select_related('vendedor'))
+
+
+def invalidar_tablas(fecha_venta):
+    """Borra las tablas cuyo periodo incluye la fecha de una venta modificada"""
+    dia = timezone.localdate(fecha_venta)
+    TablaVendedores.objects.filter(fecha_inicio__lte=dia, fecha_fin__gte=dia).delete()
+
+
+def ultimas_ventas(vendedor_ids, limite=10):
+    """
+    Últimas `limite` ventas de cada vendedor en una sola consulta
+    (ROW_NUMBER() particionado por vendedor).
+    """
+    ventas = (
+        Venta.objects.filter(vendedor_id__in=vendedor_ids)
+        .select_related('producto', 'cliente')
+        .annotate(orden=Window(RowNumber(), partition_by=F('vendedor_id'), order_by=F('fecha_venta').desc()))
+        .filter(orden__lte=limite)
+        .order_by('vendedor_id', 'orden')
+    )
+    por_vendedor = {}
+    for venta in ventas:
+        por_vendedor.setdefault(venta.vendedor_id, []).append(venta)
+    return por_vendedor
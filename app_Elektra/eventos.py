@@ -0,0 +1,139 @@
+"""
+Central de eventos en proceso (pub/sub) para las actualizaciones en vivo.
+
+Cada suscriptor tiene una cola acotada en su propio event loop. Publicar
+nunca bloquea: si la cola de un cliente lento está llena se descarta el
+evento más antiguo y, si acumula demasiados descartes, la suscripción se
+cierra para que el navegador se reconecte y recargue el estado.
+
+La central vive en memoria del proceso: un evento solo llega a los
+suscriptores del mismo proceso que lo publicó. Por eso el flujo en vivo
+se activa con EVENTOS_EN_VIVO únicamente cuando la aplicación corre en un
+solo proceso ASGI (por ejemplo `uvicorn backend_Elektra.asgi:application`
+sin --workers). Con varios procesos, o con los cambios hechos desde
+comandos y tareas, los suscriptores no se enteran; para eso haría falta
+una central compartida (Redis pub/sub o LISTEN/NOTIFY de PostgreSQL).
+"""
+import asyncio
+import itertools
+import json
+import threading
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+TAMANO_COLA = 100
+MAX_DESCARTADOS = 500
+
+# Marca que se encola para cerrar una suscripción
+_CIERRE = object()
+
+
+class SuscripcionCerrada(Exception):
+    """La suscripción se cerró por acumular demasiados eventos descartados"""
+
+
+class Suscripcion:
+    def __init__(self, central, tipos=None, tamano_cola=TAMANO_COLA):
+        self.central = central
+        self.tipos = set(tipos) if tipos else None
+        self.loop = asyncio.get_running_loop()
+        self.cola = asyncio.Queue(maxsize=tamano_cola)
+        self.descartados = 0
+        self.cerrada = False
+
+    def acepta(self, tipo):
+        return self.tipos is None or tipo in self.tipos
+
+    def _encolar(self, evento):
+        # Se ejecuta siempre dentro del loop del suscriptor
+        if self.cerrada:
+            return
+        if self.cola.full():
+            self.cola.get_nowait()
+            self.descartados += 1
+            if self.descartados > MAX_DESCARTADOS:
+                self.cerrada = True
+                self.central.desuscribir(self)
+                evento = _CIERRE
+        self.cola.put_nowait(evento)
+
+    async def siguiente(self, timeout=None):
+        """Siguiente evento o None si vence el timeout"""
+        if not self.cola.empty():
+            # Camino rápido: evita crear una tarea con wait_for
+            evento = self.cola.get_nowait()
+        else:
+            try:
+                evento = await asyncio.wait_for(self.cola.get(), timeout)
+            except asyncio.TimeoutError:
+                return None
+        if evento is _CIERRE:
+            raise SuscripcionCerrada()
+        return evento
+
+    def cerrar(self):
+        self.central.desuscribir(self)
+
+
+class CentralEventos:
+    """
+    Las suscripciones se agrupan por event loop: publicar un evento cuesta
+    una sola llamada call_soon_threadsafe por loop, y el reparto a cada
+    cola se hace dentro del loop sin despertarlo una vez por suscriptor.
+    """
+
+    def __init__(self):
+        self._por_loop = {}
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+
+    def suscribir(self, tipos=None, tamano_cola=TAMANO_COLA):
+        """Crea una suscripción ligada al event loop actual"""
+        suscripcion = Suscripcion(self, tipos, tamano_cola)
+        with self._lock:
+            self._por_loop.setdefault(suscripcion.loop, set()).add(suscripcion)
+        return suscripcion
+
+    def desuscribir(self, suscripcion):
+        with self._lock:
+            suscripciones = self._por_loop.get(suscripcion.loop)
+            if suscripciones is not None:
+                suscripciones.discard(suscripcion)
+                if not suscripciones:
+                    del self._por_loop[suscripcion.loop]
+
+    @property
+    def total_suscriptores(self):
+        return sum(len(s) for s in self._por_loop.values())
+
+    def publicar(self, tipo, datos):
+        """Publica un evento; seguro desde cualquier hilo y sin bloquear"""
+        evento = {
+            'id': next(self._ids),
+            'tipo': tipo,
+            'datos': json.dumps(datos, cls=DjangoJSONEncoder),
+        }
+        with self._lock:
+            destinos = [(loop, list(suscripciones)) for loop, suscripciones in self._por_loop.items()]
+        for loop, suscripciones in destinos:
+            try:
+                loop.call_soon_threadsafe(_repartir, suscripciones, evento)
+            except RuntimeError:
+                # El loop ya se cerró: descartar sus suscripciones
+                with self._lock:
+                    self._por_loop.pop(loop, None)
+        return evento
+
+
+def _repartir(suscripciones, evento):
+    for suscripcion in suscripciones:
+        if suscripcion.acepta(evento['tipo']):
+            suscripcion._encolar(evento)
+
+
+central = CentralEventos()
+
+
+def formato_sse(evento):
+    """Serializa un evento según el protocolo text/event-stream"""
+    return f"id: {evento['id']}\nevent: {evento['tipo']}\ndata: {evento['datos']}\n\n"
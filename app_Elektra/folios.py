@@ -0,0 +1,234 @@
+"""
+Generador de folios de venta monotónicos y ordenables (estilo Snowflake).
+
+Cada folio es un entero de 63 bits codificado en base32 de Crockford con
+ancho fijo, así que el orden alfabético coincide con el de creación:
+
+    41 bits  milisegundos desde EPOCA_MS
+    10 bits  número de nodo reservado en la tabla NodoFolio
+    12 bits  secuencia dentro del mismo milisegundo
+
+El nodo es único por proceso mientras su reserva esté vigente, y dentro de
+un proceso el reloj nunca retrocede, de modo que no hay colisiones sin
+depender de reintentos contra el índice único de Venta.folio.
+
+La reserva y sus renovaciones se confirman por su cuenta: nunca se hacen
+dentro de un atomic() del llamador, porque un rollback borraría la fila
+mientras el proceso sigue usando el número. Quien genera folios dentro de
+una transacción llama antes a preparar_folios(). El nodo se libera al
+terminar el proceso.
+"""
+import atexit
+import os
+import secrets
+import socket
+import threading
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.db import DatabaseError, IntegrityError, transaction
+from django.utils import timezone
+
+from .models import NodoFolio
+
+# 2024-01-01 00:00:00 UTC: 41 bits de milisegundos alcanzan hasta 2093
+EPOCA_MS = 1704067200000
+
+BITS_NODO = 10
+BITS_SECUENCIA = 12
+MAX_NODOS = 1 << BITS_NODO
+MAX_SECUENCIA = (1 << BITS_SECUENCIA) - 1
+
+# Una reserva sin renovar durante VIGENCIA_NODO se considera abandonada
+VIGENCIA_NODO = timedelta(minutes=10)
+RENOVAR_CADA = 60
+
+PREFIJO = 'VENTA-'
+ALFABETO = '0123456789ABCDEFGHJKMNPQRSTVWXYZ'
+LONGITUD = 13  # 13 caracteres base32 = 65 bits
+
+
+class SinNodosLibres(Exception):
+    """Todos los números de nodo tienen una reserva vigente"""
+
+
+class FolioRepetido(RuntimeError):
+    """Un folio generado ya existía: el nodo no es exclusivo de este proceso"""
+
+
+class NodoEnTransaccion(RuntimeError):
+    """Se intentó reservar el nodo dentro de una transacción del llamador"""
+
+
+def _en_transaccion():
+    return transaction.get_connection(NodoFolio.objects.db).in_atomic_block
+
+
+def codificar(valor):
+    """Entero -> base32 de Crockford con ancho fijo (ordenable como texto)"""
+    caracteres = []
+    for _ in range(LONGITUD):
+        caracteres.append(ALFABETO[valor & 31])
+        valor >>= 5
+    return ''.join(reversed(caracteres))
+
+
+def decodificar(texto):
+    valor = 0
+    for caracter in texto:
+        valor = (valor << 5) | ALFABETO.index(caracter)
+    return valor
+
+
+def reclamar_nodo(token):
+    """
+    Reserva el primer número de nodo libre. Las reservas vencidas se
+    liberan antes; si otro proceso gana la carrera por un número, el
+    índice único lo rechaza y se prueba el siguiente.
+    """
+    if _en_transaccion():
+        raise NodoEnTransaccion(
+            'El nodo de folios no se puede reservar dentro de un atomic(): '
+            'llama a preparar_folios() antes de abrir la transacción'
+        )
+    limite = timezone.now() - VIGENCIA_NODO
+    NodoFolio.objects.filter(fecha_renovacion__lt=limite).delete()
+    usados = set(NodoFolio.objects.values_list('numero', flat=True))
+
+    for numero in range(MAX_NODOS):
+        if numero in usados:
+            continue
+        try:
+            with transaction.atomic():
+                NodoFolio.objects.create(
+                    numero=numero,
+                    token=token,
+                    host=socket.gethostname()[:255],
+                    pid=os.getpid()
+                )
+            return numero
+        except IntegrityError:
+            continue
+    raise SinNodosLibres(f"Los {MAX_NODOS} nodos de folios están reservados")
+
+
+def renovar_nodo(numero, token):
+    """Extiende la reserva; False si otro proceso ya se quedó con el número"""
+    return NodoFolio.objects.filter(numero=numero, token=token).update(
+        fecha_renovacion=timezone.now()
+    ) == 1
+
+
+def liberar_nodo(numero, token):
+    NodoFolio.objects.filter(numero=numero, token=token).delete()
+
+
+class GeneradorFolios:
+    """
+    Generador por proceso. Es seguro entre hilos y detecta forks (los
+    procesos del worker) para reservar un nodo propio en el hijo.
+    """
+
+    def __init__(self, nodo=None):
+        self._lock = threading.Lock()
+        self._nodo_fijo = nodo
+        self._nodo = nodo
+        self._token = None
+        self._pid = os.getpid()
+        self._renovado = time.monotonic()
+        self._ultimo_ms = -1
+        self._secuencia = 0
+
+    def _asegurar_nodo(self):
+        if self._nodo_fijo is not None:
+            return
+
+        pid = os.getpid()
+        if pid != self._pid:
+            # Proceso hijo: la reserva pertenece al padre
+            self._nodo = None
+            self._pid = pid
+
+        transcurrido = time.monotonic() - self._renovado
+        if self._nodo is not None and transcurrido >= VIGENCIA_NODO.total_seconds():
+            # La reserva pudo vencer y ser tomada por otro proceso
+            self._nodo = None
+        elif self._nodo is not None and transcurrido >= RENOVAR_CADA and not _en_transaccion():
+            # Dentro de un atomic() la renovación se pospone: un rollback la desharía
+            if not renovar_nodo(self._nodo, self._token):
+                self._nodo = None
+            self._renovado = time.monotonic()
+
+        if self._nodo is None:
+            self._token = secrets.token_hex(16)
+            self._nodo = reclamar_nodo(self._token)
+            self._renovado = time.monotonic()
+
+    def siguiente(self):
+        """Siguiente identificador entero, estrictamente creciente en el proceso"""
+        with self._lock:
+            self._asegurar_nodo()
+
+            ahora = time.time_ns() // 1_000_000 - EPOCA_MS
+            if ahora < self._ultimo_ms:
+                # El reloj retrocedió (NTP): seguir en el último milisegundo usado
+                ahora = self._ultimo_ms
+
+            if ahora == self._ultimo_ms:
+                self._secuencia += 1
+                if self._secuencia > MAX_SECUENCIA:
+                    # Secuencia agotada: esperar al siguiente milisegundo
+                    while ahora <= self._ultimo_ms:
+                        time.sleep(0.0001)
+                        ahora = time.time_ns() // 1_000_000 - EPOCA_MS
+                    self._secuencia = 0
+            else:
+                self._secuencia = 0
+
+            self._ultimo_ms = ahora
+            return (ahora << (BITS_NODO + BITS_SECUENCIA)) | (self._nodo << BITS_SECUENCIA) | self._secuencia
+
+    def folio(self):
+        return PREFIJO + codificar(self.siguiente())
+
+    def preparar(self):
+        """Reserva o renueva el nodo ahora, fuera de la transacción que viene"""
+        with self._lock:
+            self._asegurar_nodo()
+
+    def liberar(self):
+        """Devuelve el nodo reservado (al apagar el proceso)"""
+        with self._lock:
+            if self._nodo is not None and self._nodo_fijo is None and self._pid == os.getpid():
+                liberar_nodo(self._nodo, self._token)
+                self._nodo = None
+
+
+def partes_folio(folio):
+    """(fecha, nodo, secuencia) de un folio generado por este módulo"""
+    valor = decodificar(folio[len(PREFIJO):])
+    milisegundos = (valor >> (BITS_NODO + BITS_SECUENCIA)) + EPOCA_MS
+    nodo = (valor >> BITS_SECUENCIA) & (MAX_NODOS - 1)
+    secuencia = valor & MAX_SECUENCIA
+    fecha = datetime.fromtimestamp(milisegundos / 1000, tz=dt_timezone.utc)
+    return fecha, nodo, secuencia
+
+
+generador = GeneradorFolios()
+
+
+def generar_folio():
+    return generador.folio()
+
+
+def preparar_folios():
+    generador.preparar()
+
+
+@atexit.register
+def _liberar_al_salir():
+    try:
+        generador.liberar()
+    except DatabaseError:
+        # Sin base al apagar: la reserva vence sola después de VIGENCIA_NODO
+        pass
@@ -0,0 +1,303 @@
+"""
+Formularios de alta y edición.
+
+La validación no consulta la base de datos campo por campo: las llaves
+foráneas llegan como ids y se resuelven en clean() con un in_bulk por
+modelo, y la unicidad (email, sku, folio) la garantizan los índices
+únicos. guardar() convierte el IntegrityError de un campo único en un
+error del formulario.
+"""
+from collections import defaultdict
+from decimal import Decimal, ROUND_HALF_UP
+
+from django import forms
+from django.db import IntegrityError, models, transaction
+
+from .models import Proveedor, Categoria, Producto, Vendedor, Cliente, Venta
+from .precios import precio_al
+from .router import base_sucursal
+from .sucursales import mover_stock, stock_en_sucursal
+
+
+class Referencia(forms.IntegerField):
+    """Id de un registro relacionado; el formulario lo cambia por la instancia"""
+
+    def __init__(self, modelo, no_existe=None, **kwargs):
+        self.modelo = modelo
+        self.no_existe = no_existe or f'{modelo._meta.verbose_name} no existe'
+        kwargs.setdefault('min_value', 1)
+        super().__init__(**kwargs)
+
+
+class FormularioElektra(forms.ModelForm):
+    """ModelForm que valida sin consultas previas al guardado"""
+
+    # Mensajes para los campos únicos que rechaza la base de datos
+    mensajes_unicos = {}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.referencias = {}
+
+    def ids_referencias(self):
+        """{modelo: ids} a traer; las subclases pueden agregar ids propios"""
+        ids = defaultdict(set)
+        for nombre, campo in self.fields.items():
+            if isinstance(campo, Referencia) and self.cleaned_data.get(nombre) is not None:
+                ids[campo.modelo].add(self.cleaned_data[nombre])
+        return ids
+
+    def consulta_referencias(self, modelo):
+        return modelo._default_manager.all()
+
+    def clean(self):
+        datos = super().clean()
+        for modelo, ids in self.ids_referencias().items():
+            self.referencias[modelo] = self.consulta_referencias(modelo).in_bulk(ids)
+        for nombre, campo in self.fields.items():
+            if not isinstance(campo, Referencia) or datos.get(nombre) is None:
+                continue
+            instancia = self.referencias[campo.modelo].get(datos[nombre])
+            if instancia is None:
+                self.add_error(nombre, campo.no_existe)
+            else:
+                datos[nombre] = instancia
+        return datos
+
+    def _get_validation_exclusions(self):
+        # Las referencias ya se resolvieron: que full_clean() no vuelva a
+        # comprobar que existen con una consulta por llave foránea
+        exclusiones = super()._get_validation_exclusions()
+        exclusiones.update(nombre for nombre, campo in self.fields.items() if isinstance(campo, Referencia))
+        return exclusiones
+
+    def validate_unique(self):
+        """La unicidad la revisa el índice al guardar (ver guardar())"""
+
+    def error_unico(self, error):
+        """Campo único que violó el IntegrityError, o None si fue otra restricción"""
+        # SQLite: "UNIQUE constraint failed: tabla.columna"; PostgreSQL: "Key (columna)=..."
+        texto = str(error)
+        for campo in self._meta.model._meta.concrete_fields:
+            if campo.unique and not campo.primary_key and (f'.{campo.column}' in texto or f'({campo.column})' in texto):
+                return campo.name
+        return None
+
+
+def guardar(form):
+    """
+    Guarda un formulario válido. Si un índice único rechaza el registro
+    agrega el error al formulario y devuelve None. Los archivos subidos que
+    alcanzaron a guardarse se borran: el registro que los usaría no existe.
+    """
+    try:
+        with transaction.atomic():
+            return form.save()
+    except IntegrityError as e:
+        borrar_archivos_subidos(form)
+        campo = form.error_unico(e)
+        if campo is None:
+            raise
+        form.add_error(campo, form.mensajes_unicos.get(campo, f'Este {campo} ya está registrado'))
+        return None
+
+
+def borrar_archivos_subidos(form):
+    """Borra del almacenamiento los archivos que form.save() alcanzó a guardar"""
+    for campo in form.instance._meta.concrete_fields:
+        if isinstance(campo, models.FileField) and campo.name in form.files:
+            archivo = getattr(form.instance, campo.name)
+            if archivo and archivo._committed:
+                archivo.delete(save=False)
+
+
+def mensajes_error(form):
+    """Errores del formulario como textos para messages, con el nombre del campo"""
+    mensajes = []
+    for campo, errores in form.errors.items():
+        etiqueta = form[campo].label if campo in form.fields else None
+        mensajes.extend(f'{etiqueta}: {error}' if etiqueta else error for error in errores)
+    return mensajes
+
+
+# ==================== PROVEEDORES ====================
+class ProveedorForm(FormularioElektra):
+    mensajes_unicos = {'email': 'Este email ya está registrado por otro proveedor'}
+
+    class Meta:
+        model = Proveedor
+        fields = ['nombre', 'pais', 'direccion', 'telefono', 'email', 'activo', 'logo']
+
+
+# ==================== CATEGORÍAS ====================
+class CategoriaForm(FormularioElektra):
+    stock_minimo = forms.IntegerField(
+        required=False, min_value=0,
+        error_messages={'min_value': 'El stock mínimo no puede ser negativo'}
+    )
+
+    class Meta:
+        model = Categoria
+        fields = ['nombre', 'color', 'stock_minimo', 'icono']
+        error_messages = {'nombre': {'required': 'El nombre es requerido'}}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['color'].required = False
+
+    def clean_color(self):
+        return self.cleaned_data['color'] or '#6c757d'
+
+    def clean_stock_minimo(self):
+        # Vacío conserva el valor actual (10 en una categoría nueva)
+        valor = self.cleaned_data['stock_minimo']
+        return self.instance.stock_minimo if valor is None else valor
+
+
+# ==================== PRODUCTOS ====================
+class ProductoForm(FormularioElektra):
+    categoria = Referencia(Categoria, 'La categoría no existe')
+    proveedor = Referencia(Proveedor, 'El proveedor no existe')
+    precio = forms.DecimalField(
+        max_digits=10, decimal_places=2, min_value=Decimal('0.01'),
+        error_messages={'min_value': 'El precio debe ser mayor a 0'}
+    )
+    stock = forms.IntegerField(min_value=0, error_messages={'min_value': 'El stock no puede ser negativo'})
+    stock_minimo = forms.IntegerField(
+        required=False, min_value=0,
+        error_messages={'min_value': 'El stock mínimo no puede ser negativo'}
+    )
+    mensajes_unicos = {'sku': 'Este SKU ya está registrado por otro producto'}
+
+    class Meta:
+        model = Producto
+        fields = ['nombre_producto', 'categoria', 'precio', 'stock', 'descripcion',
+                  'proveedor', 'sku', 'stock_minimo', 'imagen']
+
+
+# ==================== VENDEDORES ====================
+class VendedorForm(FormularioElektra):
+    mensajes_unicos = {'email': 'Este email ya está registrado por otro vendedor'}
+
+    class Meta:
+        model = Vendedor
+        fields = ['nombre', 'telefono', 'email', 'fecha_contratacion', 'activo', 'foto']
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['fecha_contratacion'].required = False
+
+    def clean_fecha_contratacion(self):
+        # Vacía conserva la fecha actual (hoy en un vendedor nuevo)
+        return self.cleaned_data['fecha_contratacion'] or self.instance.fecha_contratacion
+
+
+# ==================== CLIENTES ====================
+class ClienteForm(FormularioElektra):
+    mensajes_unicos = {'email': 'Este email ya está registrado por otro cliente'}
+
+    class Meta:
+        model = Cliente
+        fields = ['nombre', 'telefono', 'email', 'direccion', 'tipo_cliente', 'foto']
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['tipo_cliente'].required = False
+
+    def clean_tipo_cliente(self):
+        return self.cleaned_data['tipo_cliente'] or 'regular'
+
+
+# ==================== VENTAS ====================
+def cantidad_vendida(total, precio):
+    """Venta no guarda la cantidad: se deduce del total y el precio vigente al vender"""
+    if not precio:
+        return 0
+    return int((total / precio).quantize(Decimal('1'), ROUND_HALF_UP))
+
+
+class VentaForm(FormularioElektra):
+    """
+    Edición de una venta: devuelve al producto anterior lo que se había
+    descontado y descuenta la cantidad nueva. Los productos se bloquean
+    con select_for_update, así que clean() y save() deben correr dentro
+    de la misma transacción.
+    """
+    vendedor = Referencia(Vendedor, 'El vendedor no existe')
+    producto = Referencia(Producto, 'El producto no existe')
+    cliente = Referencia(Cliente, 'El cliente no existe')
+    cantidad = forms.IntegerField(min_value=1, initial=1, error_messages={'min_value': 'La cantidad debe ser mayor a 0'})
+    mensajes_unicos = {'folio': 'Este folio ya está registrado en otra venta'}
+
+    class Meta:
+        model = Venta
+        fields = ['folio', 'metodo_pago', 'estado', 'vendedor', 'producto', 'cliente', 'notas']
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # construct_instance() reemplaza el producto: guardar el original
+        self.producto_anterior_id = self.instance.producto_id
+        self.total_anterior = self.instance.total
+        self.precios_venta = {}
+
+    def precio_venta(self, producto):
+        """Precio del producto en la fecha de la venta (el actual si no hay historial)"""
+        if producto.pk not in self.precios_venta:
+            self.precios_venta[producto.pk] = precio_al(producto.pk, self.instance.fecha_venta, producto.precio)
+        return self.precios_venta[producto.pk]
+
+    def ids_referencias(self):
+        ids = super().ids_referencias()
+        # El producto anterior viene en el mismo in_bulk que el nuevo
+        if self.producto_anterior_id is not None:
+            ids[Producto].add(self.producto_anterior_id)
+        return ids
+
+    def consulta_referencias(self, modelo):
+        if modelo is Producto:
+            return Producto.objects.select_for_update()
+        return super().consulta_referencias(modelo)
+
+    def clean(self):
+        datos = super().clean()
+        producto = datos.get('producto')
+        cantidad = datos.get('cantidad')
+        if isinstance(producto, Producto) and cantidad:
+            disponible = producto.stock
+            if producto.pk == self.producto_anterior_id:
+                disponible += self.cantidad_anterior()
+            if disponible < cantidad:
+                self.add_error('cantidad', f'Stock insuficiente. Disponible: {disponible}')
+            elif self.instance.sucursal_id:
+                en_sucursal = stock_en_sucursal(self.instance.sucursal_id, producto.pk)
+                if producto.pk == self.producto_anterior_id:
+                    en_sucursal += self.cantidad_anterior()
+                if en_sucursal < cantidad:
+                    self.add_error('cantidad', f'Stock insuficiente en la sucursal. Disponible: {en_sucursal}')
+        return datos
+
+    def cantidad_anterior(self):
+        anterior = self.referencias.get(Producto, {}).get(self.producto_anterior_id)
+        return cantidad_vendida(self.total_anterior, self.precio_venta(anterior)) if anterior else 0
+
+    def save(self, commit=True):
+        venta = super().save(commit=False)
+        anterior = self.referencias[Producto].get(self.producto_anterior_id)
+        if anterior is not None:
+            anterior.stock += self.cantidad_anterior()
+        # Si el producto no cambió, anterior y venta.producto son la misma instancia
+        venta.producto.stock -= self.cleaned_data['cantidad']
+        # Con el precio de la fecha de la venta, así el total sigue cuadrando con el historial
+        venta.total = self.precio_venta(venta.producto) * self.cleaned_data['cantidad']
+        if commit:
+            # El stock de la sucursal puede vivir en otra base: las dos transacciones juntas
+            with transaction.atomic(), transaction.atomic(using=base_sucursal(venta.sucursal_id)):
+                venta.save()
+                for producto in {anterior, venta.producto} - {None}:
+                    producto.save(update_fields=['stock', 'fecha_actualizacion'])
+                if venta.sucursal_id:
+                    # El stock de la sucursal sigue el mismo cambio
+                    if anterior is not None:
+                        mover_stock(venta.sucursal_id, anterior.pk, self.cantidad_anterior())
+                    mover_stock(venta.sucursal_id, venta.producto_id, -self.cleaned_data['cantidad'])
+        return venta
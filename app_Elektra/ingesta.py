@@ -0,0 +1,445 @@
+"""
+Registro idempotente de ventas, una por una o en lotes.
+
+Cada venta trae una clave generada por quien la captura (el formulario o
+la terminal de la tienda). Si la clave ya existe la venta se reporta como
+duplicada y el stock no se vuelve a descontar, así reintentar después de
+perder la conexión es seguro. Un lote se aplica en una sola transacción:
+un bulk_create de ventas y un bulk_update del stock de los productos.
+
+Una venta con sucursal descuenta también el stock de esa sucursal. Si la
+sucursal tiene base propia (SUCURSALES_BASES) la venta se captura como
+VentaSucursal en esa base, sin escribir en default, y consolidar_sucursal()
+la pasa después a Venta por lotes.
+"""
+from collections import defaultdict
+
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import auditoria
+from .alertas import con_umbral, recalcular_alertas
+from .cambios import registrar_guardados_masivos
+from .desempeno import invalidar_tablas
+from .eventos import central
+from .folios import FolioRepetido, generar_folio, preparar_folios
+from .models import Producto, Vendedor, Cliente, Venta, Sucursal, StockSucursal, VentaSucursal
+from .router import base_sucursal
+from .sucursales import mover_stock
+from .tareas import encolar
+
+MAX_VENTAS_LOTE = 500
+LARGO_CLAVE = 64
+
+
+class VentaInvalida(ValueError):
+    """Venta con datos incompletos o mal formados"""
+
+
+def normalizar_venta(datos):
+    """Valida y convierte una venta recibida; lanza VentaInvalida con el motivo"""
+    if not isinstance(datos, dict):
+        raise VentaInvalida('Cada venta debe ser un objeto')
+
+    clave = str(datos.get('clave') or '').strip()
+    if not clave or len(clave) > LARGO_CLAVE:
+        raise VentaInvalida(f'La clave es obligatoria (máximo {LARGO_CLAVE} caracteres)')
+
+    try:
+        producto_id = int(datos['producto'])
+        cliente_id = int(datos['cliente'])
+        vendedor_id = int(datos['vendedor'])
+        cantidad = int(datos.get('cantidad', 1))
+        sucursal_id = int(datos['sucursal']) if datos.get('sucursal') else None
+    except (KeyError, TypeError, ValueError):
+        raise VentaInvalida('producto, cliente, vendedor, cantidad y sucursal deben ser números enteros')
+    if cantidad <= 0:
+        raise VentaInvalida('La cantidad debe ser mayor a 0')
+
+    metodo_pago = str(datos.get('metodo_pago') or '').strip()
+    if not metodo_pago:
+        raise VentaInvalida('El método de pago es obligatorio')
+
+    # Las terminales mandan la hora en que se capturó la venta sin conexión
+    fecha_venta = timezone.now()
+    if datos.get('fecha_venta'):
+        fecha_venta = parse_datetime(str(datos['fecha_venta']))
+        if fecha_venta is None:
+            raise VentaInvalida('fecha_venta debe tener formato ISO 8601')
+        if timezone.is_naive(fecha_venta):
+            fecha_venta = timezone.make_aware(fecha_venta)
+
+    return {
+        'clave': clave,
+        'producto_id': producto_id,
+        'cliente_id': cliente_id,
+        'vendedor_id': vendedor_id,
+        'sucursal_id': sucursal_id,
+        'cantidad': cantidad,
+        'metodo_pago': metodo_pago,
+        'fecha_venta': fecha_venta,
+        'notas': str(datos.get('notas') or ''),
+    }
+
+
+def registrar_ventas(lista):
+    """
+    Registra las ventas recibidas y devuelve un resultado por venta en el
+    mismo orden, con estado 'creada', 'duplicada' o 'rechazada'. Las
+    ventas capturadas en la base de una sucursal todavía no tienen id
+    (None) hasta que se consolidan.
+    """
+    resultados = [None] * len(lista)
+    validas = []
+    for indice, datos in enumerate(lista):
+        try:
+            validas.append((indice, normalizar_venta(datos)))
+        except VentaInvalida as e:
+            clave = datos.get('clave') if isinstance(datos, dict) else None
+            resultados[indice] = {'clave': clave, 'estado': 'rechazada', 'error': str(e)}
+
+    centrales = []
+    por_sucursal = defaultdict(list)
+    for indice, datos in validas:
+        if base_sucursal(datos['sucursal_id']) == DEFAULT_DB_ALIAS:
+            centrales.append((indice, datos))
+        else:
+            por_sucursal[datos['sucursal_id']].append((indice, datos))
+
+    # El nodo de folios se reserva antes de abrir las transacciones
+    preparar_folios()
+    for sucursal_id, ventas in por_sucursal.items():
+        try:
+            _capturar_en_sucursal(sucursal_id, ventas, resultados)
+        except IntegrityError:
+            _capturar_en_sucursal(sucursal_id, ventas, resultados)
+    if centrales:
+        try:
+            _aplicar(centrales, resultados)
+        except IntegrityError:
+            # Otra petición registró alguna de las claves al mismo tiempo: al
+            # repetir, esas ventas salen como duplicadas. Un folio repetido
+            # llega como FolioRepetido y no se reintenta
+            _aplicar(centrales, resultados)
+    return resultados
+
+
+def _guardar_nuevas(ventas, nuevas):
+    """
+    bulk_create en un savepoint. Si choca contra un folio ya guardado el
+    nodo de folios está comprometido: repetir daría el mismo error.
+    """
+    try:
+        with transaction.atomic(using=ventas.db):
+            ventas.bulk_create(nuevas)
+    except IntegrityError:
+        if ventas.filter(folio__in=[venta.folio for venta in nuevas]).exists():
+            raise FolioRepetido('Folio repetido: el nodo de folios de este proceso está comprometido')
+        raise
+
+
+def _aplicar(validas, resultados):
+    with transaction.atomic():
+        existentes = {
+            venta.clave_idempotencia: venta
+            for venta in Venta.objects.filter(clave_idempotencia__in=[d['clave'] for _, d in validas])
+            .only('id', 'folio', 'clave_idempotencia')
+        }
+        productos = Producto.objects.select_for_update().in_bulk({d['producto_id'] for _, d in validas})
+        clientes = set(
+            Cliente.objects.filter(id__in={d['cliente_id'] for _, d in validas}).values_list('id', flat=True)
+        )
+        vendedores = set(
+            Vendedor.objects.filter(id__in={d['vendedor_id'] for _, d in validas}).values_list('id', flat=True)
+        )
+        sucursal_ids = {d['sucursal_id'] for _, d in validas} - {None}
+        sucursales = set()
+        existencias = {}
+        if sucursal_ids:
+            sucursales = set(
+                Sucursal.objects.filter(id__in=sucursal_ids, activa=True).values_list('id', flat=True)
+            )
+            existencias = {
+                (fila.sucursal_id, fila.producto_id): fila
+                for fila in StockSucursal.objects.select_for_update().filter(
+                    sucursal_id__in=sucursal_ids, producto_id__in={d['producto_id'] for _, d in validas}
+                )
+            }
+
+        nuevas = []
+        registradas = []
+        modificados = {}
+        stock_anterior = {}
+        existencias_modificadas = {}
+        for indice, datos in validas:
+            clave = datos['clave']
+            if clave in existentes:
+                # También cubre una clave repetida dentro del mismo lote
+                registradas.append((indice, 'duplicada', existentes[clave]))
+                continue
+
+            producto = productos.get(datos['producto_id'])
+            error = None
+            if producto is None:
+                error = 'El producto no existe'
+            elif datos['cliente_id'] not in clientes:
+                error = 'El cliente no existe'
+            elif datos['vendedor_id'] not in vendedores:
+                error = 'El vendedor no existe'
+            elif producto.stock < datos['cantidad']:
+                error = f'Stock insuficiente. Disponible: {producto.stock}'
+            elif datos['sucursal_id'] is not None:
+                existencia = existencias.get((datos['sucursal_id'], producto.pk))
+                disponible = existencia.stock if existencia else 0
+                if datos['sucursal_id'] not in sucursales:
+                    error = 'La sucursal no existe o está inactiva'
+                elif disponible < datos['cantidad']:
+                    error = f'Stock insuficiente en la sucursal. Disponible: {disponible}'
+            if error:
+                resultados[indice] = {'clave': clave, 'estado': 'rechazada', 'error': error}
+                continue
+
+            stock_anterior.setdefault(producto.pk, producto.stock)
+            producto.stock -= datos['cantidad']
+            modificados[producto.pk] = producto
+            if datos['sucursal_id'] is not None:
+                existencia.stock -= datos['cantidad']
+                existencias_modificadas[existencia.pk] = existencia
+            venta = Venta(
+                folio=generar_folio(),
+                fecha_venta=datos['fecha_venta'],
+                total=producto.precio * datos['cantidad'],
+                metodo_pago=datos['metodo_pago'],
+                estado='completada',
+                vendedor_id=datos['vendedor_id'],
+                producto_id=producto.pk,
+                cliente_id=datos['cliente_id'],
+                sucursal_id=datos['sucursal_id'],
+                notas=datos['notas'],
+                clave_idempotencia=clave
+            )
+            existentes[clave] = venta
+            nuevas.append(venta)
+            registradas.append((indice, 'creada', venta))
+
+        _guardar_nuevas(Venta.objects.all(), nuevas)
+        ahora = timezone.now()
+        for fila in [*modificados.values(), *existencias_modificadas.values()]:
+            fila.fecha_actualizacion = ahora
+        Producto.objects.bulk_update(list(modificados.values()), ['stock', 'fecha_actualizacion'])
+        StockSucursal.objects.bulk_update(list(existencias_modificadas.values()), ['stock', 'fecha_actualizacion'])
+        efectos_masivos(nuevas, list(modificados.values()), stock_anterior)
+
+    for indice, estado, venta in registradas:
+        resultados[indice] = {
+            'clave': venta.clave_idempotencia,
+            'estado': estado,
+            'id': venta.pk,
+            'folio': venta.folio,
+        }
+
+
+def _capturar_en_sucursal(sucursal_id, validas, resultados):
+    """
+    Ventas de una sucursal con base propia: se validan contra el stock de
+    la sucursal y se guardan como VentaSucursal en su base. En default
+    solo se lee (productos, clientes, vendedores); la consolidación se
+    encola una vez por sucursal mientras haya una pendiente.
+    """
+    base = base_sucursal(sucursal_id)
+    productos = Producto.objects.in_bulk({d['producto_id'] for _, d in validas})
+    clientes = set(Cliente.objects.filter(id__in={d['cliente_id'] for _, d in validas}).values_list('id', flat=True))
+    vendedores = set(Vendedor.objects.filter(id__in={d['vendedor_id'] for _, d in validas}).values_list('id', flat=True))
+    activa = Sucursal.objects.filter(pk=sucursal_id, activa=True).exists()
+
+    registradas = []
+    with transaction.atomic(using=base):
+        existentes = {
+            venta.clave_idempotencia: venta
+            for venta in VentaSucursal.objects.using(base).filter(clave_idempotencia__in=[d['clave'] for _, d in validas])
+            .only('id', 'folio', 'clave_idempotencia')
+        }
+        nuevas = []
+        ahora = timezone.now()
+        for indice, datos in validas:
+            clave = datos['clave']
+            if clave in existentes:
+                registradas.append((indice, 'duplicada', existentes[clave]))
+                continue
+
+            producto = productos.get(datos['producto_id'])
+            error = None
+            if not activa:
+                error = 'La sucursal no existe o está inactiva'
+            elif producto is None:
+                error = 'El producto no existe'
+            elif datos['cliente_id'] not in clientes:
+                error = 'El cliente no existe'
+            elif datos['vendedor_id'] not in vendedores:
+                error = 'El vendedor no existe'
+            else:
+                # Descuento condicionado: la escritura toma de una vez el
+                # candado de la base de la sucursal y no deja stock negativo
+                existencia = StockSucursal.objects.using(base).filter(
+                    sucursal_id=sucursal_id, producto_id=producto.pk
+                )
+                if not existencia.filter(stock__gte=datos['cantidad']).update(
+                    stock=F('stock') - datos['cantidad'], fecha_actualizacion=ahora
+                ):
+                    disponible = existencia.values_list('stock', flat=True).first() or 0
+                    error = f'Stock insuficiente en la sucursal. Disponible: {disponible}'
+            if error:
+                resultados[indice] = {'clave': clave, 'estado': 'rechazada', 'error': error}
+                continue
+
+            venta = VentaSucursal(
+                sucursal_id=sucursal_id,
+                folio=generar_folio(),
+                clave_idempotencia=clave,
+                fecha_venta=datos['fecha_venta'],
+                producto_id=producto.pk,
+                cliente_id=datos['cliente_id'],
+                vendedor_id=datos['vendedor_id'],
+                cantidad=datos['cantidad'],
+                total=producto.precio * datos['cantidad'],
+                metodo_pago=datos['metodo_pago'],
+                notas=datos['notas']
+            )
+            existentes[clave] = venta
+            nuevas.append(venta)
+            registradas.append((indice, 'creada', venta))
+
+        _guardar_nuevas(VentaSucursal.objects.using(base), nuevas)
+        if nuevas:
+            transaction.on_commit(
+                lambda: encolar('consolidar_sucursal', unica=True, sucursal_id=sucursal_id), using=base
+            )
+
+    for indice, estado, venta in registradas:
+        resultados[indice] = {
+            'clave': venta.clave_idempotencia,
+            'estado': estado,
+            'id': None,
+            'folio': venta.folio,
+        }
+
+
+def consolidar_sucursal(sucursal_id, tamano_lote=MAX_VENTAS_LOTE):
+    """
+    Pasa a Venta las ventas capturadas en la base de la sucursal, por
+    lotes: cada lote es una transacción en default (ventas, stock total y
+    efectos) y después se marca en la base de la sucursal. Si algo falla
+    entre las dos, al repetir la clave de idempotencia evita duplicar.
+    Una venta cuyo producto o cliente ya no existe se marca rechazada y
+    sus unidades vuelven al stock de la sucursal. Devuelve
+    {'consolidadas', 'rechazadas'}.
+    """
+    base = base_sucursal(sucursal_id)
+    pendientes = VentaSucursal.objects.using(base).filter(sucursal_id=sucursal_id, estado='pendiente')
+    conteo = {'consolidadas': 0, 'rechazadas': 0}
+    while True:
+        lote = list(pendientes.order_by('id')[:tamano_lote])
+        if not lote:
+            return conteo
+
+        rechazadas = []
+        with transaction.atomic():
+            claves = [captura.clave_idempotencia for captura in lote]
+            existentes = set(
+                Venta.objects.filter(clave_idempotencia__in=claves).values_list('clave_idempotencia', flat=True)
+            )
+            productos = Producto.objects.select_for_update().in_bulk({captura.producto_id for captura in lote})
+            clientes = set(
+                Cliente.objects.filter(id__in={captura.cliente_id for captura in lote}).values_list('id', flat=True)
+            )
+            vendedores = set(
+                Vendedor.objects.filter(id__in={captura.vendedor_id for captura in lote}).values_list('id', flat=True)
+            )
+
+            nuevas = []
+            modificados = {}
+            stock_anterior = {}
+            for captura in lote:
+                if captura.clave_idempotencia in existentes:
+                    continue
+                producto = productos.get(captura.producto_id)
+                if producto is None or captura.cliente_id not in clientes:
+                    rechazadas.append(captura)
+                    continue
+                stock_anterior.setdefault(producto.pk, producto.stock)
+                # La sucursal ya validó su stock; el total no baja de 0
+                producto.stock = max(producto.stock - captura.cantidad, 0)
+                modificados[producto.pk] = producto
+                nuevas.append(Venta(
+                    folio=captura.folio,
+                    fecha_venta=captura.fecha_venta,
+                    total=captura.total,
+                    metodo_pago=captura.metodo_pago,
+                    estado='completada',
+                    vendedor_id=captura.vendedor_id if captura.vendedor_id in vendedores else None,
+                    producto_id=producto.pk,
+                    cliente_id=captura.cliente_id,
+                    sucursal_id=sucursal_id,
+                    notas=captura.notas,
+                    clave_idempotencia=captura.clave_idempotencia
+                ))
+
+            Venta.objects.bulk_create(nuevas)
+            ahora = timezone.now()
+            for producto in modificados.values():
+                producto.fecha_actualizacion = ahora
+            Producto.objects.bulk_update(list(modificados.values()), ['stock', 'fecha_actualizacion'])
+            efectos_masivos(nuevas, list(modificados.values()), stock_anterior)
+
+        with transaction.atomic(using=base):
+            for captura in rechazadas:
+                mover_stock(sucursal_id, captura.producto_id, captura.cantidad)
+            pendientes.filter(id__in=[captura.id for captura in rechazadas]).update(
+                estado='rechazada', error='El producto o el cliente ya no existe'
+            )
+            pendientes.filter(id__in=[captura.id for captura in lote]).update(estado='consolidada')
+        conteo['consolidadas'] += len(lote) - len(rechazadas)
+        conteo['rechazadas'] += len(rechazadas)
+
+
+def efectos_masivos(ventas, productos, stock_anterior):
+    """
+    Lo que las señales harían venta por venta y producto por producto:
+    registro de cambios, auditoría, alertas, tablas de vendedores y
+    eventos en vivo.
+    """
+    producto_ids = [producto.pk for producto in productos]
+    registrar_guardados_masivos(Venta, [venta.pk for venta in ventas])
+    registrar_guardados_masivos(Producto, producto_ids)
+    recalcular_alertas(producto_ids)
+
+    auditoria.registrar_varios(Venta, 'creado', [(venta.pk, auditoria.valores(venta)) for venta in ventas])
+    auditoria.registrar_varios(Producto, 'modificado', [
+        (producto.pk, {'stock': [stock_anterior[producto.pk], producto.stock]}) for producto in productos
+    ])
+
+    dias = {timezone.localdate(venta.fecha_venta): venta.fecha_venta for venta in ventas}
+    for fecha_venta in dias.values():
+        invalidar_tablas(fecha_venta)
+
+    eventos = [
+        ('venta', {
+            'id': venta.pk,
+            'folio': venta.folio,
+            'total': venta.total,
+            'producto_id': venta.producto_id,
+            'fecha_venta': venta.fecha_venta,
+        })
+        for venta in ventas
+    ]
+    eventos += [
+        ('stock', {'id': fila['id'], 'nombre': fila['nombre_producto'], 'stock': fila['stock'], 'umbral': fila['umbral']})
+        for fila in con_umbral(Producto.objects.filter(id__in=producto_ids)).values('id', 'nombre_producto', 'stock', 'umbral')
+    ]
+
+    def publicar():
+        for tipo, datos in eventos:
+            central.publicar(tipo, datos)
+    transaction.on_commit(publicar)
@@ -0,0 +1,169 @@
+"""
+Valuación del inventario (precio * stock).
+
+Los totales por categoría, por proveedor o por ambos son una consulta
+agrupada con Sum(precio * stock) calculada en la base de datos y leída
+como Decimal; ninguna fila de producto pasa por Python. Un snapshot guarda
+esos totales por categoría-proveedor para compararlos después contra el
+inventario actual. El detalle por SKU se lee con iterator() y se escribe
+como CSV mientras se descarga, así la memoria no crece con el catálogo.
+"""
+import csv
+
+from django.db import transaction
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Sum
+
+from .models import Producto, SnapshotInventario, SnapshotInventarioGrupo
+
+DINERO = DecimalField(max_digits=16, decimal_places=2)
+
+TAMANO_LOTE = 2000
+
+# nombre: (columnas de Producto, columnas equivalentes en SnapshotInventarioGrupo)
+AGRUPACIONES = {
+    'categoria': (
+        ['categoria_id', 'categoria__nombre'],
+        ['categoria_id', 'categoria_nombre'],
+    ),
+    'proveedor': (
+        ['proveedor_id', 'proveedor__nombre'],
+        ['proveedor_id', 'proveedor_nombre'],
+    ),
+    'categoria_proveedor': (
+        ['categoria_id', 'categoria__nombre', 'proveedor_id', 'proveedor__nombre'],
+        ['categoria_id', 'categoria_nombre', 'proveedor_id', 'proveedor_nombre'],
+    ),
+}
+
+COLUMNAS_DETALLE = ['SKU', 'Producto', 'Categoría', 'Proveedor', 'Precio', 'Stock', 'Valor']
+
+
+def valor_inventario(precio=None, stock=None):
+    """Expresión precio * stock como Decimal; por defecto, las columnas del producto"""
+    precio = F('precio') if precio is None else precio
+    stock = F('stock') if stock is None else stock
+    return ExpressionWrapper(precio * stock, output_field=DINERO)
+
+
+def totales_inventario(productos=None):
+    """Productos, unidades y valor total en un aggregate"""
+    productos = Producto.objects.all() if productos is None else productos
+    totales = productos.order_by().aggregate(
+        productos=Count('id'), unidades=Sum('stock'), valor=Sum(valor_inventario())
+    )
+    return {clave: valor or 0 for clave, valor in totales.items()}
+
+
+def _filas(consulta):
+    """Filas agrupadas con llaves uniformes (id y nombre de cada nivel)"""
+    filas = []
+    for fila in consulta:
+        grupo = {}
+        for nivel in ('categoria', 'proveedor'):
+            if f'{nivel}_id' in fila:
+                grupo[f'{nivel}_id'] = fila[f'{nivel}_id']
+                grupo[f'{nivel}_nombre'] = fila.get(f'{nivel}__nombre', fila.get(f'{nivel}_nombre'))
+        grupo.update(productos=fila['productos'], unidades=fila['unidades'] or 0, valor=fila['valor'] or 0)
+        filas.append(grupo)
+    return filas
+
+
+def valuacion(agrupacion='categoria', productos=None):
+    """Valor del inventario por grupo, de mayor a menor"""
+    columnas = AGRUPACIONES[agrupacion][0]
+    productos = Producto.objects.all() if productos is None else productos
+    consulta = (
+        productos.order_by()
+        .values(*columnas)
+        .annotate(productos=Count('id'), unidades=Sum('stock'), valor=Sum(valor_inventario()))
+        .order_by('-valor', *columnas)
+    )
+    return _filas(consulta)
+
+
+def tomar_snapshot(descripcion=''):
+    """
+    Guarda el valor actual por categoría-proveedor. Los grupos y el total
+    salen de la misma consulta agrupada, así siempre cuadran.
+    """
+    with transaction.atomic():
+        grupos = valuacion('categoria_proveedor')
+        snapshot = SnapshotInventario.objects.create(
+            descripcion=descripcion,
+            productos=sum(grupo['productos'] for grupo in grupos),
+            unidades=sum(grupo['unidades'] for grupo in grupos),
+            valor=sum(grupo['valor'] for grupo in grupos),
+        )
+        SnapshotInventarioGrupo.objects.bulk_create(
+            [SnapshotInventarioGrupo(snapshot=snapshot, **grupo) for grupo in grupos],
+            batch_size=500
+        )
+    return snapshot
+
+
+def valuacion_snapshot(snapshot, agrupacion='categoria'):
+    """Valor guardado en el snapshot, reagrupado en SQL igual que valuacion()"""
+    columnas = AGRUPACIONES[agrupacion][1]
+    consulta = (
+        snapshot.grupos.order_by()
+        .values(*columnas)
+        .annotate(productos=Sum('productos'), unidades=Sum('unidades'), valor=Sum('valor'))
+    )
+    return _filas(consulta)
+
+
+def comparar(snapshot, agrupacion='categoria'):
+    """
+    Grupos actuales junto a los del snapshot, con la diferencia de valor y
+    unidades. Un grupo que solo existe de un lado cuenta como 0 del otro.
+    Ordenado por la diferencia de valor más grande (en valor absoluto).
+    """
+    def llave(fila):
+        return tuple(fila[columna] for columna in fila if columna.endswith('_id'))
+
+    anteriores = {llave(fila): fila for fila in valuacion_snapshot(snapshot, agrupacion)}
+    filas = []
+    for actual in valuacion(agrupacion):
+        anterior = anteriores.pop(llave(actual), None)
+        filas.append(_diferencia(actual, anterior))
+    for anterior in anteriores.values():
+        vacio = {columna: valor for columna, valor in anterior.items() if columna.endswith(('_id', '_nombre'))}
+        filas.append(_diferencia({**vacio, 'productos': 0, 'unidades': 0, 'valor': 0}, anterior))
+    filas.sort(key=lambda fila: abs(fila['diferencia_valor']), reverse=True)
+    return filas
+
+
+def _diferencia(actual, anterior):
+    anterior = anterior or {'productos': 0, 'unidades': 0, 'valor': 0}
+    return {
+        **actual,
+        'valor_anterior': anterior['valor'],
+        'unidades_anteriores': anterior['unidades'],
+        'diferencia_valor': actual['valor'] - anterior['valor'],
+        'diferencia_unidades': actual['unidades'] - anterior['unidades'],
+    }
+
+
+class _Eco:
+    """Archivo falso para csv.writer: devuelve la línea en vez de guardarla"""
+
+    def write(self, valor):
+        return valor
+
+
+def detalle_csv(productos=None, tamano_lote=TAMANO_LOTE):
+    """
+    Líneas CSV del detalle por SKU. Las filas se leen por bloques con
+    iterator() y cada línea se genera al momento de enviarla.
+    """
+    productos = Producto.objects.all() if productos is None else productos
+    filas = (
+        productos.annotate(valor=valor_inventario())
+        .order_by('sku')
+        .values_list('sku', 'nombre_producto', 'categoria__nombre', 'proveedor__nombre', 'precio', 'stock', 'valor')
+        .iterator(chunk_size=tamano_lote)
+    )
+    escritor = csv.writer(_Eco())
+    yield escritor.writerow(COLUMNAS_DETALLE)
+    for fila in filas:
+        yield escritor.writerow(fila)
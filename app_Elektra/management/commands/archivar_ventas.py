@@ -0,0 +1,36 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from app_Elektra.archivo import archivar_ventas, corte_archivo, por_archivar
+
+
+class Command(BaseCommand):
+    help = 'Mueve las ventas cerradas más antiguas que el horizonte a la partición de archivo'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dias', type=int, default=settings.ARCHIVO_VENTAS_DIAS,
+                            help='Antigüedad mínima en días (ARCHIVO_VENTAS_DIAS por defecto)')
+        parser.add_argument('--lote', type=int, default=1000, help='Ventas movidas por transacción')
+        parser.add_argument('--pausa', type=float, default=0,
+                            help='Segundos de espera entre lotes para no acaparar la base de datos')
+        parser.add_argument('--simular', action='store_true', help='Solo contar las ventas a archivar')
+
+    def handle(self, *args, **options):
+        if options['dias'] < 366:
+            raise CommandError('El horizonte debe ser mayor a un año: el desempeño del año en curso solo lee ventas vigentes')
+        if options['lote'] < 1:
+            raise CommandError('El lote debe ser de al menos 1 venta')
+
+        corte = corte_archivo(options['dias'])
+        if options['simular']:
+            self.stdout.write(f"{por_archivar(corte).count()} venta(s) anteriores a {corte:%Y-%m-%d} por archivar")
+            return
+
+        inicio = time.perf_counter()
+        movidas = archivar_ventas(corte, options['lote'], options['pausa'])
+        segundos = time.perf_counter() - inicio
+        self.stdout.write(self.style.SUCCESS(
+            f"{movidas} venta(s) anteriores a {corte:%Y-%m-%d} archivadas en {segundos:.1f} s"
+        ))
@@ -0,0 +1,73 @@
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from django.core.management.base import BaseCommand
+
+# Lo mismo que hace un worker nuevo antes de atender su primera petición
+ARRANQUE = (
+    "import django; django.setup(); "
+    "from django.urls import resolve; resolve('/')"
+)
+
+
+class Command(BaseCommand):
+    help = 'Mide el arranque en frío de Django (django.setup() + URLconf) con -X importtime'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeticiones', type=int, default=10)
+        parser.add_argument('--top', type=int, default=15, help='Módulos más lentos a mostrar')
+        parser.add_argument('--sin-admin', action='store_true',
+                            help='Arranca con ELEKTRA_ADMIN=0 (sin django.contrib.admin)')
+
+    def handle(self, *args, **options):
+        entorno = dict(os.environ)
+        entorno['DJANGO_SETTINGS_MODULE'] = os.environ['DJANGO_SETTINGS_MODULE']
+        if options['sin_admin']:
+            entorno['ELEKTRA_ADMIN'] = '0'
+
+        tiempos = []
+        importaciones = {}
+        for _ in range(options['repeticiones']):
+            inicio = time.perf_counter()
+            proceso = subprocess.run(
+                [sys.executable, '-X', 'importtime', '-c', ARRANQUE],
+                env=entorno, capture_output=True, text=True
+            )
+            tiempos.append(time.perf_counter() - inicio)
+            if proceso.returncode != 0:
+                self.stderr.write(proceso.stderr[-2000:])
+                return
+            for modulo, propio, acumulado in self.leer_importtime(proceso.stderr):
+                importaciones.setdefault(modulo, []).append((propio, acumulado))
+
+        self.stdout.write(f"Repeticiones:          {len(tiempos)}")
+        self.stdout.write(f"Arranque p50 / mínimo: {statistics.median(tiempos) * 1000:.1f} ms / "
+                          f"{min(tiempos) * 1000:.1f} ms")
+        self.stdout.write(f"Módulos importados:    {len(importaciones)}")
+
+        # Mediana del tiempo propio y acumulado de cada módulo
+        resumen = [
+            (modulo,
+             statistics.median(p for p, _ in valores),
+             statistics.median(a for _, a in valores))
+            for modulo, valores in importaciones.items()
+        ]
+        self.stdout.write(f"\nMódulos del proyecto (acumulado):")
+        for modulo, propio, acumulado in sorted(resumen, key=lambda r: -r[2]):
+            if modulo.split('.')[0] in ('app_Elektra', 'backend_Elektra'):
+                self.stdout.write(f"  {acumulado / 1000:8.1f} ms  {modulo}")
+
+        self.stdout.write(f"\nTop {options['top']} por tiempo propio:")
+        for modulo, propio, acumulado in sorted(resumen, key=lambda r: -r[1])[:options['top']]:
+            self.stdout.write(f"  {propio / 1000:8.1f} ms  {modulo}")
+
+    def leer_importtime(self, salida):
+        """Renglones 'import time: propio | acumulado | módulo' (microsegundos)"""
+        for linea in salida.splitlines():
+            if not linea.startswith('import time:') or 'self [us]' in linea:
+                continue
+            propio, acumulado, modulo = linea[len('import time:'):].split('|')
+            yield modulo.strip(), int(propio), int(acumulado)
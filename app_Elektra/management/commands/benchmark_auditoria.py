@@ -0,0 +1,128 @@
+import statistics
+import time
+import uuid
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import TestCase
+
+from app_Elektra import auditoria
+from app_Elektra.folios import preparar_folios
+from app_Elektra.ingesta import registrar_ventas
+from app_Elektra.models import Proveedor, Categoria, Producto, Vendedor, Cliente, Auditoria
+
+
+class Reversion(Exception):
+    """Deshace los datos sintéticos al terminar"""
+
+
+class Command(BaseCommand):
+    help = 'Mide el costo de la auditoría en las rutas de escritura (ventas, productos y lotes)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--operaciones', type=int, default=300, help='Peticiones simuladas por escenario')
+        parser.add_argument('--rondas', type=int, default=3, help='Se reporta la mediana de las rondas')
+
+    def handle(self, *args, **options):
+        # El nodo de folios no se puede reservar dentro de la transacción del benchmark
+        preparar_folios()
+        try:
+            with transaction.atomic():
+                # Sin auditoría: sus entradas abrirían el lote de la transacción del
+                # benchmark, que nunca confirma, y las mediciones se sumarían a él
+                auditoria.ACTIVA = False
+                self.sembrar()
+                self.entradas = 0
+                operaciones = options['operaciones']
+                escenarios = [
+                    ('ventas_agregar (1 venta)', self.venta, operaciones),
+                    ('productos_actualizar', self.actualizar_producto, operaciones),
+                    ('lote de 100 ventas', self.lote, max(operaciones // 20, 3)),
+                ]
+                for nombre, operacion, cantidad in escenarios:
+                    tiempos = {False: [], True: []}
+                    for ronda in range(options['rondas']):
+                        # Se alterna el orden por si el caché de la base favorece a la segunda
+                        for activa in ((False, True) if ronda % 2 == 0 else (True, False)):
+                            tiempos[activa].append(self.medir(operacion, activa, cantidad))
+                    sin = statistics.median(tiempos[False])
+                    con = statistics.median(tiempos[True])
+                    self.stdout.write(
+                        f"{nombre:28} sin auditoría {sin * 1000:8.3f} ms  con auditoría {con * 1000:8.3f} ms  "
+                        f"({(con / sin - 1) * 100:+.1f}%)"
+                    )
+                self.stdout.write(f"Entradas escritas con auditoría: {self.entradas}")
+                raise Reversion
+        except Reversion:
+            self.stdout.write('Datos sintéticos revertidos')
+        finally:
+            auditoria.ACTIVA = True
+
+    def medir(self, operacion, activa, cantidad):
+        """
+        Segundos por petición simulada, incluidos sus callbacks de commit.
+        Cada medición corre en un savepoint que se revierte, así las dos
+        variantes parten de los mismos datos y repiten las mismas
+        operaciones; las de calentamiento no se cuentan.
+        """
+        auditoria.ACTIVA = activa
+        calentamiento = max(cantidad // 10, 1)
+        savepoint = transaction.savepoint()
+        try:
+            antes = Auditoria.objects.count()
+            for i in range(calentamiento):
+                self.ejecutar(operacion, i)
+            inicio = time.perf_counter()
+            for i in range(calentamiento, calentamiento + cantidad):
+                self.ejecutar(operacion, i)
+            duracion = time.perf_counter() - inicio
+            self.entradas += Auditoria.objects.count() - antes
+        finally:
+            transaction.savepoint_rollback(savepoint)
+        return duracion / cantidad
+
+    def ejecutar(self, operacion, i):
+        # Dentro de la transacción del benchmark on_commit no se ejecutaría
+        with TestCase.captureOnCommitCallbacks(execute=True):
+            operacion(i)
+
+    def venta(self, i):
+        registrar_ventas([self.datos_venta(i)])
+
+    def lote(self, i):
+        registrar_ventas([self.datos_venta(i * 100 + n) for n in range(100)])
+
+    def actualizar_producto(self, i):
+        producto = Producto.objects.get(pk=self.ids[i % len(self.ids)])
+        producto.precio = Decimal(100 + i % 50)
+        producto.descripcion = f'Descripción {i}'
+        producto.save()
+
+    def datos_venta(self, i):
+        return {
+            'clave': uuid.uuid4().hex,
+            'producto': self.ids[i % len(self.ids)],
+            'cliente': self.cliente.pk,
+            'vendedor': self.vendedor.pk,
+            'cantidad': 1,
+            'metodo_pago': 'efectivo',
+        }
+
+    def sembrar(self):
+        proveedor = Proveedor.objects.create(
+            nombre='Benchmark', pais='MX', direccion='-', telefono='0', email='benchmark@example.com'
+        )
+        categoria = Categoria.objects.create(nombre='Benchmark')
+        self.cliente = Cliente.objects.create(
+            nombre='Benchmark', telefono='0', email='benchmark-cliente@example.com', direccion='-'
+        )
+        self.vendedor = Vendedor.objects.create(nombre='Benchmark', telefono='0', email='benchmark-vendedor@example.com')
+        productos = Producto.objects.bulk_create([
+            Producto(
+                nombre_producto=f'Producto {i}', categoria=categoria, proveedor=proveedor,
+                precio=Decimal(100), stock=10 ** 6, descripcion='-', sku=f'BENCH-{i}'
+            )
+            for i in range(200)
+        ])
+        self.ids = [producto.pk for producto in productos]
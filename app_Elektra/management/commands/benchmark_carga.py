@@ -0,0 +1,387 @@
+import http.cookiejar
+import os
+import random
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import uuid
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from decimal import Decimal
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connections
+from django.urls import reverse
+
+# Tráfico por defecto: mayormente lecturas del catálogo y el inicio
+MEZCLA = 'inicio=30,productos=35,busqueda=20,venta=15'
+
+ESCRITURA = re.compile(r'^\s*(INSERT|UPDATE|DELETE|BEGIN)', re.IGNORECASE)
+
+# Segundos de escritura a partir de los que se cuenta como espera por el candado de SQLite
+ESPERA_CANDADO = 0.05
+
+
+def percentil(valores, p):
+    """Percentil p (0-100) por rango más cercano; valores ya ordenados"""
+    if not valores:
+        return 0
+    return valores[min(len(valores) - 1, max(0, round(p / 100 * len(valores) + 0.5) - 1))]
+
+
+def es_bloqueo(error):
+    return isinstance(error, OperationalError) and 'locked' in str(error).lower()
+
+
+# ==================== CLIENTES ====================
+class ClienteInterno:
+    """Peticiones al handler WSGI de Django en el mismo proceso"""
+
+    def __init__(self):
+        from django.test import Client
+        host = next((h for h in settings.ALLOWED_HOSTS if h not in ('*',) and not h.startswith('.')), 'localhost')
+        self.cliente = Client(raise_request_exception=False, HTTP_HOST=host)
+
+    def get(self, ruta):
+        return self.resultado(self.cliente.get(ruta))
+
+    def post(self, ruta, datos):
+        return self.resultado(self.cliente.post(ruta, datos))
+
+    def resultado(self, respuesta):
+        """(status, excepción de la vista o None, destino de la redirección)"""
+        excepcion = respuesta.exc_info[1] if getattr(respuesta, 'exc_info', None) else None
+        return respuesta.status_code, excepcion, respuesta.get('Location', '')
+
+
+class _SinRedireccion(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class ClienteHttp:
+    """Peticiones a un servidor local (runserver, gunicorn) con cookies y token CSRF"""
+
+    def __init__(self, url):
+        self.url = url.rstrip('/')
+        self.cookies = http.cookiejar.CookieJar()
+        self.abridor = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(self.cookies), _SinRedireccion
+        )
+
+    def pedir(self, ruta, datos=None):
+        cuerpo = urllib.parse.urlencode(datos).encode() if datos is not None else None
+        peticion = urllib.request.Request(self.url + ruta, data=cuerpo, headers={'Referer': self.url + ruta})
+        try:
+            with self.abridor.open(peticion, timeout=30) as respuesta:
+                respuesta.read()
+                return respuesta.status, None, ''
+        except urllib.error.HTTPError as e:
+            # Sin seguir redirecciones, un 302 también llega como HTTPError
+            return e.code, None, e.headers.get('Location', '')
+        except OSError as e:
+            return 0, e, ''
+
+    def get(self, ruta):
+        return self.pedir(ruta)
+
+    def post(self, ruta, datos):
+        token = next((cookie.value for cookie in self.cookies if cookie.name == settings.CSRF_COOKIE_NAME), None)
+        if token is None:
+            # El formulario deja la cookie del token CSRF
+            self.pedir(reverse('ventas_agregar'))
+            token = next((cookie.value for cookie in self.cookies if cookie.name == settings.CSRF_COOKIE_NAME), '')
+        return self.pedir(ruta, {**datos, 'csrfmiddlewaretoken': token})
+
+
+# ==================== TRÁFICO ====================
+class Trafico:
+    """Elige y ejecuta peticiones según la mezcla; guarda una muestra por petición"""
+
+    def __init__(self, mezcla, datos, semilla):
+        self.nombres = list(mezcla)
+        self.pesos = [mezcla[nombre] for nombre in self.nombres]
+        self.datos = datos
+        self.azar = random.Random(semilla)
+
+    def peticion(self, cliente):
+        nombre = self.azar.choices(self.nombres, self.pesos)[0]
+        return nombre, getattr(self, nombre)(cliente)
+
+    def inicio(self, cliente):
+        return cliente.get(reverse('inicio_elektra'))
+
+    def productos(self, cliente):
+        return cliente.get(reverse('productos_ver'))
+
+    def busqueda(self, cliente):
+        termino = self.azar.choice(self.datos['terminos'])
+        return cliente.get(f"{reverse('productos_ver')}?q={urllib.parse.quote(termino)}")
+
+    def venta(self, cliente):
+        status, error, destino = cliente.post(reverse('ventas_agregar'), {
+            'clave_idempotencia': uuid.uuid4().hex,
+            'vendedor': self.azar.choice(self.datos['vendedores']),
+            'producto': self.azar.choice(self.datos['productos']),
+            'cliente': self.azar.choice(self.datos['clientes']),
+            'cantidad': 1,
+            'metodo_pago': 'efectivo',
+        })
+        # Registrada redirige a ventas_ver; rechazada vuelve al formulario
+        if error is None and status < 500 and urllib.parse.urlsplit(destino).path != reverse('ventas_ver'):
+            error = 'venta rechazada'
+        return status, error, destino
+
+
+def trabajar(mezcla, datos, url, semilla, fin):
+    """
+    Un trabajador: peticiones hasta `fin` (time.time()). Devuelve
+    [(endpoint, segundos, status, error, bloqueo, espera de escritura)].
+    """
+    esperas = []
+    bloqueos = []
+
+    def medir_escrituras(execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        except OperationalError as e:
+            if es_bloqueo(e):
+                bloqueos.append(1)
+            raise
+        finally:
+            if ESCRITURA.match(sql):
+                esperas.append(time.perf_counter() - inicio)
+
+    trafico = Trafico(mezcla, datos, semilla)
+    cliente = ClienteHttp(url) if url else ClienteInterno()
+    muestras = []
+    try:
+        with connections['default'].execute_wrapper(medir_escrituras):
+            while time.time() < fin:
+                del esperas[:], bloqueos[:]
+                inicio = time.perf_counter()
+                nombre, (status, error, _) = trafico.peticion(cliente)
+                segundos = time.perf_counter() - inicio
+                bloqueo = bool(bloqueos) or es_bloqueo(error)
+                if bloqueo and error:
+                    # ventas_agregar atrapa la excepción y responde con el formulario
+                    error = 'database is locked'
+                if status >= 500 or status == 0:
+                    error = error or f'HTTP {status}'
+                muestras.append((nombre, segundos, status, str(error) if error else None, bloqueo, sum(esperas)))
+    finally:
+        connections.close_all()
+    return muestras
+
+
+def _inicializar_proceso(nombre_bd):
+    if nombre_bd:
+        settings.DATABASES['default']['NAME'] = nombre_bd
+    django.setup()
+    connections.close_all()
+
+
+def _trabajar_en_proceso(argumentos):
+    return trabajar(*argumentos)
+
+
+class Command(BaseCommand):
+    help = ('Prueba de carga del flujo de catálogo y ventas: sube la concurrencia por escalones y reporta '
+            'throughput, latencias p50/p95/p99, errores y bloqueos de SQLite por endpoint')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrencia', default='1,2,4,8,16',
+                            help='Trabajadores simultáneos de cada escalón, separados por coma')
+        parser.add_argument('--duracion', type=float, default=10, help='Segundos por escalón')
+        parser.add_argument('--mezcla', default=MEZCLA,
+                            help=f'Pesos de inicio, productos, busqueda y venta (por defecto {MEZCLA})')
+        parser.add_argument('--modo', choices=['hilos', 'procesos'], default='hilos',
+                            help='Trabajadores como hilos o como procesos (workers de gunicorn)')
+        parser.add_argument('--url', default='',
+                            help='Servidor local a probar (ej. http://127.0.0.1:8000); sin esto se usa el handler WSGI en proceso')
+        parser.add_argument('--en-sitio', action='store_true',
+                            help='Usar la base configurada en lugar de una copia temporal (las ventas quedan registradas)')
+        parser.add_argument('--productos', type=int, default=200, help='Productos sintéticos que se siembran en la copia')
+        parser.add_argument('--max-errores', type=float, default=5,
+                            help='Porcentaje de errores con el que se detiene la subida de concurrencia')
+        parser.add_argument('--semilla', type=int, default=1)
+
+    def handle(self, *args, **options):
+        mezcla = self.leer_mezcla(options['mezcla'])
+        escalones = [int(n) for n in options['concurrencia'].split(',') if n.strip()]
+        base = settings.DATABASES['default']
+        copia = None
+
+        if not options['en_sitio'] and not options['url']:
+            if base['ENGINE'] != 'django.db.backends.sqlite3':
+                raise CommandError('La copia temporal solo funciona con SQLite: use --en-sitio o --url')
+            copia = self.copiar_base(base['NAME'])
+            self.stdout.write(f"Base temporal: {copia} (copia de {base['NAME']})")
+        elif options['en_sitio']:
+            self.stdout.write(self.style.WARNING('Usando la base configurada: las ventas de la prueba quedan registradas'))
+
+        original = base['NAME']
+        try:
+            if copia:
+                connections.close_all()
+                base['NAME'] = copia
+                self.sembrar(options['productos'])
+            datos = self.datos_prueba()
+            self.stdout.write(f"Mezcla: {', '.join(f'{n}={p}' for n, p in mezcla.items())}  "
+                              f"modo: {options['modo']}{'  url: ' + options['url'] if options['url'] else ''}\n")
+
+            resultados = []
+            for trabajadores in escalones:
+                muestras, segundos = self.escalon(trabajadores, mezcla, datos, options)
+                resumen = self.reportar(trabajadores, muestras, segundos)
+                resultados.append(resumen)
+                if resumen['errores'] > options['max_errores']:
+                    self.stdout.write(self.style.WARNING(
+                        f"Errores sobre {options['max_errores']}%: se detiene la subida de concurrencia"
+                    ))
+                    break
+            self.capacidad(resultados, options['max_errores'])
+        finally:
+            if copia:
+                connections.close_all()
+                base['NAME'] = original
+                for sufijo in ('', '-wal', '-shm', '-journal'):
+                    if os.path.exists(copia + sufijo):
+                        os.remove(copia + sufijo)
+
+    def leer_mezcla(self, texto):
+        mezcla = {}
+        for parte in texto.split(','):
+            nombre, _, peso = parte.partition('=')
+            nombre = nombre.strip()
+            if nombre not in ('inicio', 'productos', 'busqueda', 'venta') or not peso.strip().isdigit():
+                raise CommandError(f'Mezcla inválida: "{parte}" (use nombre=peso)')
+            if int(peso):
+                mezcla[nombre] = int(peso)
+        if not mezcla:
+            raise CommandError('La mezcla no tiene ningún peso mayor a 0')
+        return mezcla
+
+    def copiar_base(self, ruta):
+        """Copia consistente con la API de respaldo de SQLite"""
+        descriptor, copia = tempfile.mkstemp(suffix='.sqlite3', prefix='carga_')
+        os.close(descriptor)
+        origen = sqlite3.connect(ruta)
+        destino = sqlite3.connect(copia)
+        try:
+            origen.backup(destino)
+        finally:
+            origen.close()
+            destino.close()
+        return copia
+
+    def sembrar(self, cantidad):
+        """Catálogo sintético con stock de sobra para que las ventas no se agoten"""
+        from app_Elektra.models import Proveedor, Categoria, Producto, Vendedor, Cliente
+
+        proveedor = Proveedor.objects.create(
+            nombre='Carga', pais='MX', direccion='-', telefono='0', email=f'carga-{uuid.uuid4().hex[:8]}@example.com'
+        )
+        categoria = Categoria.objects.create(nombre='Carga')
+        Cliente.objects.create(nombre='Cliente carga', telefono='0', email=f'carga-{uuid.uuid4().hex[:8]}@example.com', direccion='-')
+        Vendedor.objects.create(nombre='Vendedor carga', telefono='0', email=f'carga-{uuid.uuid4().hex[:8]}@example.com')
+        Producto.objects.bulk_create([
+            Producto(
+                nombre_producto=f'Carga producto {i}', categoria=categoria, proveedor=proveedor,
+                precio=Decimal(100 + i % 50), stock=10 ** 6, descripcion='-', sku=f'CARGA-{uuid.uuid4().hex[:10]}'
+            )
+            for i in range(cantidad)
+        ])
+        connections.close_all()
+
+    def datos_prueba(self):
+        """Ids y términos de búsqueda que usan los trabajadores"""
+        from app_Elektra.models import Producto, Vendedor, Cliente
+
+        productos = list(Producto.objects.filter(stock__gte=1000).values_list('id', flat=True)[:500]) or \
+            list(Producto.objects.filter(stock__gt=0).values_list('id', flat=True)[:500])
+        vendedores = list(Vendedor.objects.values_list('id', flat=True)[:50])
+        clientes = list(Cliente.objects.values_list('id', flat=True)[:500])
+        if not (productos and vendedores and clientes):
+            raise CommandError('Se necesitan productos con stock, vendedores y clientes para simular ventas')
+        nombres = Producto.objects.values_list('nombre_producto', flat=True)[:200]
+        terminos = sorted({nombre.strip()[:4].lower() for nombre in nombres if nombre.strip()}) + ['sin-resultados']
+        connections.close_all()
+        return {'productos': productos, 'vendedores': vendedores, 'clientes': clientes, 'terminos': terminos}
+
+    def escalon(self, trabajadores, mezcla, datos, options):
+        fin = time.time() + options['duracion']
+        argumentos = [
+            (mezcla, datos, options['url'], options['semilla'] * 1000 + trabajadores * 100 + n, fin)
+            for n in range(trabajadores)
+        ]
+        inicio = time.perf_counter()
+        if options['modo'] == 'procesos':
+            connections.close_all()
+            with ProcessPoolExecutor(trabajadores, initializer=_inicializar_proceso,
+                                     initargs=(settings.DATABASES['default']['NAME'],)) as pool:
+                lotes = list(pool.map(_trabajar_en_proceso, argumentos))
+        else:
+            with ThreadPoolExecutor(trabajadores) as pool:
+                lotes = list(pool.map(_trabajar_en_proceso, argumentos))
+        segundos = time.perf_counter() - inicio
+        return [muestra for lote in lotes for muestra in lote], segundos
+
+    def reportar(self, trabajadores, muestras, segundos):
+        por_endpoint = defaultdict(list)
+        for muestra in muestras:
+            por_endpoint[muestra[0]].append(muestra)
+
+        errores_total = sum(1 for muestra in muestras if muestra[3])
+        resumen = {
+            'trabajadores': trabajadores,
+            'throughput': len(muestras) / segundos if segundos else 0,
+            'errores': errores_total / len(muestras) * 100 if muestras else 0,
+            'p95': percentil(sorted(muestra[1] for muestra in muestras), 95) * 1000,
+        }
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"{trabajadores} trabajador(es): {len(muestras)} peticiones en {segundos:.1f} s, "
+            f"{resumen['throughput']:.1f} req/s, errores {resumen['errores']:.1f}%"
+        ))
+        self.stdout.write(f"  {'endpoint':<10} {'n':>6} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+                          f"{'error %':>8} {'bloqueos':>9} {'espera':>7}")
+        for nombre in sorted(por_endpoint):
+            filas = por_endpoint[nombre]
+            latencias = sorted(fila[1] for fila in filas)
+            errores = sum(1 for fila in filas if fila[3])
+            bloqueos = sum(1 for fila in filas if fila[4])
+            # Peticiones cuyas escrituras esperaron el candado de escritura de SQLite
+            esperas = sum(1 for fila in filas if fila[5] >= ESPERA_CANDADO)
+            self.stdout.write(
+                f"  {nombre:<10} {len(filas):>6} {len(filas) / segundos:>8.1f} "
+                f"{percentil(latencias, 50) * 1000:>8.1f} {percentil(latencias, 95) * 1000:>8.1f} "
+                f"{percentil(latencias, 99) * 1000:>8.1f} {errores / len(filas) * 100:>8.1f} "
+                f"{bloqueos:>9} {esperas:>7}"
+            )
+        mensajes = defaultdict(int)
+        for muestra in muestras:
+            if muestra[3]:
+                mensajes[muestra[3][:80]] += 1
+        for mensaje, cantidad in sorted(mensajes.items(), key=lambda m: -m[1])[:3]:
+            self.stdout.write(f"  error x{cantidad}: {mensaje}")
+        self.stdout.write('')
+        return resumen
+
+    def capacidad(self, resultados, max_errores):
+        aceptables = [r for r in resultados if r['errores'] <= max_errores]
+        if not aceptables:
+            self.stdout.write(self.style.ERROR('Ningún escalón quedó bajo el límite de errores'))
+            return
+        mejor = max(aceptables, key=lambda r: r['throughput'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Capacidad estimada: {mejor['throughput']:.1f} req/s con {mejor['trabajadores']} trabajador(es) "
+            f"(p95 {mejor['p95']:.1f} ms, errores {mejor['errores']:.1f}%)"
+        ))
@@ -0,0 +1,88 @@
+import asyncio
+import statistics
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+
+from app_Elektra.eventos import CentralEventos, SuscripcionCerrada
+
+
+class Command(BaseCommand):
+    help = 'Mide el fan-out de la central de eventos contra suscriptores simulados'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--suscriptores', type=int, default=1000)
+        parser.add_argument('--eventos', type=int, default=200)
+        parser.add_argument('--cola', type=int, default=100, help='Tamaño de la cola por suscriptor')
+        parser.add_argument('--lentos', type=int, default=0,
+                            help='Número de suscriptores que tardan en consumir (prueba de backpressure)')
+        parser.add_argument('--intervalo', type=float, default=0,
+                            help='Milisegundos entre publicaciones (0 = ráfaga)')
+
+    def handle(self, *args, **options):
+        resultado = asyncio.run(self.medir(options))
+
+        self.stdout.write(f"Suscriptores:        {options['suscriptores']} ({options['lentos']} lentos)")
+        self.stdout.write(f"Eventos publicados:  {options['eventos']}")
+        self.stdout.write(f"Tiempo de publicar:  {resultado['tiempo_publicar'] * 1000:.1f} ms")
+        self.stdout.write(f"Tiempo total:        {resultado['tiempo_total'] * 1000:.1f} ms")
+        self.stdout.write(f"Entregas:            {resultado['entregas']} "
+                          f"({resultado['entregas'] / resultado['tiempo_total']:,.0f}/s)")
+        self.stdout.write(f"Descartados:         {resultado['descartados']}")
+        self.stdout.write(f"Latencia p50 / p99:  {resultado['p50'] * 1000:.2f} ms / {resultado['p99'] * 1000:.2f} ms")
+
+    async def medir(self, options):
+        central = CentralEventos()
+        total_eventos = options['eventos']
+        publicados = {}
+        latencias = []
+        entregas = 0
+
+        suscripciones = [central.suscribir(tamano_cola=options['cola'])
+                         for _ in range(options['suscriptores'])]
+
+        async def consumir(suscripcion, lento):
+            nonlocal entregas
+            try:
+                while True:
+                    evento = await suscripcion.siguiente(timeout=1)
+                    if evento is None:
+                        return
+                    latencias.append(time.perf_counter() - publicados[evento['id']])
+                    entregas += 1
+                    if evento['id'] == total_eventos:
+                        return
+                    if lento:
+                        await asyncio.sleep(0.005)
+            except SuscripcionCerrada:
+                return
+
+        tareas = [asyncio.create_task(consumir(s, i < options['lentos']))
+                  for i, s in enumerate(suscripciones)]
+
+        # Publicar desde otro hilo, igual que una vista síncrona
+        def publicar():
+            for numero in range(total_eventos):
+                publicados[numero + 1] = time.perf_counter()
+                central.publicar('stock', {'id': numero, 'stock': numero % 20})
+                if options['intervalo']:
+                    time.sleep(options['intervalo'] / 1000)
+
+        inicio = time.perf_counter()
+        hilo = threading.Thread(target=publicar)
+        hilo.start()
+        await asyncio.to_thread(hilo.join)
+        tiempo_publicar = time.perf_counter() - inicio
+        await asyncio.gather(*tareas)
+        tiempo_total = time.perf_counter() - inicio
+
+        latencias.sort()
+        return {
+            'tiempo_publicar': tiempo_publicar,
+            'tiempo_total': tiempo_total,
+            'entregas': entregas,
+            'descartados': sum(s.descartados for s in suscripciones),
+            'p50': statistics.median(latencias) if latencias else 0,
+            'p99': latencias[int(len(latencias) * 0.99) - 1] if latencias else 0,
+        }
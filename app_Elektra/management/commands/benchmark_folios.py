@@ -0,0 +1,103 @@
+import os
+import sqlite3
+import tempfile
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from app_Elektra.folios import GeneradorFolios
+
+
+def folio_uuid():
+    """Esquema anterior: 8 caracteres hexadecimales de un uuid4"""
+    return f"VENTA-{uuid.uuid4().hex[:8].upper()}"
+
+
+def _inicializar_proceso():
+    django.setup()
+    connections.close_all()
+
+
+def _generar_en_proceso(cantidad):
+    # Cada proceso reserva su propio nodo en la tabla NodoFolio
+    from app_Elektra.folios import generador
+    try:
+        return [generador.folio() for _ in range(cantidad)]
+    finally:
+        generador.liberar()
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = 'Compara el generador de folios contra el esquema uuid4[:8]: velocidad, colisiones e inserción en el índice'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cantidad', type=int, default=200000, help='Folios a generar por esquema')
+        parser.add_argument('--procesos', type=int, default=4, help='Procesos para la prueba de unicidad')
+        parser.add_argument('--por-proceso', type=int, default=50000)
+        parser.add_argument('--lote', type=int, default=1000, help='Filas por transacción al insertar')
+
+    def handle(self, *args, **options):
+        cantidad = options['cantidad']
+        generador = GeneradorFolios(nodo=0)
+
+        self.stdout.write(f"Generación ({cantidad:,} folios):")
+        folios_uuid, segundos = self.medir(folio_uuid, cantidad)
+        self.stdout.write(f"  uuid4[:8]     {cantidad / segundos:12,.0f} folios/s  "
+                          f"repetidos: {cantidad - len(set(folios_uuid))}")
+        folios_nuevos, segundos = self.medir(generador.folio, cantidad)
+        self.stdout.write(f"  ordenables    {cantidad / segundos:12,.0f} folios/s  "
+                          f"repetidos: {cantidad - len(set(folios_nuevos))}  "
+                          f"ordenados: {folios_nuevos == sorted(folios_nuevos)}")
+
+        # Probabilidad de cumpleaños con 32 bits: n² / 2³³ colisiones esperadas
+        for total in (100_000, 1_000_000, 10_000_000):
+            self.stdout.write(f"  uuid4[:8] con {total:>10,} ventas: ~{total ** 2 / 2 ** 33:,.0f} colisiones esperadas")
+
+        self.stdout.write(f"\nInserción en índice único (SQLite, lotes de {options['lote']}):")
+        for nombre, folios in (('uuid4[:8]', folios_uuid), ('ordenables', folios_nuevos)):
+            filas, segundos, tamano = self.insertar(folios, options['lote'])
+            self.stdout.write(f"  {nombre:<12}  {filas / segundos:12,.0f} filas/s  "
+                              f"archivo: {tamano / 1024:,.0f} KB  insertadas: {filas:,}")
+
+        procesos = options['procesos']
+        if procesos:
+            self.stdout.write(f"\nUnicidad entre {procesos} procesos ({options['por_proceso']:,} folios cada uno):")
+            connections.close_all()
+            inicio = time.perf_counter()
+            with ProcessPoolExecutor(procesos, initializer=_inicializar_proceso) as pool:
+                lotes = list(pool.map(_generar_en_proceso, [options['por_proceso']] * procesos))
+            segundos = time.perf_counter() - inicio
+            todos = [folio for lote in lotes for folio in lote]
+            self.stdout.write(f"  {len(todos):,} folios en {segundos:.2f} s, repetidos: {len(todos) - len(set(todos))}")
+
+    def medir(self, funcion, cantidad):
+        inicio = time.perf_counter()
+        resultado = [funcion() for _ in range(cantidad)]
+        return resultado, time.perf_counter() - inicio
+
+    def insertar(self, folios, lote):
+        """Inserta en una tabla con índice único como Venta.folio; devuelve (filas, segundos, bytes)"""
+        descriptor, ruta = tempfile.mkstemp(suffix='.sqlite3')
+        os.close(descriptor)
+        try:
+            conexion = sqlite3.connect(ruta)
+            conexion.execute('CREATE TABLE venta (id INTEGER PRIMARY KEY, folio VARCHAR(50) NOT NULL UNIQUE)')
+            inicio = time.perf_counter()
+            filas = 0
+            for posicion in range(0, len(folios), lote):
+                with conexion:
+                    cursor = conexion.executemany(
+                        'INSERT OR IGNORE INTO venta (folio) VALUES (?)',
+                        ((folio,) for folio in folios[posicion:posicion + lote])
+                    )
+                    filas += cursor.rowcount
+            segundos = time.perf_counter() - inicio
+            conexion.close()
+            return filas, segundos, os.path.getsize(ruta)
+        finally:
+            os.remove(ruta)
@@ -0,0 +1,112 @@
+import math
+import random
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from app_Elektra.models import Proveedor, Categoria, Producto, Cliente, Venta
+
+
+class Reversion(Exception):
+    """Deshace los datos sintéticos al terminar"""
+
+
+class Command(BaseCommand):
+    help = 'Compara el pronóstico vectorizado (NumPy) contra un bucle por producto sobre datos sintéticos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--productos', type=int, default=2000)
+        parser.add_argument('--ventas', type=int, default=100000)
+        parser.add_argument('--dias', type=int, default=28)
+        parser.add_argument('--sin-bucle', action='store_true',
+                            help='Omitir el bucle por producto (útil con muchos productos)')
+
+    def handle(self, *args, **options):
+        try:
+            from app_Elektra import pronosticos
+        except ImportError as e:
+            raise CommandError(f"Este comando necesita NumPy ({e})")
+
+        try:
+            with transaction.atomic():
+                self.sembrar(options)
+
+                inicio = time.perf_counter()
+                vectorizado = pronosticos.calcular_pronosticos(options['dias'])
+                t_vectorizado = time.perf_counter() - inicio
+
+                inicio = time.perf_counter()
+                guardados = pronosticos.guardar_pronosticos(vectorizado)
+                t_guardado = time.perf_counter() - inicio
+
+                inicio = time.perf_counter()
+                guardados = pronosticos.guardar_pronosticos(vectorizado)
+                t_actualizado = time.perf_counter() - inicio
+
+                self.stdout.write(f"Vectorizado (rollup + NumPy): {t_vectorizado * 1000:10.1f} ms")
+                self.stdout.write(f"Guardado nuevo ({guardados}):       {t_guardado * 1000:10.1f} ms")
+                self.stdout.write(f"Guardado existente ({guardados}):   {t_actualizado * 1000:10.1f} ms")
+
+                if not options['sin_bucle']:
+                    inicio = time.perf_counter()
+                    bucle = pronosticos.calcular_en_bucle(options['dias'])
+                    t_bucle = time.perf_counter() - inicio
+                    self.stdout.write(f"Bucle por producto (ORM):     {t_bucle * 1000:10.1f} ms "
+                                      f"({t_bucle / t_vectorizado:.0f}x más lento)")
+
+                    diferencia = max(
+                        (abs(a - b) for a, b in zip(vectorizado['velocidad'], bucle['velocidad'])),
+                        default=0
+                    )
+                    self.stdout.write(f"Diferencia máxima de velocidad: {diferencia:.2e}")
+                raise Reversion
+        except Reversion:
+            self.stdout.write('Datos sintéticos revertidos')
+
+    def sembrar(self, options):
+        """Productos y ventas sintéticos con bulk_create (sin señales)"""
+        aleatorio = random.Random(42)
+        proveedor = Proveedor.objects.create(
+            nombre='Benchmark', pais='MX', direccion='-', telefono='0', email='benchmark@example.com'
+        )
+        categoria = Categoria.objects.create(nombre='Benchmark')
+        cliente = Cliente.objects.create(
+            nombre='Benchmark', telefono='0', email='benchmark-cliente@example.com', direccion='-'
+        )
+
+        productos = Producto.objects.bulk_create([
+            Producto(
+                nombre_producto=f'Producto {i}',
+                categoria=categoria,
+                proveedor=proveedor,
+                precio=Decimal(aleatorio.randint(10, 5000)),
+                stock=aleatorio.randint(0, 500),
+                descripcion='-',
+                sku=f'BENCH-{i}'
+            )
+            for i in range(options['productos'])
+        ], batch_size=500)
+
+        ahora = timezone.now()
+        segundos = options['dias'] * 86400
+        ventas = []
+        for i in range(options['ventas']):
+            # Distribución sesgada: pocos productos concentran las ventas
+            producto = productos[min(int(aleatorio.paretovariate(1.2)) - 1, len(productos) - 1)
+                                 if i % 2 else aleatorio.randrange(len(productos))]
+            ventas.append(Venta(
+                folio=f'BENCH-{i}',
+                fecha_venta=ahora - timedelta(seconds=aleatorio.randrange(segundos)),
+                total=producto.precio * aleatorio.randint(1, 3),
+                metodo_pago='efectivo',
+                estado='completada',
+                producto=producto,
+                cliente=cliente
+            ))
+        Venta.objects.bulk_create(ventas, batch_size=1000)
+        self.stdout.write(f"Sembrados {len(productos)} productos y {len(ventas)} ventas "
+                          f"({math.ceil(len(ventas) / max(len(productos), 1))} por producto en promedio)")
@@ -0,0 +1,106 @@
+import random
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.template import engines
+from django.template.loader import get_template
+from django.utils import timezone
+
+from app_Elektra import recibos
+from app_Elektra.models import Proveedor, Categoria, Producto, Vendedor, Cliente, Venta
+
+
+class Reversion(Exception):
+    """Deshace los datos sintéticos al terminar"""
+
+
+class Command(BaseCommand):
+    help = 'Mide recibos por segundo: sin precompilar, precompilados, en un pool de procesos y en zip'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ventas', type=int, default=5000)
+        parser.add_argument('--procesos', type=int, default=recibos.PROCESOS)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.sembrar(options['ventas'])
+                ventas = Venta.objects.filter(folio__startswith='BENCH-')
+                filas = list(recibos.datos_recibos(ventas))
+                total = len(filas)
+
+                # Referencia: leer y compilar la plantilla en cada recibo
+                fuente = get_template('ventas/recibo.html').template.source
+                inicio = time.perf_counter()
+                for fila in filas:
+                    engines['django'].from_string(fuente).render({
+                        'venta': fila, 'fecha': fila['fecha_venta'], 'cantidad': 1
+                    })
+                self.reportar('Compilando en cada recibo', total, time.perf_counter() - inicio)
+
+                inicio = time.perf_counter()
+                for fila in filas:
+                    recibos.renderizar_recibo(fila)
+                self.reportar('Plantilla precompilada', total, time.perf_counter() - inicio)
+
+                inicio = time.perf_counter()
+                for _ in recibos.renderizar_recibos(ventas, 1):
+                    pass
+                self.reportar('Precompilada + lectura por lotes', total, time.perf_counter() - inicio)
+
+                inicio = time.perf_counter()
+                for _ in recibos.renderizar_recibos(ventas, options['procesos']):
+                    pass
+                self.reportar(f"Pool de {options['procesos']} proceso(s)", total, time.perf_counter() - inicio)
+
+                inicio = time.perf_counter()
+                tamano = bloque = 0
+                for parte in recibos.zip_recibos(recibos.renderizar_recibos(ventas, options['procesos'])):
+                    tamano += len(parte)
+                    bloque = max(bloque, len(parte))
+                self.reportar('Zip en streaming (pool)', total, time.perf_counter() - inicio)
+                self.stdout.write(f"Zip: {tamano / 1024:.0f} KB, bloque máximo en memoria {bloque / 1024:.0f} KB")
+                raise Reversion
+        except Reversion:
+            self.stdout.write('Datos sintéticos revertidos')
+
+    def reportar(self, etiqueta, total, segundos):
+        self.stdout.write(f"{etiqueta:36} {segundos * 1000:9.1f} ms  {total / segundos:9.0f} recibos/s")
+
+    def sembrar(self, cantidad):
+        """Ventas sintéticas con bulk_create (sin señales)"""
+        aleatorio = random.Random(42)
+        proveedor = Proveedor.objects.create(
+            nombre='Benchmark', pais='MX', direccion='-', telefono='0', email='benchmark@example.com'
+        )
+        categoria = Categoria.objects.create(nombre='Benchmark')
+        vendedor = Vendedor.objects.create(nombre='Benchmark', telefono='0', email='benchmark-vendedor@example.com')
+        cliente = Cliente.objects.create(
+            nombre='Benchmark', telefono='0', email='benchmark-cliente@example.com', direccion='Calle 1\nCiudad'
+        )
+        productos = Producto.objects.bulk_create([
+            Producto(
+                nombre_producto=f'Producto {i}', categoria=categoria, proveedor=proveedor,
+                precio=Decimal(aleatorio.randint(10, 5000)), stock=100, descripcion='-', sku=f'BENCH-{i}'
+            )
+            for i in range(50)
+        ])
+        ahora = timezone.now()
+        ventas = []
+        for i in range(cantidad):
+            producto = aleatorio.choice(productos)
+            ventas.append(Venta(
+                folio=f'BENCH-{i}',
+                fecha_venta=ahora - timedelta(seconds=aleatorio.randrange(86400)),
+                total=producto.precio * aleatorio.randint(1, 3),
+                metodo_pago='efectivo',
+                estado='completada',
+                vendedor=vendedor,
+                producto=producto,
+                cliente=cliente
+            ))
+        Venta.objects.bulk_create(ventas, batch_size=1000)
+        self.stdout.write(f"Sembradas {cantidad} ventas")
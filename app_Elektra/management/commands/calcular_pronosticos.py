@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = 'Calcula velocidad de venta y días de inventario de todos los productos (NumPy)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dias', type=int, default=28, help='Días de historial para la velocidad de venta')
+        parser.add_argument('--lote', type=int, default=500, help='Filas por sentencia al guardar')
+
+    def handle(self, *args, **options):
+        try:
+            from app_Elektra.pronosticos import calcular_pronosticos, guardar_pronosticos
+        except ImportError as e:
+            raise CommandError(f"Este comando necesita NumPy ({e})")
+
+        if options['dias'] < 7:
+            raise CommandError('La ventana debe tener al menos 7 días')
+
+        inicio = time.perf_counter()
+        resultado = calcular_pronosticos(options['dias'])
+        calculado = time.perf_counter()
+        guardados = guardar_pronosticos(resultado, options['lote'])
+        fin = time.perf_counter()
+
+        self.stdout.write(f"Cálculo:  {(calculado - inicio) * 1000:.1f} ms")
+        self.stdout.write(f"Guardado: {(fin - calculado) * 1000:.1f} ms")
+        self.stdout.write(self.style.SUCCESS(f"{guardados} pronóstico(s) actualizados"))
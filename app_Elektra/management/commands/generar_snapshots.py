@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from app_Elektra.models import ReporteGuardado
+from app_Elektra.snapshots import actualizar_snapshot
+from app_Elektra.tareas import encolar
+
+
+class Command(BaseCommand):
+    help = 'Genera o actualiza los snapshots de todos los reportes guardados activos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--encolar', action='store_true',
+                            help='Encolar la generación para el worker en lugar de hacerla aquí')
+
+    def handle(self, *args, **options):
+        for reporte in ReporteGuardado.objects.filter(activo=True):
+            inicio, fin = reporte.rango()
+            fecha_inicio = inicio.isoformat() if inicio else ''
+            fecha_fin = fin.isoformat() if fin else ''
+
+            if options['encolar']:
+                tarea = encolar('generar_snapshot_reporte', unica=True,
+                                fecha_inicio=fecha_inicio, fecha_fin=fecha_fin)
+                self.stdout.write(f'{reporte.nombre}: tarea #{tarea.id}')
+            else:
+                snapshot = actualizar_snapshot(fecha_inicio, fecha_fin)
+                self.stdout.write(f'{reporte.nombre}: {snapshot.total_count} venta(s) en {snapshot.archivo}')
@@ -0,0 +1,21 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'Crea las carpetas de media y snapshots (paso único de despliegue)'
+
+    def handle(self, *args, **options):
+        carpetas = [settings.MEDIA_ROOT, settings.SNAPSHOTS_ROOT]
+        carpetas += [os.path.join(settings.MEDIA_ROOT, nombre) for nombre in settings.MEDIA_SUBCARPETAS]
+
+        creadas = 0
+        for carpeta in carpetas:
+            if not os.path.isdir(carpeta):
+                os.makedirs(carpeta)
+                creadas += 1
+                self.stdout.write(f"Creada: {carpeta}")
+
+        self.stdout.write(self.style.SUCCESS(f"{creadas} carpeta(s) creada(s), {len(carpetas) - creadas} ya existían"))
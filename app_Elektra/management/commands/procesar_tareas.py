@@ -0,0 +1,90 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from app_Elektra.tareas import (
+    VIGENCIA_CONTADORES, reclamar_tareas, rescatar_tareas, purgar_tareas, ejecutar_tarea,
+    programar_contadores
+)
+
+
+def _inicializar_proceso():
+    django.setup()
+    connections.close_all()
+
+
+class Command(BaseCommand):
+    help = 'Ejecuta las tareas en segundo plano de la tabla Tarea'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hilos', type=int, default=2, help='Tamaño del pool de hilos')
+        parser.add_argument('--procesos', type=int, default=0,
+                            help='Usar un pool de procesos de este tamaño en lugar de hilos')
+        parser.add_argument('--intervalo', type=float, default=1.0,
+                            help='Segundos de espera cuando no hay tareas')
+        parser.add_argument('--una-vez', action='store_true',
+                            help='Procesar lo pendiente y terminar')
+        parser.add_argument('--rescatar', type=int, default=30,
+                            help='Minutos tras los que una tarea en proceso se considera abandonada')
+        parser.add_argument('--purgar', type=int, default=7,
+                            help='Días que se conservan las tareas terminadas')
+        parser.add_argument('--contadores', type=float, default=VIGENCIA_CONTADORES,
+                            help='Segundos entre reconstrucciones de los contadores del dashboard '
+                                 '(0 para no programarlas)')
+
+    def handle(self, *args, **options):
+        rescatadas = rescatar_tareas(options['rescatar'])
+        if rescatadas:
+            self.stdout.write(f'{rescatadas} tarea(s) abandonada(s) devueltas a la cola')
+        purgadas = purgar_tareas(options['purgar'])
+        if purgadas:
+            self.stdout.write(f'{purgadas} tarea(s) terminada(s) eliminadas')
+
+        if options['procesos']:
+            # Los procesos hijos no deben heredar la conexión abierta
+            connections.close_all()
+            pool = ProcessPoolExecutor(options['procesos'], initializer=_inicializar_proceso)
+            tamano = options['procesos']
+        else:
+            pool = ThreadPoolExecutor(options['hilos'])
+            tamano = options['hilos']
+
+        en_curso = {}
+        procesadas = 0
+        siguiente_contadores = 0
+        try:
+            while True:
+                # Los contadores del dashboard los programa el worker, no las vistas
+                if options['contadores'] and time.monotonic() >= siguiente_contadores:
+                    programar_contadores(options['contadores'])
+                    siguiente_contadores = time.monotonic() + options['contadores']
+
+                libres = tamano - len(en_curso)
+                if libres > 0:
+                    for tarea_id in reclamar_tareas(libres):
+                        en_curso[pool.submit(ejecutar_tarea, tarea_id)] = tarea_id
+
+                if not en_curso:
+                    if options['una_vez']:
+                        break
+                    time.sleep(options['intervalo'])
+                    continue
+
+                terminadas, _ = wait(en_curso, timeout=options['intervalo'], return_when=FIRST_COMPLETED)
+                for futuro in terminadas:
+                    tarea_id = en_curso.pop(futuro)
+                    procesadas += 1
+                    try:
+                        estado = futuro.result()
+                    except Exception as e:
+                        estado = f'error del worker: {e}'
+                    self.stdout.write(f'Tarea #{tarea_id}: {estado}')
+        except KeyboardInterrupt:
+            self.stdout.write('Deteniendo worker...')
+        finally:
+            pool.shutdown(wait=True)
+
+        self.stdout.write(self.style.SUCCESS(f'{procesadas} tarea(s) procesada(s)'))
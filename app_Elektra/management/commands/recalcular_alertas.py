@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from app_Elektra.alertas import recalcular_alertas
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye el conjunto de alertas de reorden a partir del stock actual'
+
+    def handle(self, *args, **options):
+        total = recalcular_alertas()
+        self.stdout.write(self.style.SUCCESS(f"{total} alerta(s) de reorden activas"))
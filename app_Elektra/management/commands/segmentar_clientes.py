@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = 'Calcula la segmentación RFM de los clientes (solo los que tienen ventas nuevas, salvo --completo)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--completo', action='store_true',
+                            help='Reprocesar todas las ventas, no solo las posteriores a la última corrida')
+        parser.add_argument('--actualizar-tipo', action='store_true',
+                            help='Cambiar tipo_cliente entre regular y premium según la segmentación')
+        parser.add_argument('--lote', type=int, default=500, help='Filas por sentencia al guardar')
+
+    def handle(self, *args, **options):
+        try:
+            from app_Elektra.segmentacion import segmentar_clientes
+        except ImportError as e:
+            raise CommandError(f"Este comando necesita NumPy ({e})")
+
+        inicio = time.perf_counter()
+        resumen = segmentar_clientes(
+            completo=options['completo'],
+            actualizar_tipo=options['actualizar_tipo'],
+            tamano_lote=options['lote']
+        )
+        fin = time.perf_counter()
+
+        tipo = 'completa' if resumen['completa'] else 'incremental'
+        self.stdout.write(f"Corrida {tipo}: {(fin - inicio) * 1000:.1f} ms")
+        self.stdout.write(f"Clientes con ventas reprocesadas: {resumen['clientes_procesados']}")
+        self.stdout.write(f"Segmentos cambiados: {resumen['segmentos_cambiados']}")
+        if options['actualizar_tipo']:
+            self.stdout.write(f"Tipos de cliente actualizados: {resumen['tipos_actualizados']}")
+        self.stdout.write(self.style.SUCCESS(f"{resumen['clientes_segmentados']} cliente(s) segmentados"))
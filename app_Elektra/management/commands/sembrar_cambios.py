@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from app_Elektra.cambios import sembrar_registro
+
+
+class Command(BaseCommand):
+    help = 'Carga el estado actual de todas las tablas en el registro de cambios'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=1000, help='Tamaño de lote para bulk_create')
+
+    def handle(self, *args, **options):
+        total = sembrar_registro(options['lote'])
+        self.stdout.write(self.style.SUCCESS(f'{total} registro(s) cargados en el registro de cambios'))
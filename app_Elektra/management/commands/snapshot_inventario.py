@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from app_Elektra.inventario import tomar_snapshot
+from app_Elektra.tareas import encolar
+
+
+class Command(BaseCommand):
+    help = 'Guarda el valor actual del inventario por categoría y proveedor (para programarlo con cron)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--descripcion', default='', help='Texto para identificar el snapshot (ej. "Cierre de mes")')
+        parser.add_argument('--encolar', action='store_true',
+                            help='Encolar el snapshot para el worker en lugar de tomarlo aquí')
+
+    def handle(self, *args, **options):
+        if options['encolar']:
+            tarea = encolar('snapshot_inventario', descripcion=options['descripcion'])
+            self.stdout.write(f'Snapshot en cola: tarea #{tarea.id}')
+            return
+
+        snapshot = tomar_snapshot(options['descripcion'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Snapshot #{snapshot.id}: {snapshot.productos} producto(s), '
+            f'{snapshot.unidades} unidad(es), ${snapshot.valor}'
+        ))
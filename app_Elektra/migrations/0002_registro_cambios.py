@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:34
+
+import django.core.serializers.json
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_Elektra', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RegistroCambio',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('modelo', models.CharField(max_length=50)),
+                ('objeto_id', models.BigIntegerField()),
+                ('operacion', models.CharField(choices=[('guardado', 'Guardado'), ('borrado', 'Borrado')], max_length=10)),
+                ('datos', models.JSONField(blank=True, encoder=django.core.serializers.json.DjangoJSONEncoder, null=True)),
+                ('fecha', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Registro de cambio',
+                'verbose_name_plural': 'Registro de cambios',
+                'ordering': ['id'],
+                'constraints': [models.UniqueConstraint(fields=('modelo', 'objeto_id'), name='registro_cambio_unico')],
+            },
+        ),
+    ]
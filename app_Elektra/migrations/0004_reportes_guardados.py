@@ -0,0 +1,60 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:42
+
+from django.db import migrations, models
+
+
+def crear_reportes_frecuentes(apps, schema_editor):
+    ReporteGuardado = apps.get_model('app_Elektra', 'ReporteGuardado')
+    for nombre, periodo in [
+        ('Mes actual', 'mes_actual'),
+        ('Mes anterior', 'mes_anterior'),
+        ('Año actual', 'anio_actual'),
+    ]:
+        ReporteGuardado.objects.create(nombre=nombre, periodo=periodo)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_Elektra', '0003_tareas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReporteGuardado',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=100)),
+                ('periodo', models.CharField(choices=[('mes_actual', 'Mes actual'), ('mes_anterior', 'Mes anterior'), ('anio_actual', 'Año actual'), ('personalizado', 'Rango personalizado')], default='personalizado', max_length=20)),
+                ('fecha_inicio', models.DateField(blank=True, null=True)),
+                ('fecha_fin', models.DateField(blank=True, null=True)),
+                ('activo', models.BooleanField(default=True)),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Reporte guardado',
+                'verbose_name_plural': 'Reportes guardados',
+                'ordering': ['nombre'],
+            },
+        ),
+        migrations.CreateModel(
+            name='SnapshotReporte',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('clave', models.CharField(db_index=True, max_length=64)),
+                ('fecha_inicio', models.DateField(blank=True, null=True)),
+                ('fecha_fin', models.DateField(blank=True, null=True)),
+                ('ultima_venta_id', models.BigIntegerField(default=0)),
+                ('ultimo_cambio_id', models.BigIntegerField(default=0)),
+                ('total_count', models.PositiveIntegerField(default=0)),
+                ('archivo', models.CharField(max_length=255)),
+                ('fecha_generacion', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Snapshot de reporte',
+                'verbose_name_plural': 'Snapshots de reportes',
+                'ordering': ['-fecha_generacion'],
+            },
+        ),
+        migrations.RunPython(crear_reportes_frecuentes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:44
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_Elektra', '0004_reportes_guardados'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='venta',
+            name='fecha_venta',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now),
+        ),
+    ]
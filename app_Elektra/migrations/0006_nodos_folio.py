@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:48
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_Elektra', '0005_indice_fecha_venta'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NodoFolio',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('numero', models.PositiveSmallIntegerField(unique=True)),
+                ('token', models.CharField(max_length=32)),
+                ('host', models.CharField(blank=True, max_length=255)),
+                ('pid', models.PositiveIntegerField(default=0)),
+                ('fecha_renovacion', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name': 'Nodo de folios',
+                'verbose_name_plural': 'Nodos de folios',
+                'ordering': ['numero'],
+            },
+        ),
+    ]
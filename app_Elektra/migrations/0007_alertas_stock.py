@@ -0,0 +1,60 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:51
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def crear_alertas_iniciales(apps, schema_editor):
+    # Mismo umbral que tenían las vistas (stock < 10) mientras nadie lo cambie
+    Producto = apps.get_model('app_Elektra', 'Producto')
+    AlertaStock = apps.get_model('app_Elektra', 'AlertaStock')
+    AlertaStock.objects.bulk_create([
+        AlertaStock(
+            producto_id=producto_id,
+            proveedor_id=proveedor_id,
+            stock=stock,
+            umbral=10,
+            nivel='agotado' if stock <= 0 else 'bajo'
+        )
+        for producto_id, proveedor_id, stock in
+        Producto.objects.filter(stock__lt=10).values_list('id', 'proveedor_id', 'stock')
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_Elektra', '0006_nodos_folio'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='categoria',
+            name='stock_minimo',
+            field=models.PositiveIntegerField(default=10, help_text='Por debajo de esta cantidad los productos generan alerta de reorden'),
+        ),
+        migrations.AddField(
+            model_name='producto',
+            name='stock_minimo',
+            field=models.PositiveIntegerField(blank=True, help_text='Vacío para usar el stock mínimo de la categoría', null=True),
+        ),
+        migrations.CreateModel(
+            name='AlertaStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stock', models.IntegerField()),
+                ('umbral', models.PositiveIntegerField()),
+                ('nivel', models.CharField(choices=[('bajo', 'Stock bajo'), ('agotado', 'Agotado')], max_length=10)),
+                ('fecha', models.DateTimeField(auto_now=True)),
+                ('producto', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='alerta', to='app_Elektra.producto')),
+                ('proveedor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='alertas_stock', to='app_Elektra.proveedor')),
+            ],
+            options={
+                'verbose_name': 'Alerta de stock',
+                'verbose_name_plural': 'Alertas de stock',
+                'ordering': ['stock'],
+                'indexes': [models.Index(fields=['nivel', 'stock'], name='alerta_nivel_stock_idx')],
+            },
+        ),
+        migrations.RunPython(crear_alertas_iniciales, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:53
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_Elektra', '0007_alertas_stock'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PronosticoProducto',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('media_7d', models.FloatField(default=0)),
+                ('media_28d', models.FloatField(default=0)),
+                ('velocidad', models.FloatField(default=0, help_text='Media móvil exponencial de unidades por día')),
+                ('dias_restantes', models.FloatField(blank=True, null=True)),
+                ('fecha_agotamiento', models.DateField(blank=True, null=True)),
+                ('fecha_calculo', models.DateTimeField(default=django.utils.timezone.now)),
+                ('producto', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='pronostico', to='app_Elektra.producto')),
+            ],
+            options={
+                'verbose_name': 'Pronóstico de producto',
+                'verbose_name_plural': 'Pronósticos de productos',
+                'ordering': ['fecha_agotamiento'],
+            },
+        ),
+    ]
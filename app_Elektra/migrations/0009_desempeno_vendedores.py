@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:57
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_Elektra', '0008_pronosticos'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TablaVendedores',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha_inicio', models.DateField()),
+                ('fecha_fin', models.DateField()),
+                ('total_ingresos', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('total_tickets', models.PositiveIntegerField(default=0)),
+                ('fecha_calculo', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Tabla de vendedores',
+                'verbose_name_plural': 'Tablas de vendedores',
+                'ordering': ['-fecha_inicio'],
+                'constraints': [models.UniqueConstraint(fields=('fecha_inicio', 'fecha_fin'), name='tabla_vendedores_periodo_unico')],
+            },
+        ),
+        migrations.CreateModel(
+            name='DesempenoVendedor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('posicion', models.PositiveIntegerField()),
+                ('ingresos', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('tickets', models.PositiveIntegerField()),
+                ('ticket_promedio', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('participacion', models.FloatField(help_text='Porcentaje de los ingresos del periodo')),
+                ('tasa_comision', models.DecimalField(decimal_places=4, max_digits=5)),
+                ('comision', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('vendedor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='desempenos', to='app_Elektra.vendedor')),
+                ('tabla', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='filas', to='app_Elektra.tablavendedores')),
+            ],
+            options={
+                'verbose_name': 'Desempeño de vendedor',
+                'verbose_name_plural': 'Desempeño de vendedores',
+                'ordering': ['posicion'],
+            },
+        ),
+    ]
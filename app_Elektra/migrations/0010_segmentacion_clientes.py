@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:59
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_Elektra', '0009_desempeno_vendedores'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EjecucionSegmentacion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha_corte', models.DateTimeField()),
+                ('completa', models.BooleanField(default=False)),
+                ('clientes_procesados', models.PositiveIntegerField(default=0)),
+                ('segmentos_cambiados', models.PositiveIntegerField(default=0)),
+                ('tipos_actualizados', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Ejecución de segmentación',
+                'verbose_name_plural': 'Ejecuciones de segmentación',
+                'ordering': ['-fecha_corte'],
+            },
+        ),
+        migrations.CreateModel(
+            name='SegmentoCliente',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ultima_compra', models.DateTimeField()),
+                ('frecuencia', models.PositiveIntegerField()),
+                ('monto', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('recencia_score', models.PositiveSmallIntegerField()),
+                ('frecuencia_score', models.PositiveSmallIntegerField()),
+                ('monto_score', models.PositiveSmallIntegerField()),
+                ('segmento', models.CharField(choices=[('campeon', 'Campeón'), ('leal', 'Leal'), ('nuevo', 'Nuevo'), ('potencial', 'Potencial'), ('en_riesgo', 'En riesgo'), ('perdido', 'Perdido')], max_length=20)),
+                ('fecha_calculo', models.DateTimeField(default=django.utils.timezone.now)),
+                ('cliente', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='segmento', to='app_Elektra.cliente')),
+            ],
+            options={
+                'verbose_name': 'Segmento de cliente',
+                'verbose_name_plural': 'Segmentos de clientes',
+                'ordering': ['-monto'],
+                'indexes': [models.Index(fields=['segmento'], name='segmento_cliente_idx')],
+            },
+        ),
+    ]
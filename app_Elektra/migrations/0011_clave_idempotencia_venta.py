@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_Elektra', '0010_segmentacion_clientes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='venta',
+            name='clave_idempotencia',
+            field=models.CharField(blank=True, max_length=64, null=True, unique=True),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:07
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_Elektra', '0011_clave_idempotencia_venta'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VentaArchivada',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('folio', models.CharField(max_length=50, unique=True)),
+                ('fecha_venta', models.DateTimeField(db_index=True)),
+                ('total', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('metodo_pago', models.CharField(max_length=50)),
+                ('estado', models.CharField(max_length=50)),
+                ('notas', models.TextField(blank=True, null=True)),
+                ('clave_idempotencia', models.CharField(blank=True, max_length=64, null=True, unique=True)),
+                ('fecha_creacion', models.DateTimeField()),
+                ('fecha_actualizacion', models.DateTimeField()),
+                ('fecha_archivado', models.DateTimeField(default=django.utils.timezone.now)),
+                ('cliente', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='app_Elektra.cliente')),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='app_Elektra.producto')),
+                ('vendedor', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='app_Elektra.vendedor')),
+            ],
+            options={
+                'verbose_name': 'Venta archivada',
+                'verbose_name_plural': 'Ventas archivadas',
+                'ordering': ['-fecha_venta'],
+            },
+        ),
+    ]
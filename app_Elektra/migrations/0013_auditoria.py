@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:09
+
+import app_Elektra.models
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_Elektra', '0012_ventas_archivadas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Auditoria',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('modelo', models.CharField(max_length=50)),
+                ('objeto_id', models.BigIntegerField()),
+                ('operacion', models.CharField(choices=[('creado', 'Creado'), ('modificado', 'Modificado'), ('borrado', 'Borrado')], max_length=10)),
+                ('cambios', models.JSONField(encoder=app_Elektra.models.JSONCompacto)),
+                ('usuario_id', models.IntegerField(blank=True, null=True)),
+                ('fecha', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name': 'Auditoría',
+                'verbose_name_plural': 'Auditoría',
+                'ordering': ['-id'],
+                'indexes': [models.Index(fields=['modelo', 'objeto_id'], name='auditoria_objeto_idx')],
+            },
+        ),
+    ]
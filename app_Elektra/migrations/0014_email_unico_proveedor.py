@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:19
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def resolver_emails_repetidos(apps, schema_editor):
+    """
+    Antes del índice único: el proveedor más antiguo conserva el email y a
+    los demás se les agrega +<id> a la parte local (usuario+15@dominio), de
+    modo que siguen siendo direcciones válidas y se pueden corregir a mano.
+    """
+    Proveedor = apps.get_model('app_Elektra', 'Proveedor')
+    repetidos = (
+        Proveedor.objects.values('email').annotate(total=Count('id')).filter(total__gt=1)
+        .values_list('email', flat=True)
+    )
+    existentes = set(Proveedor.objects.values_list('email', flat=True))
+    for email in list(repetidos):
+        local, arroba, dominio = email.rpartition('@')
+        if not arroba:
+            local, dominio = email, ''
+        for proveedor in Proveedor.objects.filter(email=email).order_by('id')[1:]:
+            sufijo = f'+{proveedor.pk}{arroba}{dominio}'
+            nuevo = local[:100 - len(sufijo)] + sufijo
+            while nuevo in existentes:
+                sufijo = '+' + sufijo
+                nuevo = local[:100 - len(sufijo)] + sufijo
+            existentes.add(nuevo)
+            Proveedor.objects.filter(pk=proveedor.pk).update(email=nuevo)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_Elektra', '0013_auditoria'),
+    ]
+
+    operations = [
+        migrations.RunPython(resolver_emails_repetidos, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='proveedor',
+            name='email',
+            field=models.EmailField(max_length=100, unique=True),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:21
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_Elektra', '0014_email_unico_proveedor'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cliente',
+            index=models.Index(django.db.models.functions.text.Lower('nombre'), name='cliente_nombre_busqueda_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='producto',
+            index=models.Index(django.db.models.functions.text.Lower('nombre_producto'), name='producto_nombre_busqueda_idx'),
+        ),
+    ]
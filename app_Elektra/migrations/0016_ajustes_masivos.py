@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:24
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_Elektra', '0015_indices_busqueda'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AjusteMasivo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('campo', models.CharField(choices=[('precio', 'Precio'), ('stock', 'Stock')], max_length=10)),
+                ('modo', models.CharField(choices=[('porcentaje', 'Porcentaje'), ('absoluto', 'Cantidad fija')], max_length=10)),
+                ('valor', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('descripcion', models.CharField(blank=True, max_length=200)),
+                ('productos', models.PositiveIntegerField(default=0)),
+                ('total_antes', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('total_despues', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('usuario_id', models.IntegerField(blank=True, null=True)),
+                ('fecha', models.DateTimeField(default=django.utils.timezone.now)),
+                ('fecha_deshecho', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Ajuste masivo',
+                'verbose_name_plural': 'Ajustes masivos',
+                'ordering': ['-fecha'],
+            },
+        ),
+        migrations.CreateModel(
+            name='AjusteMasivoDetalle',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('anterior', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('nuevo', models.DecimalField(decimal_places=2, max_digits=12, null=True)),
+                ('ajuste', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='detalle', to='app_Elektra.ajustemasivo')),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='app_Elektra.producto')),
+            ],
+            options={
+                'verbose_name': 'Detalle de ajuste masivo',
+                'verbose_name_plural': 'Detalles de ajustes masivos',
+                'constraints': [models.UniqueConstraint(fields=('ajuste', 'producto'), name='ajuste_detalle_unico')],
+            },
+        ),
+    ]
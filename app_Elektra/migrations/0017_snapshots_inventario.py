@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:27
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_Elektra', '0016_ajustes_masivos'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SnapshotInventario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('descripcion', models.CharField(blank=True, max_length=200)),
+                ('productos', models.PositiveIntegerField(default=0)),
+                ('unidades', models.BigIntegerField(default=0)),
+                ('valor', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('fecha', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name': 'Snapshot de inventario',
+                'verbose_name_plural': 'Snapshots de inventario',
+                'ordering': ['-fecha'],
+            },
+        ),
+        migrations.CreateModel(
+            name='SnapshotInventarioGrupo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('categoria_id', models.IntegerField()),
+                ('categoria_nombre', models.CharField(max_length=100)),
+                ('proveedor_id', models.IntegerField()),
+                ('proveedor_nombre', models.CharField(max_length=100)),
+                ('productos', models.PositiveIntegerField(default=0)),
+                ('unidades', models.BigIntegerField(default=0)),
+                ('valor', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('snapshot', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='grupos', to='app_Elektra.snapshotinventario')),
+            ],
+            options={
+                'verbose_name': 'Grupo de snapshot de inventario',
+                'verbose_name_plural': 'Grupos de snapshots de inventario',
+                'constraints': [models.UniqueConstraint(fields=('snapshot', 'categoria_id', 'proveedor_id'), name='snapshot_inventario_grupo_unico')],
+            },
+        ),
+    ]
@@ -0,0 +1,90 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:46
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_Elektra', '0017_snapshots_inventario'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Sucursal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('codigo', models.CharField(help_text='Clave corta de la sucursal; es la llave en SUCURSALES_BASES y no se cambia después', max_length=20, unique=True)),
+                ('nombre', models.CharField(max_length=100)),
+                ('direccion', models.TextField(blank=True)),
+                ('activa', models.BooleanField(default=True)),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Sucursal',
+                'verbose_name_plural': 'Sucursales',
+                'ordering': ['nombre'],
+            },
+        ),
+        migrations.CreateModel(
+            name='VentaSucursal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sucursal_id', models.IntegerField()),
+                ('folio', models.CharField(max_length=50, unique=True)),
+                ('clave_idempotencia', models.CharField(max_length=64, unique=True)),
+                ('fecha_venta', models.DateTimeField()),
+                ('producto_id', models.IntegerField()),
+                ('cliente_id', models.IntegerField()),
+                ('vendedor_id', models.IntegerField()),
+                ('cantidad', models.PositiveIntegerField()),
+                ('total', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('metodo_pago', models.CharField(max_length=50)),
+                ('notas', models.TextField(blank=True)),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('consolidada', 'Consolidada'), ('rechazada', 'Rechazada')], default='pendiente', max_length=20)),
+                ('error', models.CharField(blank=True, max_length=200)),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Venta de sucursal',
+                'verbose_name_plural': 'Ventas de sucursal',
+            },
+        ),
+        migrations.CreateModel(
+            name='StockSucursal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stock', models.IntegerField(default=0)),
+                ('fecha_actualizacion', models.DateTimeField(auto_now=True)),
+                ('producto', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='existencias_sucursal', to='app_Elektra.producto')),
+                ('sucursal', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='existencias', to='app_Elektra.sucursal')),
+            ],
+            options={
+                'verbose_name': 'Stock por sucursal',
+                'verbose_name_plural': 'Stock por sucursal',
+            },
+        ),
+        migrations.AddField(
+            model_name='venta',
+            name='sucursal',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='ventas', to='app_Elektra.sucursal'),
+        ),
+        migrations.AddField(
+            model_name='ventaarchivada',
+            name='sucursal',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='app_Elektra.sucursal'),
+        ),
+        migrations.AddIndex(
+            model_name='venta',
+            index=models.Index(fields=['sucursal', '-fecha_venta'], name='venta_sucursal_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ventasucursal',
+            index=models.Index(fields=['estado', 'id'], name='venta_sucursal_estado_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='stocksucursal',
+            constraint=models.UniqueConstraint(fields=('sucursal', 'producto'), name='stock_sucursal_unico'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:50
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def registrar_precios_actuales(apps, schema_editor):
+    """Un primer registro por producto: el precio actual desde su creación"""
+    Producto = apps.get_model('app_Elektra', 'Producto')
+    PrecioHistorico = apps.get_model('app_Elektra', 'PrecioHistorico')
+    lote = []
+    for producto_id, precio, fecha_creacion in (
+        Producto.objects.order_by('id').values_list('id', 'precio', 'fecha_creacion').iterator(chunk_size=2000)
+    ):
+        lote.append(PrecioHistorico(producto_id=producto_id, precio=precio, vigente_desde=fecha_creacion))
+        if len(lote) == 2000:
+            PrecioHistorico.objects.bulk_create(lote)
+            lote = []
+    PrecioHistorico.objects.bulk_create(lote)
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_Elektra', '0018_sucursales'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PrecioHistorico',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('precio', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('vigente_desde', models.DateTimeField(default=django.utils.timezone.now)),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='historial_precios', to='app_Elektra.producto')),
+            ],
+            options={
+                'verbose_name': 'Precio histórico',
+                'verbose_name_plural': 'Historial de precios',
+                'ordering': ['-vigente_desde'],
+                'indexes': [models.Index(fields=['producto', '-vigente_desde'], name='precio_producto_vigencia_idx')],
+            },
+        ),
+        migrations.RunPython(registrar_precios_actuales, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,8 @@
 from django.db import models
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models.functions import Lower
 from django.utils import timezone
+from datetime import timedelta
 
 # =====================================================
 # TABLA: PROVEEDORES
@@ -9,7 +12,7 @@ class Proveedor(models.Model):
     pais = models.CharField(max_length=50)
     direccion = models.TextField()
     telefono = models.CharField(max_length=20)
-    email = models.EmailField(max_length=100)
+    email = models.EmailField(max_length=100, unique=True)
     fecha_registro = models.DateField(default=timezone.now)
     activo = models.BooleanField(default=True)
     
@@ -57,6 +60,12 @@ class Categoria(models.Model):
         help_text='Color en formato HEX (#RRGGBB)'
     )
     
+    # Umbral de reorden para los productos que no definen el suyo
+    stock_minimo = models.PositiveIntegerField(
+        default=10,
+        help_text='Por debajo de esta cantidad los productos generan alerta de reorden'
+    )
+    
     fecha_creacion = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
@@ -80,6 +89,13 @@ class Producto(models.Model):
     proveedor = models.ForeignKey(Proveedor, on_delete=models.CASCADE, related_name="productos")
     sku = models.CharField(max_length=50, unique=True)
     
+    # Umbral propio de reorden (vacío = el de su categoría)
+    stock_minimo = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        help_text='Vacío para usar el stock mínimo de la categoría'
+    )
+    
     # Imagen del producto
     imagen = models.ImageField(
         upload_to='productos/',
@@ -99,6 +115,10 @@ class Producto(models.Model):
         ordering = ['-fecha_creacion']
         verbose_name = 'Producto'
         verbose_name_plural = 'Productos'
+        indexes = [
+            # Autocompletado por prefijo sin distinguir mayúsculas
+            models.Index(Lower('nombre_producto'), name='producto_nombre_busqueda_idx'),
+        ]
 
 
 # =====================================================
@@ -173,6 +193,102 @@ class Cliente(models.Model):
         ordering = ['nombre']
         verbose_name = 'Cliente'
         verbose_name_plural = 'Clientes'
+        indexes = [
+            # Autocompletado por prefijo sin distinguir mayúsculas
+            models.Index(Lower('nombre'), name='cliente_nombre_busqueda_idx'),
+        ]
+
+
+# =====================================================
+# TABLA: SUCURSALES
+# =====================================================
+class Sucursal(models.Model):
+    """
+    Tienda de la cadena. Con SUCURSALES_BASES en settings, el stock y las
+    ventas capturadas de la sucursal viven en su propia base (ver router.py).
+    """
+    codigo = models.CharField(
+        max_length=20,
+        unique=True,
+        help_text='Clave corta de la sucursal; es la llave en SUCURSALES_BASES y no se cambia después'
+    )
+    nombre = models.CharField(max_length=100)
+    direccion = models.TextField(blank=True)
+    activa = models.BooleanField(default=True)
+    
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.nombre
+    
+    class Meta:
+        ordering = ['nombre']
+        verbose_name = 'Sucursal'
+        verbose_name_plural = 'Sucursales'
+
+
+class StockSucursal(models.Model):
+    """
+    Unidades de un producto que están en una sucursal. Producto.stock sigue
+    siendo la existencia total de la cadena; lo que no está repartido en
+    sucursales está en el almacén central. Las llaves foráneas no tienen
+    restricción en la base de datos porque, con bases separadas, la tabla
+    vive en la base de la sucursal y Sucursal y Producto no.
+    """
+    sucursal = models.ForeignKey(Sucursal, on_delete=models.CASCADE, related_name='existencias', db_constraint=False)
+    producto = models.ForeignKey(Producto, on_delete=models.CASCADE, related_name='existencias_sucursal', db_constraint=False)
+    stock = models.IntegerField(default=0)
+    fecha_actualizacion = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.producto_id} en {self.sucursal_id}: {self.stock}"
+    
+    class Meta:
+        verbose_name = 'Stock por sucursal'
+        verbose_name_plural = 'Stock por sucursal'
+        constraints = [
+            # También es el índice de las consultas por sucursal
+            models.UniqueConstraint(fields=['sucursal', 'producto'], name='stock_sucursal_unico'),
+        ]
+
+
+class VentaSucursal(models.Model):
+    """
+    Venta capturada en la base propia de una sucursal (SUCURSALES_BASES),
+    pendiente de pasar a Venta. Guarda ids sin llave foránea: la tabla vive
+    en otra base. ingesta.consolidar_sucursal() la copia a Venta con la
+    misma clave de idempotencia y el mismo folio.
+    """
+    ESTADOS = [
+        ('pendiente', 'Pendiente'),
+        ('consolidada', 'Consolidada'),
+        ('rechazada', 'Rechazada'),
+    ]
+
+    sucursal_id = models.IntegerField()
+    folio = models.CharField(max_length=50, unique=True)
+    clave_idempotencia = models.CharField(max_length=64, unique=True)
+    fecha_venta = models.DateTimeField()
+    producto_id = models.IntegerField()
+    cliente_id = models.IntegerField()
+    vendedor_id = models.IntegerField()
+    cantidad = models.PositiveIntegerField()
+    total = models.DecimalField(max_digits=10, decimal_places=2)
+    metodo_pago = models.CharField(max_length=50)
+    notas = models.TextField(blank=True)
+    estado = models.CharField(max_length=20, choices=ESTADOS, default='pendiente')
+    error = models.CharField(max_length=200, blank=True)
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Venta {self.folio} ({self.estado})"
+    
+    class Meta:
+        verbose_name = 'Venta de sucursal'
+        verbose_name_plural = 'Ventas de sucursal'
+        indexes = [
+            models.Index(fields=['estado', 'id'], name='venta_sucursal_estado_idx'),
+        ]
 
 
 # =====================================================
@@ -180,7 +296,7 @@ class Cliente(models.Model):
 # =====================================================
 class Venta(models.Model):
     folio = models.CharField(max_length=50, unique=True)
-    fecha_venta = models.DateTimeField(default=timezone.now)
+    fecha_venta = models.DateTimeField(default=timezone.now, db_index=True)
     total = models.DecimalField(max_digits=10, decimal_places=2)
     metodo_pago = models.CharField(max_length=50)
     estado = models.CharField(max_length=50)
@@ -189,9 +305,16 @@ class Venta(models.Model):
     producto = models.ForeignKey(Producto, on_delete=models.CASCADE)
     cliente = models.ForeignKey(Cliente, on_delete=models.CASCADE)
     
+    # Vacía en las ventas del almacén central (y las anteriores a las sucursales)
+    sucursal = models.ForeignKey(Sucursal, on_delete=models.SET_NULL, null=True, blank=True, related_name='ventas')
+    
     # Notas adicionales
     notas = models.TextField(blank=True, null=True)
     
+    # Clave generada por el formulario o la terminal: un reintento con la
+    # misma clave no crea otra venta
+    clave_idempotencia = models.CharField(max_length=64, unique=True, null=True, blank=True)
+    
     fecha_creacion = models.DateTimeField(auto_now_add=True)
     fecha_actualizacion = models.DateTimeField(auto_now=True)
 
@@ -201,4 +324,593 @@ class Venta(models.Model):
     class Meta:
         ordering = ['-fecha_venta']
         verbose_name = 'Venta'
-        verbose_name_plural = 'Ventas'
\ No newline at end of file
+        verbose_name_plural = 'Ventas'
+        indexes = [
+            # Listas y reportes de una sucursal, de la venta más reciente a la más antigua
+            models.Index(fields=['sucursal', '-fecha_venta'], name='venta_sucursal_fecha_idx'),
+        ]
+
+
+# =====================================================
+# TABLA DE SINCRONIZACIÓN: REGISTRO DE CAMBIOS
+# =====================================================
+class RegistroCambio(models.Model):
+    """
+    Bitácora compactada de cambios para la sincronización incremental.
+    Solo se guarda la última operación de cada registro: al volver a
+    modificarse se borra la entrada anterior y se crea una nueva con un
+    id mayor, que funciona como cursor para los clientes.
+    """
+    OPERACIONES = [
+        ('guardado', 'Guardado'),
+        ('borrado', 'Borrado'),
+    ]
+
+    modelo = models.CharField(max_length=50)
+    objeto_id = models.BigIntegerField()
+    operacion = models.CharField(max_length=10, choices=OPERACIONES)
+    datos = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    fecha = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.modelo}:{self.objeto_id} ({self.operacion})"
+
+    class Meta:
+        ordering = ['id']
+        verbose_name = 'Registro de cambio'
+        verbose_name_plural = 'Registro de cambios'
+        constraints = [
+            models.UniqueConstraint(fields=['modelo', 'objeto_id'], name='registro_cambio_unico'),
+        ]
+
+
+# =====================================================
+# TABLA DE TAREAS EN SEGUNDO PLANO
+# =====================================================
+class Tarea(models.Model):
+    """
+    Cola de trabajos respaldada por la base de datos. El worker
+    (manage.py procesar_tareas) reclama las tareas pendientes, guarda su
+    resultado y reintenta las fallidas con espera exponencial.
+    """
+    ESTADOS = [
+        ('pendiente', 'Pendiente'),
+        ('en_proceso', 'En proceso'),
+        ('completada', 'Completada'),
+        ('fallida', 'Fallida'),
+    ]
+
+    nombre = models.CharField(max_length=100)
+    argumentos = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+    estado = models.CharField(max_length=20, choices=ESTADOS, default='pendiente')
+    intentos = models.PositiveIntegerField(default=0)
+    max_intentos = models.PositiveIntegerField(default=3)
+    ejecutar_despues = models.DateTimeField(default=timezone.now)
+
+    # Almacén de resultados
+    resultado = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    error = models.TextField(blank=True)
+
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    fecha_inicio = models.DateTimeField(null=True, blank=True)
+    fecha_fin = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.nombre} #{self.pk} ({self.estado})"
+
+    class Meta:
+        ordering = ['-fecha_creacion']
+        verbose_name = 'Tarea'
+        verbose_name_plural = 'Tareas'
+        indexes = [
+            models.Index(fields=['estado', 'ejecutar_despues'], name='tarea_pendientes_idx'),
+            models.Index(fields=['nombre', 'estado'], name='tarea_nombre_estado_idx'),
+        ]
+
+
+# =====================================================
+# TABLAS DE REPORTES PRECALCULADOS
+# =====================================================
+class ReporteGuardado(models.Model):
+    """Definición de un reporte de ventas que se consulta con frecuencia"""
+    PERIODOS = [
+        ('mes_actual', 'Mes actual'),
+        ('mes_anterior', 'Mes anterior'),
+        ('anio_actual', 'Año actual'),
+        ('personalizado', 'Rango personalizado'),
+    ]
+
+    nombre = models.CharField(max_length=100)
+    periodo = models.CharField(max_length=20, choices=PERIODOS, default='personalizado')
+    fecha_inicio = models.DateField(null=True, blank=True)
+    fecha_fin = models.DateField(null=True, blank=True)
+    activo = models.BooleanField(default=True)
+
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+
+    def rango(self, hoy=None):
+        """Fechas (inicio, fin) del periodo; los periodos relativos usan meses/años completos"""
+        hoy = hoy or timezone.localdate()
+        if self.periodo == 'mes_actual':
+            inicio = hoy.replace(day=1)
+            siguiente = (inicio + timedelta(days=32)).replace(day=1)
+            return inicio, siguiente - timedelta(days=1)
+        if self.periodo == 'mes_anterior':
+            fin = hoy.replace(day=1) - timedelta(days=1)
+            return fin.replace(day=1), fin
+        if self.periodo == 'anio_actual':
+            return hoy.replace(month=1, day=1), hoy.replace(month=12, day=31)
+        return self.fecha_inicio, self.fecha_fin
+
+    def __str__(self):
+        return self.nombre
+
+    class Meta:
+        ordering = ['nombre']
+        verbose_name = 'Reporte guardado'
+        verbose_name_plural = 'Reportes guardados'
+
+
+class SnapshotReporte(models.Model):
+    """
+    Resultado precalculado de un reporte, guardado como JSON comprimido.
+    La clave identifica los filtros y la marca de agua indica hasta qué
+    venta y qué cambio del registro de cambios está incluido.
+    """
+    clave = models.CharField(max_length=64, db_index=True)
+    fecha_inicio = models.DateField(null=True, blank=True)
+    fecha_fin = models.DateField(null=True, blank=True)
+
+    # Marca de agua de los datos incluidos
+    ultima_venta_id = models.BigIntegerField(default=0)
+    ultimo_cambio_id = models.BigIntegerField(default=0)
+
+    total_count = models.PositiveIntegerField(default=0)
+    archivo = models.CharField(max_length=255)
+    fecha_generacion = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Snapshot {self.fecha_inicio or 'inicio'} - {self.fecha_fin or 'hoy'}"
+
+    class Meta:
+        ordering = ['-fecha_generacion']
+        verbose_name = 'Snapshot de reporte'
+        verbose_name_plural = 'Snapshots de reportes'
+
+
+# =====================================================
+# NODOS DEL GENERADOR DE FOLIOS
+# =====================================================
+class NodoFolio(models.Model):
+    """
+    Número de nodo (0-1023) reservado por un proceso que genera folios.
+    Dos procesos nunca comparten número mientras su reserva esté vigente,
+    por eso sus folios no pueden coincidir.
+    """
+    numero = models.PositiveSmallIntegerField(unique=True)
+    token = models.CharField(max_length=32)
+    host = models.CharField(max_length=255, blank=True)
+    pid = models.PositiveIntegerField(default=0)
+    fecha_renovacion = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"Nodo {self.numero} ({self.host}:{self.pid})"
+
+    class Meta:
+        ordering = ['numero']
+        verbose_name = 'Nodo de folios'
+        verbose_name_plural = 'Nodos de folios'
+
+
+# =====================================================
+# ALERTAS DE REORDEN
+# =====================================================
+class AlertaStock(models.Model):
+    """
+    Conjunto vigente de productos por debajo de su stock mínimo. Se
+    mantiene al guardar cada producto, así el dashboard y el panel de
+    alertas lo leen directamente sin recorrer la tabla de productos.
+    """
+    NIVELES = [
+        ('bajo', 'Stock bajo'),
+        ('agotado', 'Agotado'),
+    ]
+
+    producto = models.OneToOneField(Producto, on_delete=models.CASCADE, related_name='alerta')
+    # Copia del proveedor del producto para agrupar las sugerencias de compra
+    proveedor = models.ForeignKey(Proveedor, on_delete=models.CASCADE, related_name='alertas_stock')
+    stock = models.IntegerField()
+    umbral = models.PositiveIntegerField()
+    nivel = models.CharField(max_length=10, choices=NIVELES)
+    fecha = models.DateTimeField(auto_now=True)
+
+    @property
+    def cantidad_sugerida(self):
+        """Unidades para volver al doble del stock mínimo"""
+        return max(self.umbral * 2 - self.stock, 1)
+
+    def __str__(self):
+        return f"{self.producto_id}: {self.stock}/{self.umbral} ({self.nivel})"
+
+    class Meta:
+        ordering = ['stock']
+        verbose_name = 'Alerta de stock'
+        verbose_name_plural = 'Alertas de stock'
+        indexes = [
+            models.Index(fields=['nivel', 'stock'], name='alerta_nivel_stock_idx'),
+        ]
+
+
+# =====================================================
+# PRONÓSTICO DE DEMANDA
+# =====================================================
+class PronosticoProducto(models.Model):
+    """
+    Velocidad de venta y agotamiento estimado de un producto, calculados
+    en lote por `manage.py calcular_pronosticos` sobre las ventas recientes.
+    """
+    producto = models.OneToOneField(Producto, on_delete=models.CASCADE, related_name='pronostico')
+
+    # Unidades vendidas por día
+    media_7d = models.FloatField(default=0)
+    media_28d = models.FloatField(default=0)
+    velocidad = models.FloatField(default=0, help_text='Media móvil exponencial de unidades por día')
+
+    # Vacíos cuando el producto no tiene ventas en la ventana
+    dias_restantes = models.FloatField(null=True, blank=True)
+    fecha_agotamiento = models.DateField(null=True, blank=True)
+
+    fecha_calculo = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"Pronóstico de {self.producto_id}: {self.velocidad:.2f}/día"
+
+    class Meta:
+        ordering = ['fecha_agotamiento']
+        verbose_name = 'Pronóstico de producto'
+        verbose_name_plural = 'Pronósticos de productos'
+
+
+# =====================================================
+# HISTORIAL DE PRECIOS
+# =====================================================
+class PrecioHistorico(models.Model):
+    """
+    Precio de un producto a partir de `vigente_desde` y hasta el siguiente
+    registro del mismo producto. Se escribe solo cuando el precio cambia;
+    el precio vigente en una fecha es la fila más reciente con
+    vigente_desde <= fecha (ver precios.py).
+    """
+    producto = models.ForeignKey(Producto, on_delete=models.CASCADE, related_name='historial_precios')
+    precio = models.DecimalField(max_digits=10, decimal_places=2)
+    vigente_desde = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.producto_id}: ${self.precio} desde {timezone.localtime(self.vigente_desde):%d/%m/%Y %H:%M}"
+
+    class Meta:
+        ordering = ['-vigente_desde']
+        verbose_name = 'Precio histórico'
+        verbose_name_plural = 'Historial de precios'
+        indexes = [
+            # Precio vigente en una fecha: búsqueda por (producto, vigente_desde)
+            models.Index(fields=['producto', '-vigente_desde'], name='precio_producto_vigencia_idx'),
+        ]
+
+
+# =====================================================
+# DESEMPEÑO DE VENDEDORES
+# =====================================================
+class TablaVendedores(models.Model):
+    """
+    Tabla de posiciones calculada para un periodo. Se borra cuando cambia
+    una venta con fecha dentro del periodo y se recalcula al consultarla.
+    """
+    fecha_inicio = models.DateField()
+    fecha_fin = models.DateField()
+    total_ingresos = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    total_tickets = models.PositiveIntegerField(default=0)
+    fecha_calculo = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Vendedores {self.fecha_inicio} - {self.fecha_fin}"
+
+    class Meta:
+        ordering = ['-fecha_inicio']
+        verbose_name = 'Tabla de vendedores'
+        verbose_name_plural = 'Tablas de vendedores'
+        constraints = [
+            models.UniqueConstraint(fields=['fecha_inicio', 'fecha_fin'], name='tabla_vendedores_periodo_unico'),
+        ]
+
+
+class DesempenoVendedor(models.Model):
+    tabla = models.ForeignKey(TablaVendedores, on_delete=models.CASCADE, related_name='filas')
+    vendedor = models.ForeignKey(Vendedor, on_delete=models.CASCADE, related_name='desempenos')
+    posicion = models.PositiveIntegerField()
+    ingresos = models.DecimalField(max_digits=14, decimal_places=2)
+    tickets = models.PositiveIntegerField()
+    ticket_promedio = models.DecimalField(max_digits=12, decimal_places=2)
+    participacion = models.FloatField(help_text='Porcentaje de los ingresos del periodo')
+    tasa_comision = models.DecimalField(max_digits=5, decimal_places=4)
+    comision = models.DecimalField(max_digits=12, decimal_places=2)
+
+    def __str__(self):
+        return f"#{self.posicion} {self.vendedor_id} ({self.ingresos})"
+
+    class Meta:
+        ordering = ['posicion']
+        verbose_name = 'Desempeño de vendedor'
+        verbose_name_plural = 'Desempeño de vendedores'
+
+
+# =====================================================
+# SEGMENTACIÓN RFM DE CLIENTES
+# =====================================================
+class SegmentoCliente(models.Model):
+    """
+    Recencia, frecuencia y monto de las compras completadas de un cliente,
+    con su calificación 1-5 en cada eje. Lo calcula por lotes
+    `manage.py segmentar_clientes`.
+    """
+    SEGMENTOS = [
+        ('campeon', 'Campeón'),
+        ('leal', 'Leal'),
+        ('nuevo', 'Nuevo'),
+        ('potencial', 'Potencial'),
+        ('en_riesgo', 'En riesgo'),
+        ('perdido', 'Perdido'),
+    ]
+
+    cliente = models.OneToOneField(Cliente, on_delete=models.CASCADE, related_name='segmento')
+
+    # Valores crudos: se recalculan solo para clientes con ventas nuevas
+    ultima_compra = models.DateTimeField()
+    frecuencia = models.PositiveIntegerField()
+    monto = models.DecimalField(max_digits=14, decimal_places=2)
+
+    # Calificaciones por quintil (5 = mejor)
+    recencia_score = models.PositiveSmallIntegerField()
+    frecuencia_score = models.PositiveSmallIntegerField()
+    monto_score = models.PositiveSmallIntegerField()
+    segmento = models.CharField(max_length=20, choices=SEGMENTOS)
+
+    fecha_calculo = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.cliente_id}: {self.rfm} ({self.segmento})"
+
+    @property
+    def rfm(self):
+        return f"{self.recencia_score}{self.frecuencia_score}{self.monto_score}"
+
+    class Meta:
+        ordering = ['-monto']
+        verbose_name = 'Segmento de cliente'
+        verbose_name_plural = 'Segmentos de clientes'
+        indexes = [
+            models.Index(fields=['segmento'], name='segmento_cliente_idx'),
+        ]
+
+
+class EjecucionSegmentacion(models.Model):
+    """
+    Una corrida de la segmentación. `fecha_corte` es la marca de agua:
+    la siguiente corrida solo reprocesa clientes con ventas modificadas
+    después de ella.
+    """
+    fecha_corte = models.DateTimeField()
+    completa = models.BooleanField(default=False)
+    clientes_procesados = models.PositiveIntegerField(default=0)
+    segmentos_cambiados = models.PositiveIntegerField(default=0)
+    tipos_actualizados = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"Segmentación {self.fecha_corte:%Y-%m-%d %H:%M}"
+
+    class Meta:
+        ordering = ['-fecha_corte']
+        verbose_name = 'Ejecución de segmentación'
+        verbose_name_plural = 'Ejecuciones de segmentación'
+
+
+# =====================================================
+# ARCHIVO DE VENTAS (PARTICIÓN FRÍA)
+# =====================================================
+class VentaArchivada(models.Model):
+    """
+    Ventas cerradas más antiguas que el horizonte de archivo, movidas desde
+    Venta por `manage.py archivar_ventas`. Conservan su id y sus columnas;
+    los reportes las consultan solo cuando el rango de fechas llega aquí.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    folio = models.CharField(max_length=50, unique=True)
+    fecha_venta = models.DateTimeField(db_index=True)
+    total = models.DecimalField(max_digits=10, decimal_places=2)
+    metodo_pago = models.CharField(max_length=50)
+    estado = models.CharField(max_length=50)
+
+    vendedor = models.ForeignKey(Vendedor, on_delete=models.SET_NULL, null=True, related_name='+')
+    producto = models.ForeignKey(Producto, on_delete=models.CASCADE, related_name='+')
+    cliente = models.ForeignKey(Cliente, on_delete=models.CASCADE, related_name='+')
+    sucursal = models.ForeignKey(Sucursal, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+
+    notas = models.TextField(blank=True, null=True)
+    clave_idempotencia = models.CharField(max_length=64, unique=True, null=True, blank=True)
+
+    # Fechas de la venta original (sin auto_now: se copian tal cual)
+    fecha_creacion = models.DateTimeField()
+    fecha_actualizacion = models.DateTimeField()
+    fecha_archivado = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"Venta archivada {self.folio}"
+
+    class Meta:
+        ordering = ['-fecha_venta']
+        verbose_name = 'Venta archivada'
+        verbose_name_plural = 'Ventas archivadas'
+
+
+# =====================================================
+# AUDITORÍA DE CAMBIOS
+# =====================================================
+class JSONCompacto(DjangoJSONEncoder):
+    """JSON sin espacios después de ',' y ':'"""
+
+    def __init__(self, *args, **kwargs):
+        kwargs['separators'] = (',', ':')
+        super().__init__(*args, **kwargs)
+
+
+class AuditoriaQuerySet(models.QuerySet):
+    def update(self, **kwargs):
+        raise PermissionError('La auditoría es de solo inserción')
+
+    def delete(self):
+        raise PermissionError('La auditoría es de solo inserción')
+
+
+class Auditoria(models.Model):
+    """
+    Bitácora de solo inserción con los cambios campo por campo de los
+    modelos sincronizados. `cambios` guarda {campo: [antes, después]} al
+    modificar y {campo: valor} al crear o borrar. Las entradas de cada
+    transacción se escriben juntas al confirmar (ver auditoria.py).
+    """
+    OPERACIONES = [
+        ('creado', 'Creado'),
+        ('modificado', 'Modificado'),
+        ('borrado', 'Borrado'),
+    ]
+
+    modelo = models.CharField(max_length=50)
+    objeto_id = models.BigIntegerField()
+    operacion = models.CharField(max_length=10, choices=OPERACIONES)
+    cambios = models.JSONField(encoder=JSONCompacto)
+    # Sin llave foránea: la bitácora no depende de que el usuario siga existiendo
+    usuario_id = models.IntegerField(null=True, blank=True)
+    fecha = models.DateTimeField(default=timezone.now)
+
+    objects = AuditoriaQuerySet.as_manager()
+
+    def __str__(self):
+        return f"{self.modelo} {self.objeto_id} {self.operacion}"
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise PermissionError('La auditoría es de solo inserción')
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise PermissionError('La auditoría es de solo inserción')
+
+    class Meta:
+        ordering = ['-id']
+        verbose_name = 'Auditoría'
+        verbose_name_plural = 'Auditoría'
+        indexes = [
+            models.Index(fields=['modelo', 'objeto_id'], name='auditoria_objeto_idx'),
+        ]
+
+
+
+# =====================================================
+# AJUSTES MASIVOS DE PRECIO Y STOCK
+# =====================================================
+class AjusteMasivo(models.Model):
+    """
+    Un cambio de precio o stock aplicado a muchos productos con un solo
+    UPDATE. Los valores anteriores y nuevos de cada producto quedan en
+    AjusteMasivoDetalle para poder deshacerlo.
+    """
+    CAMPOS = [
+        ('precio', 'Precio'),
+        ('stock', 'Stock'),
+    ]
+    MODOS = [
+        ('porcentaje', 'Porcentaje'),
+        ('absoluto', 'Cantidad fija'),
+    ]
+
+    campo = models.CharField(max_length=10, choices=CAMPOS)
+    modo = models.CharField(max_length=10, choices=MODOS)
+    valor = models.DecimalField(max_digits=12, decimal_places=2)
+    descripcion = models.CharField(max_length=200, blank=True)
+    productos = models.PositiveIntegerField(default=0)
+    total_antes = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    total_despues = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    usuario_id = models.IntegerField(null=True, blank=True)
+    fecha = models.DateTimeField(default=timezone.now)
+    fecha_deshecho = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        unidad = '%' if self.modo == 'porcentaje' else ''
+        return f"{self.get_campo_display()} {self.valor:+}{unidad} en {self.productos} productos"
+
+    class Meta:
+        ordering = ['-fecha']
+        verbose_name = 'Ajuste masivo'
+        verbose_name_plural = 'Ajustes masivos'
+
+
+class AjusteMasivoDetalle(models.Model):
+    ajuste = models.ForeignKey(AjusteMasivo, on_delete=models.CASCADE, related_name='detalle')
+    producto = models.ForeignKey(Producto, on_delete=models.CASCADE, related_name='+')
+    anterior = models.DecimalField(max_digits=12, decimal_places=2)
+    nuevo = models.DecimalField(max_digits=12, decimal_places=2, null=True)
+
+    class Meta:
+        verbose_name = 'Detalle de ajuste masivo'
+        verbose_name_plural = 'Detalles de ajustes masivos'
+        constraints = [
+            models.UniqueConstraint(fields=['ajuste', 'producto'], name='ajuste_detalle_unico'),
+        ]
+
+
+
+# =====================================================
+# VALUACIÓN DE INVENTARIO
+# =====================================================
+class SnapshotInventario(models.Model):
+    """
+    Valor del inventario (precio * stock) en un momento dado. El detalle
+    por categoría y proveedor queda en SnapshotInventarioGrupo para
+    comparar contra el inventario actual.
+    """
+    descripcion = models.CharField(max_length=200, blank=True)
+    productos = models.PositiveIntegerField(default=0)
+    unidades = models.BigIntegerField(default=0)
+    valor = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    fecha = models.DateTimeField(default=timezone.now, db_index=True)
+
+    def __str__(self):
+        return f"Inventario al {timezone.localtime(self.fecha):%d/%m/%Y %H:%M}: ${self.valor}"
+
+    class Meta:
+        ordering = ['-fecha']
+        verbose_name = 'Snapshot de inventario'
+        verbose_name_plural = 'Snapshots de inventario'
+
+
+class SnapshotInventarioGrupo(models.Model):
+    """
+    Una combinación categoría-proveedor del snapshot. Guarda ids y nombres
+    sin llave foránea: el historial no cambia si después se borra o
+    renombra la categoría o el proveedor.
+    """
+    snapshot = models.ForeignKey(SnapshotInventario, on_delete=models.CASCADE, related_name='grupos')
+    categoria_id = models.IntegerField()
+    categoria_nombre = models.CharField(max_length=100)
+    proveedor_id = models.IntegerField()
+    proveedor_nombre = models.CharField(max_length=100)
+    productos = models.PositiveIntegerField(default=0)
+    unidades = models.BigIntegerField(default=0)
+    valor = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+
+    class Meta:
+        verbose_name = 'Grupo de snapshot de inventario'
+        verbose_name_plural = 'Grupos de snapshots de inventario'
+        constraints = [
+            models.UniqueConstraint(fields=['snapshot', 'categoria_id', 'proveedor_id'], name='snapshot_inventario_grupo_unico'),
+        ]
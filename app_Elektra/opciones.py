@@ -0,0 +1,65 @@
+"""
+Opciones de los <select> de los formularios y filtros.
+
+Las listas chicas (vendedores, categorías, proveedores activos, países de
+los proveedores, sucursales activas) se guardan en la caché y las señales las borran al
+guardar o eliminar un registro de su modelo. Clientes y productos pueden ser cientos de
+miles: esos no se listan, se buscan por prefijo del nombre (índice sobre
+LOWER(nombre)) desde el endpoint de autocompletado.
+"""
+from django.core.cache import cache
+from django.db.models.functions import Lower
+
+from .models import Proveedor, Categoria, Producto, Vendedor, Cliente, Sucursal
+
+# Respaldo por si la lista cambió sin señales (update masivo) o en otro proceso
+VIGENCIA_OPCIONES = 300
+
+LIMITE_BUSQUEDA = 20
+
+# Mayor que cualquier carácter: nombre >= prefijo AND nombre < prefijo + FIN_PREFIJO
+FIN_PREFIJO = '\U0010ffff'
+
+LISTAS = {
+    'vendedores': (Vendedor, lambda: Vendedor.objects.order_by('nombre').values('id', 'nombre')),
+    'categorias': (Categoria, lambda: Categoria.objects.order_by('nombre').values('id', 'nombre')),
+    'proveedores': (Proveedor, lambda: Proveedor.objects.filter(activo=True).order_by('nombre').values('id', 'nombre')),
+    # Textos sueltos, no filas: el filtro por país de proveedores_ver
+    'paises': (Proveedor, lambda: Proveedor.objects.exclude(pais='').order_by('pais').values_list('pais', flat=True).distinct()),
+    'sucursales': (Sucursal, lambda: Sucursal.objects.filter(activa=True).order_by('nombre').values('id', 'codigo', 'nombre')),
+}
+
+# nombre: (modelo, campo indexado con LOWER(), columnas del resultado)
+BUSQUEDAS = {
+    'clientes': (Cliente, 'nombre', ['id', 'nombre', 'email']),
+    'productos': (Producto, 'nombre_producto', ['id', 'nombre_producto', 'sku', 'precio', 'stock']),
+}
+
+
+def _llave(nombre):
+    return f'opciones:{nombre}'
+
+
+def opciones(nombre):
+    """Elementos de una lista chica, desde la caché"""
+    consulta = LISTAS[nombre][1]
+    return cache.get_or_set(_llave(nombre), lambda: list(consulta()), VIGENCIA_OPCIONES)
+
+
+def invalidar_opciones(modelo):
+    cache.delete_many([_llave(nombre) for nombre, (modelo_lista, _) in LISTAS.items() if modelo_lista is modelo])
+
+
+def buscar(nombre, texto='', limite=LIMITE_BUSQUEDA, **filtros):
+    """
+    Hasta `limite` registros cuyo nombre empieza con `texto` (sin
+    distinguir mayúsculas), en orden alfabético. Se compara por rango
+    contra LOWER(nombre) para que la consulta recorra el índice y se
+    detenga en el límite sin importar el tamaño de la tabla.
+    """
+    modelo, campo, columnas = BUSQUEDAS[nombre]
+    prefijo = texto.strip().lower()
+    registros = modelo.objects.annotate(nombre_busqueda=Lower(campo)).filter(**filtros)
+    if prefijo:
+        registros = registros.filter(nombre_busqueda__gte=prefijo, nombre_busqueda__lt=prefijo + FIN_PREFIJO)
+    return list(registros.order_by('nombre_busqueda').values(*columnas)[:limite])
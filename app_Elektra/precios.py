@@ -0,0 +1,165 @@
+"""
+Historial de precios y consultas del precio vigente a una fecha.
+
+PrecioHistorico guarda una fila por cada cambio de precio. El precio de un
+producto en una fecha es la fila más reciente con vigente_desde <= fecha:
+una subconsulta correlacionada que la base resuelve con un solo salto en
+el índice (producto, vigente_desde), así que se puede pedir para todos los
+productos o para cada venta de un rango dentro de la misma consulta.
+
+Venta no guarda la cantidad ni el precio unitario: las unidades de una
+venta son su total entre el precio vigente el día de la venta. Los
+productos sin historial a esa fecha (creados con bulk_create, o ventas
+anteriores al primer registro) usan el precio actual.
+"""
+from decimal import Decimal
+
+from django.db import connection
+from django.db.models import Count, DecimalField, F, FloatField, IntegerField, Max, OuterRef, QuerySet, Subquery, Sum
+from django.db.models.functions import Cast, Coalesce, NullIf, Round
+from django.utils import timezone
+
+from .models import Producto, Venta, VentaArchivada, PrecioHistorico
+
+PRECIO = DecimalField(max_digits=10, decimal_places=2)
+# Sumas de montos de muchas ventas
+MONTO = DecimalField(max_digits=14, decimal_places=2)
+
+# nombre: columnas de Venta por las que se agrupa (id, nombre)
+AGRUPACIONES_MARGEN = {
+    'categoria': ['producto__categoria_id', 'producto__categoria__nombre'],
+    'proveedor': ['producto__proveedor_id', 'producto__proveedor__nombre'],
+    'producto': ['producto_id', 'producto__nombre_producto'],
+}
+
+
+# ==================== HISTORIAL ====================
+def registrar_precios(productos, fecha=None):
+    """
+    INSERT ... SELECT del precio actual de los productos del queryset
+    (update() y bulk_update() no disparan la señal que lo registra).
+    """
+    fecha = fecha or timezone.now()
+    sql, params = productos.order_by().values_list('pk', 'precio').query.sql_with_params()
+    nombre = connection.ops.quote_name
+    columnas = ', '.join(nombre(columna) for columna in ('vigente_desde', 'producto_id', 'precio'))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {nombre(PrecioHistorico._meta.db_table)} ({columnas}) '
+            f'SELECT %s, seleccion.* FROM ({sql}) seleccion',
+            [connection.ops.adapt_datetimefield_value(fecha), *params]
+        )
+
+
+def precio_vigente(fecha, producto=OuterRef('pk')):
+    """
+    Subconsulta con el precio del producto en `fecha`; los dos pueden ser
+    OuterRef. Vale None si el producto no tenía precio registrado entonces.
+    """
+    return Subquery(
+        PrecioHistorico.objects.filter(producto=producto, vigente_desde__lte=fecha)
+        .order_by('-vigente_desde')
+        .values('precio')[:1],
+        output_field=PRECIO
+    )
+
+
+def precios_al(fecha, productos=None):
+    """
+    {producto_id: precio vigente en `fecha`} de muchos productos en una
+    sola consulta. `productos` es un queryset o una lista de ids; los que
+    no tenían precio registrado a esa fecha no aparecen.
+    """
+    if productos is None:
+        productos = Producto.objects.all()
+    elif not isinstance(productos, QuerySet):
+        productos = Producto.objects.filter(pk__in=productos)
+    return dict(
+        productos.order_by()
+        .annotate(precio_al=precio_vigente(fecha))
+        .filter(precio_al__isnull=False)
+        .values_list('pk', 'precio_al')
+    )
+
+
+def precio_al(producto_id, fecha, por_defecto=None):
+    """Precio de un producto en `fecha`, o `por_defecto` si no hay registro"""
+    precio = (
+        PrecioHistorico.objects.filter(producto_id=producto_id, vigente_desde__lte=fecha)
+        .order_by('-vigente_desde')
+        .values_list('precio', flat=True)
+        .first()
+    )
+    return por_defecto if precio is None else precio
+
+
+# ==================== MÁRGENES A PRECIO HISTÓRICO ====================
+def _unidades():
+    """
+    Unidades de cada venta: total / precio vigente en su fecha, redondeado
+    a entero. La división va en flotante porque SQLite divide enteros sin
+    decimales, pero solo decide el entero más cercano: los montos se
+    calculan después con ese entero y los precios en Decimal.
+    """
+    precio = Coalesce(precio_vigente(OuterRef('fecha_venta'), OuterRef('producto_id')), F('producto__precio'))
+    return Cast(Round(Cast('total', FloatField()) / Cast(NullIf(precio, 0), FloatField())), IntegerField())
+
+
+def _particiones(desde, hasta):
+    """Ventas completadas del rango; la partición de archivo solo si el rango la alcanza"""
+    filtro = {'estado': 'completada', 'fecha_venta__gte': desde, 'fecha_venta__lt': hasta}
+    particiones = [Venta.objects.filter(**filtro)]
+    mas_reciente = VentaArchivada.objects.aggregate(Max('fecha_venta'))['fecha_venta__max']
+    if mas_reciente is not None and mas_reciente >= desde:
+        particiones.append(VentaArchivada.objects.filter(**filtro))
+    return particiones
+
+
+def margen_por_precio(desde, hasta, agrupacion='categoria'):
+    """
+    Ventas entre `desde` y `hasta` (datetimes, hasta exclusivo) por grupo:
+    lo cobrado, las unidades reconciliadas con el precio de cada fecha y
+    lo que valdrían esas unidades a precio actual. La diferencia es el
+    margen ganado o perdido por los cambios de precio.
+
+    Una consulta agrupada por partición; el precio de cada venta es una
+    subconsulta sobre el índice del historial, sin consultas por fila.
+    """
+    columnas = AGRUPACIONES_MARGEN[agrupacion]
+    unidades = _unidades()
+    grupos = {}
+    for ventas in _particiones(desde, hasta):
+        consulta = (
+            ventas.order_by()
+            .values(*columnas)
+            .annotate(
+                ventas=Count('id'),
+                monto=Sum('total', output_field=MONTO),
+                unidades=Sum(unidades),
+                monto_actual=Sum(unidades * F('producto__precio'), output_field=MONTO),
+            )
+        )
+        for fila in consulta:
+            grupo = grupos.setdefault(fila[columnas[0]], {
+                'id': fila[columnas[0]], 'nombre': fila[columnas[1]],
+                'ventas': 0, 'monto': Decimal('0.00'), 'unidades': 0, 'monto_actual': Decimal('0.00'),
+            })
+            grupo['ventas'] += fila['ventas']
+            grupo['monto'] += fila['monto'] or 0
+            grupo['unidades'] += fila['unidades'] or 0
+            grupo['monto_actual'] += fila['monto_actual'] or 0
+
+    filas = []
+    for grupo in grupos.values():
+        grupo['diferencia'] = grupo['monto'] - grupo['monto_actual']
+        grupo['variacion'] = grupo['diferencia'] / grupo['monto_actual'] * 100 if grupo['monto_actual'] else None
+        filas.append(grupo)
+    filas.sort(key=lambda grupo: abs(grupo['diferencia']), reverse=True)
+    return filas
+
+
+def cambios_en_rango(desde, hasta):
+    """Cambios de precio registrados en el rango y cuántos productos tocaron"""
+    return PrecioHistorico.objects.filter(vigente_desde__gte=desde, vigente_desde__lt=hasta).aggregate(
+        cambios=Count('id'), productos=Count('producto_id', distinct=True)
+    )
@@ -0,0 +1,201 @@
+"""
+Velocidad de venta y pronóstico de agotamiento calculados con NumPy.
+
+La base de datos agrupa las ventas por producto con una suma por día
+(rollup) y el resultado llega directo como matriz productos × días. Con
+ella se calculan para todos los productos a la vez las medias móviles,
+la velocidad (media exponencial) y los días de inventario restantes.
+media_7d y media_28d siempre cubren 7 y 28 días; la ventana `dias` solo
+cambia la velocidad.
+
+Venta no guarda la cantidad vendida: las unidades de cada día se estiman
+como importe / precio actual del producto.
+"""
+import math
+from datetime import datetime, time, timedelta
+
+import numpy as np
+from django.db.models import FloatField, Q, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Producto, Venta, PronosticoProducto
+
+DIAS_VENTANA = 28
+# Días tras los que el peso de una venta en la velocidad baja a la mitad
+VIDA_MEDIA = 7
+# Más allá de esto no se estima fecha de agotamiento
+MAX_DIAS_AGOTAMIENTO = 3650
+
+CAMPOS = ['media_7d', 'media_28d', 'velocidad', 'dias_restantes', 'fecha_agotamiento', 'fecha_calculo']
+
+
+def rango_ventana(dias=DIAS_VENTANA, hoy=None):
+    fin = hoy or timezone.localdate()
+    return fin - timedelta(days=dias - 1), fin
+
+
+def limites_dias(inicio, dias):
+    """Medianoche local de cada día de la ventana (dias + 1 límites, con horario de verano)"""
+    return [
+        timezone.make_aware(datetime.combine(inicio + timedelta(days=n), time.min))
+        for n in range(dias + 1)
+    ]
+
+
+def ventas_por_dia(inicio, dias):
+    """
+    Rollup de ventas completadas: una fila por producto con el importe de
+    cada día. Los días se separan comparando contra límites calculados
+    aquí (sin TruncDate, que en SQLite convierte zona horaria fila por
+    fila en Python) y el rango completo usa el índice de fecha_venta.
+    Devuelve (ids de producto, matriz de importes).
+    """
+    limites = limites_dias(inicio, dias)
+    columnas = {
+        f'dia_{n}': Coalesce(
+            Sum('total', filter=Q(fecha_venta__gte=limites[n], fecha_venta__lt=limites[n + 1]),
+                output_field=FloatField()),
+            0.0
+        )
+        for n in range(dias)
+    }
+    filas = list(
+        Venta.objects.filter(estado='completada', fecha_venta__gte=limites[0], fecha_venta__lt=limites[-1])
+        .order_by()
+        .values('producto_id')
+        .annotate(**columnas)
+        .values_list('producto_id', *columnas)
+    )
+    if not filas:
+        return np.empty(0, dtype=np.int64), np.zeros((0, dias))
+    matriz = np.array(filas, dtype=np.float64)
+    return matriz[:, 0].astype(np.int64), matriz[:, 1:]
+
+
+def columnas_productos():
+    filas = list(Producto.objects.order_by('id').values_list('id', 'precio', 'stock'))
+    total = len(filas)
+    ids = np.fromiter((fila[0] for fila in filas), dtype=np.int64, count=total)
+    precios = np.fromiter((fila[1] for fila in filas), dtype=np.float64, count=total)
+    stocks = np.fromiter((fila[2] for fila in filas), dtype=np.float64, count=total)
+    return ids, precios, stocks
+
+
+def pesos_exponenciales(dias):
+    """Pesos de la media exponencial; la última columna (hoy) pesa más"""
+    edades = np.arange(dias - 1, -1, -1)
+    pesos = 0.5 ** (edades / VIDA_MEDIA)
+    return pesos / pesos.sum()
+
+
+def calcular_pronosticos(dias=DIAS_VENTANA, hoy=None):
+    """Métricas de todos los productos en forma vectorizada"""
+    columnas = max(dias, DIAS_VENTANA)
+    inicio, fin = rango_ventana(columnas, hoy)
+    ids, precios, stocks = columnas_productos()
+    con_ventas, importes = ventas_por_dia(inicio, columnas)
+
+    # Fila de cada producto con ventas en la matriz completa (ids está
+    # ordenado). Un producto borrado o creado entre las dos consultas no
+    # está en ids: searchsorted devolvería la fila de otro o len(ids)
+    filas = np.searchsorted(ids, con_ventas)
+    encontrados = filas < len(ids)
+    encontrados[encontrados] = ids[filas[encontrados]] == con_ventas[encontrados]
+    filas, importes = filas[encontrados], importes[encontrados]
+
+    precio_v = precios[filas][:, np.newaxis]
+    unidades = np.divide(importes, precio_v, out=np.zeros_like(importes), where=precio_v > 0)
+
+    matriz = np.zeros((len(ids), columnas))
+    matriz[filas] = unidades
+
+    velocidad = matriz[:, -dias:] @ pesos_exponenciales(dias)
+    existencias = np.maximum(stocks, 0)
+    dias_restantes = np.full(len(ids), np.nan)
+    np.divide(existencias, velocidad, out=dias_restantes, where=velocidad > 0)
+
+    return {
+        'hoy': fin,
+        'ids': ids,
+        'media_7d': matriz[:, -7:].mean(axis=1),
+        'media_28d': matriz[:, -DIAS_VENTANA:].mean(axis=1),
+        'velocidad': velocidad,
+        'dias_restantes': dias_restantes,
+    }
+
+
+def calcular_en_bucle(dias=DIAS_VENTANA, hoy=None):
+    """
+    Mismo cálculo producto por producto con el ORM. Solo sirve como
+    referencia para el benchmark.
+    """
+    columnas = max(dias, DIAS_VENTANA)
+    inicio, fin = rango_ventana(columnas, hoy)
+    limites = limites_dias(inicio, columnas)
+    pesos = pesos_exponenciales(dias).tolist()
+    resultado = {'hoy': fin, 'ids': [], 'media_7d': [], 'media_28d': [], 'velocidad': [], 'dias_restantes': []}
+
+    for producto in Producto.objects.order_by('id'):
+        por_dia = [0.0] * columnas
+        ventas = Venta.objects.filter(
+            producto=producto, estado='completada', fecha_venta__gte=limites[0], fecha_venta__lt=limites[-1]
+        )
+        for venta in ventas:
+            dia = timezone.localtime(venta.fecha_venta).date()
+            if producto.precio > 0:
+                por_dia[(dia - inicio).days] += float(venta.total) / float(producto.precio)
+
+        velocidad = sum(unidades * peso for unidades, peso in zip(por_dia[-dias:], pesos))
+        resultado['ids'].append(producto.pk)
+        resultado['media_7d'].append(sum(por_dia[-7:]) / 7)
+        resultado['media_28d'].append(sum(por_dia[-DIAS_VENTANA:]) / DIAS_VENTANA)
+        resultado['velocidad'].append(velocidad)
+        resultado['dias_restantes'].append(max(producto.stock, 0) / velocidad if velocidad > 0 else math.nan)
+    return resultado
+
+
+def guardar_pronosticos(resultado, tamano_lote=500):
+    """
+    Escribe los resultados con INSERT ... ON CONFLICT DO UPDATE por lotes:
+    crea los pronósticos nuevos y actualiza los existentes en la misma
+    sentencia. Devuelve cuántos se guardaron.
+    """
+    hoy = resultado['hoy']
+    ahora = timezone.now()
+
+    pronosticos = []
+    columnas = zip(
+        np.asarray(resultado['ids']).tolist(),
+        np.asarray(resultado['media_7d']).tolist(),
+        np.asarray(resultado['media_28d']).tolist(),
+        np.asarray(resultado['velocidad']).tolist(),
+        np.asarray(resultado['dias_restantes']).tolist(),
+    )
+    for producto_id, media_7d, media_28d, velocidad, dias_restantes in columnas:
+        if math.isnan(dias_restantes):
+            dias_restantes = None
+        fecha_agotamiento = None
+        if dias_restantes is not None and dias_restantes <= MAX_DIAS_AGOTAMIENTO:
+            fecha_agotamiento = hoy + timedelta(days=math.floor(dias_restantes))
+
+        pronosticos.append(PronosticoProducto(
+            producto_id=producto_id,
+            media_7d=media_7d,
+            media_28d=media_28d,
+            velocidad=velocidad,
+            dias_restantes=dias_restantes,
+            fecha_agotamiento=fecha_agotamiento,
+            fecha_calculo=ahora
+        ))
+
+    # bulk_update arma un CASE WHEN por campo y fila: con miles de filas
+    # compilarlo cuesta más que la sentencia misma
+    PronosticoProducto.objects.bulk_create(
+        pronosticos,
+        batch_size=tamano_lote,
+        update_conflicts=True,
+        unique_fields=['producto'],
+        update_fields=CAMPOS
+    )
+    return len(pronosticos)
@@ -0,0 +1,179 @@
+"""
+Recibos imprimibles de ventas (HTML).
+
+La plantilla se compila una sola vez por proceso y se renderiza con filas
+planas (values()), así el render no hace consultas y las filas se pueden
+mandar a otros procesos. Los lotes grandes se reparten en un pool de
+procesos y se empaquetan en un zip que se genera mientras se descarga:
+en memoria solo hay unos cuantos lotes a la vez.
+"""
+import multiprocessing
+import os
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, time, timedelta
+from decimal import Decimal, ROUND_HALF_UP
+from functools import lru_cache
+
+import django
+from django.db.models import F, OuterRef
+from django.db.models.functions import Coalesce
+from django.template import engines
+from django.utils import timezone
+
+from .models import Venta
+from .precios import PRECIO, precio_vigente
+
+PROCESOS = min(4, os.cpu_count() or 1)
+# Ventas por tarea enviada al pool
+TAMANO_LOTE = 200
+# Debajo de esto arrancar los procesos cuesta más de lo que ahorran
+MINIMO_POOL = 1000
+# Bytes comprimidos que se juntan antes de entregarlos a la respuesta
+TAMANO_BLOQUE = 64 * 1024
+
+COLUMNAS = {
+    'producto_nombre': F('producto__nombre_producto'),
+    'producto_sku': F('producto__sku'),
+    # El precio con el que se cobró: el vigente en la fecha de la venta
+    'producto_precio': Coalesce(
+        precio_vigente(OuterRef('fecha_venta'), OuterRef('producto_id')), F('producto__precio'), output_field=PRECIO
+    ),
+    'cliente_nombre': F('cliente__nombre'),
+    'cliente_email': F('cliente__email'),
+    'cliente_direccion': F('cliente__direccion'),
+    'vendedor_nombre': F('vendedor__nombre'),
+}
+CAMPOS = ['id', 'folio', 'fecha_venta', 'total', 'metodo_pago', 'estado', 'notas', *COLUMNAS]
+
+
+@lru_cache(maxsize=None)
+def plantilla_recibo():
+    """
+    Plantilla compilada del recibo. Se guarda por proceso para no volver a
+    leerla y compilarla en cada render (con DEBUG el loader no usa caché).
+    """
+    return engines['django'].get_template('ventas/recibo.html')
+
+
+def ventas_del_rango(fecha_inicio, fecha_fin, estado=''):
+    """Ventas entre dos fechas locales comparando contra el índice de fecha_venta"""
+    ventas = Venta.objects.filter(
+        fecha_venta__gte=timezone.make_aware(datetime.combine(fecha_inicio, time.min)),
+        fecha_venta__lt=timezone.make_aware(datetime.combine(fecha_fin + timedelta(days=1), time.min))
+    )
+    if estado:
+        ventas = ventas.filter(estado=estado)
+    return ventas
+
+
+def datos_recibos(ventas):
+    """
+    Filas planas con todo lo que muestra el recibo: un solo JOIN, y el
+    precio de la fecha como subconsulta sobre el índice del historial
+    """
+    return ventas.order_by('id').values(*CAMPOS[:7], **COLUMNAS)
+
+
+def renderizar_recibo(fila):
+    precio = fila['producto_precio']
+    # Venta no guarda la cantidad: se deduce del total como en ventas_actualizar
+    cantidad = (fila['total'] / precio).quantize(Decimal('1'), ROUND_HALF_UP) if precio else 1
+    return plantilla_recibo().render({
+        'venta': fila,
+        'fecha': timezone.localtime(fila['fecha_venta']),
+        'cantidad': cantidad,
+    })
+
+
+def nombre_recibo(fila):
+    return f"recibo_{fila['folio']}.html"
+
+
+def renderizar_lote(filas):
+    """[(nombre, html)] de un lote; es lo que ejecuta cada proceso del pool"""
+    return [(nombre_recibo(fila), renderizar_recibo(fila)) for fila in filas]
+
+
+def procesos_para(total):
+    return PROCESOS if total >= MINIMO_POOL else 1
+
+
+def _lotes(filas, tamano):
+    lote = []
+    for fila in filas:
+        lote.append(fila)
+        if len(lote) == tamano:
+            yield lote
+            lote = []
+    if lote:
+        yield lote
+
+
+def renderizar_recibos(ventas, procesos=1):
+    """
+    Genera (nombre, html) de cada venta en orden de id. Con más de un
+    proceso los lotes se renderizan en paralelo, con a lo más dos lotes
+    pendientes por proceso.
+    """
+    lotes = _lotes(datos_recibos(ventas).iterator(chunk_size=TAMANO_LOTE), TAMANO_LOTE)
+    if procesos <= 1:
+        for lote in lotes:
+            yield from renderizar_lote(lote)
+        return
+
+    # spawn y no fork: el proceso padre puede tener hilos y conexiones abiertas
+    pool = ProcessPoolExecutor(
+        procesos, mp_context=multiprocessing.get_context('spawn'), initializer=django.setup
+    )
+    try:
+        pendientes = deque()
+        for lote in lotes:
+            pendientes.append(pool.submit(renderizar_lote, lote))
+            if len(pendientes) >= procesos * 2:
+                yield from pendientes.popleft().result()
+        while pendientes:
+            yield from pendientes.popleft().result()
+    finally:
+        # Si se corta la descarga no se siguen renderizando lotes
+        pool.shutdown(cancel_futures=True)
+
+
+class _Salida:
+    """Destino del ZipFile: guarda lo escrito hasta que el generador lo entrega"""
+
+    def __init__(self):
+        self.partes = []
+        self.tamano = 0
+
+    def write(self, datos):
+        self.partes.append(bytes(datos))
+        self.tamano += len(datos)
+        return len(datos)
+
+    def flush(self):
+        pass
+
+    def vaciar(self):
+        datos = b''.join(self.partes)
+        self.partes = []
+        self.tamano = 0
+        return datos
+
+
+def zip_recibos(recibos):
+    """
+    Empaqueta los recibos en un zip y lo entrega por bloques. Como la
+    salida no permite seek, zipfile escribe el tamaño de cada archivo
+    después de su contenido y nada se tiene que reescribir.
+    """
+    salida = _Salida()
+    # Nivel 1: el HTML comprime casi igual y el zip deja de ser el cuello de botella
+    with zipfile.ZipFile(salida, 'w', zipfile.ZIP_DEFLATED, compresslevel=1) as archivo:
+        for nombre, html in recibos:
+            archivo.writestr(nombre, html)
+            if salida.tamano >= TAMANO_BLOQUE:
+                yield salida.vaciar()
+    # Al cerrar se escribe el directorio central
+    yield salida.vaciar()
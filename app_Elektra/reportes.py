@@ -0,0 +1,131 @@
+from collections import Counter
+
+from django.db.models import Count, Max, Sum
+from django.utils import timezone
+
+from .models import Proveedor, Producto, Vendedor, Cliente, Venta, VentaArchivada
+from .alertas import resumen_alertas
+
+
+# ==================== REPORTE DE VENTAS ====================
+def filtrar_ventas(fecha_inicio='', fecha_fin='', modelo=Venta):
+    """
+    Ventas del periodo indicado, más recientes primero. Con
+    modelo=VentaArchivada filtra la partición de archivo.
+    """
+    ventas = modelo.objects.select_related('producto', 'cliente', 'vendedor').all()
+
+    if fecha_inicio:
+        ventas = ventas.filter(fecha_venta__date__gte=fecha_inicio)
+
+    if fecha_fin:
+        ventas = ventas.filter(fecha_venta__date__lte=fecha_fin)
+
+    return ventas.order_by('-fecha_venta')
+
+
+def ventas_archivadas(fecha_inicio='', fecha_fin=''):
+    """
+    Ventas archivadas del periodo, o None si el periodo empieza después de
+    la venta archivada más reciente y basta con las vigentes.
+    """
+    mas_reciente = VentaArchivada.objects.aggregate(Max('fecha_venta'))['fecha_venta__max']
+    if mas_reciente is None:
+        return None
+    if fecha_inicio and str(fecha_inicio) > timezone.localdate(mas_reciente).isoformat():
+        return None
+    return filtrar_ventas(fecha_inicio, fecha_fin, VentaArchivada)
+
+
+def resumen_ventas(ventas, archivadas=None):
+    """
+    Totales del reporte calculados en SQL (sin recorrer las filas). Con
+    `archivadas` suma también los de la partición de archivo.
+    """
+    total_count = 0
+    total_ventas = 0
+    metodos = Counter()
+    for particion in [ventas] if archivadas is None else [ventas, archivadas]:
+        totales = particion.order_by().aggregate(total_count=Count('id'), total_ventas=Sum('total'))
+        total_count += totales['total_count']
+        total_ventas += totales['total_ventas'] or 0
+        for metodo in particion.order_by().values('metodo_pago').annotate(cantidad=Count('id')):
+            metodos[metodo['metodo_pago']] += metodo['cantidad']
+
+    return {
+        'total_count': total_count,
+        'total_ventas': total_ventas,
+        'promedio_venta': total_ventas / total_count if total_count else 0,
+        'metodos_pago_list': [
+            {'nombre': nombre, 'cantidad': cantidad} for nombre, cantidad in metodos.most_common()
+        ],
+    }
+
+
+def filas_reporte(ventas, archivadas=None):
+    """
+    Filas del detalle con la misma forma que usa la plantilla del reporte.
+    Con `archivadas` ambas particiones se leen en una sola consulta
+    (UNION ALL) ordenada por fecha.
+    """
+    campos = (
+        'id', 'folio', 'fecha_venta', 'total', 'metodo_pago', 'estado',
+        'producto_id', 'producto__nombre_producto', 'cliente_id', 'cliente__nombre',
+        'vendedor_id', 'vendedor__nombre',
+    )
+    consulta = ventas.values(*campos)
+    if archivadas is not None:
+        consulta = (
+            ventas.order_by().values(*campos)
+            .union(archivadas.order_by().values(*campos), all=True)
+            .order_by('-fecha_venta')
+        )
+
+    filas = []
+    for venta in consulta:
+        filas.append({
+            'id': venta['id'],
+            'folio': venta['folio'],
+            'fecha_venta': venta['fecha_venta'],
+            'total': venta['total'],
+            'metodo_pago': venta['metodo_pago'],
+            'estado': venta['estado'],
+            # Los ids permiten saber si un snapshot guarda un nombre que ya cambió
+            'producto': {'id': venta['producto_id'], 'nombre_producto': venta['producto__nombre_producto']},
+            'cliente': {'id': venta['cliente_id'], 'nombre': venta['cliente__nombre']},
+            'vendedor': {'id': venta['vendedor_id'], 'nombre': venta['vendedor__nombre']},
+        })
+    return filas
+
+
+def reporte_ventas(fecha_inicio='', fecha_fin=''):
+    """
+    (detalle, resumen) del periodo. Solo consulta la partición de archivo
+    si el periodo la alcanza; si no, el detalle es el queryset de ventas
+    vigentes.
+    """
+    ventas = filtrar_ventas(fecha_inicio, fecha_fin)
+    archivadas = ventas_archivadas(fecha_inicio, fecha_fin)
+    if archivadas is None:
+        return ventas, resumen_ventas(ventas)
+    return filas_reporte(ventas, archivadas), resumen_ventas(ventas, archivadas)
+
+
+# ==================== DASHBOARD ====================
+def estadisticas_dashboard():
+    """Contadores de la página principal"""
+    mes_actual = timezone.now().month
+    total_ventas_mes = (
+        Venta.objects.filter(fecha_venta__month=mes_actual).aggregate(Sum('total'))['total__sum'] or 0
+    )
+
+    return {
+        'proveedores_count': Proveedor.objects.count(),
+        'productos_count': Producto.objects.count(),
+        # Leídos del conjunto de alertas, no de la tabla de productos
+        **resumen_alertas(),
+        'ventas_count': Venta.objects.count() + VentaArchivada.objects.count(),
+        'clientes_count': Cliente.objects.count(),
+        'vendedores_count': Vendedor.objects.count(),
+        'total_ventas_mes': total_ventas_mes,
+    }
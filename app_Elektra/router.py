@@ -0,0 +1,79 @@
+"""
+Router de bases por sucursal.
+
+Con SUCURSALES_BASES = {'CENTRO': 'sucursal_centro', ...} en settings, el
+stock (StockSucursal) y las ventas capturadas (VentaSucursal) de cada
+sucursal listada viven en su propia base: las ventas de tiendas distintas
+no compiten por el candado de escritura de una sola base SQLite. Todo lo
+demás (catálogo, clientes, Venta consolidada) sigue en default.
+
+Las consultas sin instancia no traen a qué sucursal pertenecen: el código
+las dirige con .using(base_sucursal(sucursal)). El router resuelve los
+guardados de instancias, las relaciones y qué tablas se crean en cada
+base con `migrate --database <alias>`.
+"""
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+MODELOS_SUCURSAL = {'stocksucursal', 'ventasucursal'}
+
+# id de sucursal -> código; el código no cambia después de crear la sucursal
+_codigos = {}
+
+
+def bases_sucursales():
+    """{código de sucursal: alias en DATABASES} de las sucursales con base propia"""
+    return getattr(settings, 'SUCURSALES_BASES', {})
+
+
+def base_sucursal(sucursal):
+    """Alias de la base con el stock y las ventas capturadas de la sucursal (instancia o id)"""
+    bases = bases_sucursales()
+    if not bases or sucursal is None:
+        return DEFAULT_DB_ALIAS
+    codigo = getattr(sucursal, 'codigo', None)
+    if codigo is None:
+        codigo = _codigo(int(sucursal))
+    return bases.get(codigo, DEFAULT_DB_ALIAS)
+
+
+def _codigo(sucursal_id):
+    if sucursal_id not in _codigos:
+        from .models import Sucursal
+        codigo = Sucursal.objects.filter(pk=sucursal_id).values_list('codigo', flat=True).first()
+        if codigo is None:
+            return None
+        _codigos[sucursal_id] = codigo
+    return _codigos[sucursal_id]
+
+
+def es_de_sucursal(modelo):
+    return modelo._meta.app_label == 'app_Elektra' and modelo._meta.model_name in MODELOS_SUCURSAL
+
+
+class RouterSucursales:
+    def _base(self, model, **hints):
+        instancia = hints.get('instance')
+        if instancia is None:
+            return None
+        if not es_de_sucursal(model):
+            # Producto o Sucursal leídos desde una fila de otra base: siempre de default
+            return DEFAULT_DB_ALIAS if es_de_sucursal(type(instancia)) else None
+        if type(instancia)._meta.model_name == 'sucursal':
+            return base_sucursal(instancia)
+        return base_sucursal(getattr(instancia, 'sucursal_id', None))
+
+    db_for_read = _base
+    db_for_write = _base
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Las filas de una base de sucursal apuntan a Sucursal y Producto de default
+        if es_de_sucursal(type(obj1)) or es_de_sucursal(type(obj2)):
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == DEFAULT_DB_ALIAS or db not in bases_sucursales().values():
+            return None
+        # Una base de sucursal solo lleva sus dos tablas
+        return app_label == 'app_Elektra' and model_name in MODELOS_SUCURSAL
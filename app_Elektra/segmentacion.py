@@ -0,0 +1,228 @@
+"""
+Segmentación RFM (recencia, frecuencia, monto) de clientes con NumPy.
+
+Una consulta agrupada sobre Venta (y otra sobre el archivo) da, por
+cliente, la fecha de su última compra completada, cuántas lleva y cuánto
+ha gastado. Esos valores
+se guardan en SegmentoCliente y las calificaciones 1-5 se reparten por
+quintiles sobre todos los clientes a la vez.
+
+La corrida es incremental: la consulta sobre Venta solo incluye a los
+clientes con ventas modificadas desde la última ejecución. Los quintiles
+sí se recalculan con todos los clientes, pero leyendo SegmentoCliente
+(una fila por cliente) y escribiendo solo las filas que cambiaron.
+"""
+from datetime import timedelta
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Count, Max, Sum
+from django.utils import timezone
+
+from . import auditoria
+from .cambios import registrar_guardados_masivos
+from .models import Cliente, Venta, VentaArchivada, SegmentoCliente, EjecucionSegmentacion
+
+# Límites entre quintiles
+CORTES = [0.2, 0.4, 0.6, 0.8]
+
+# Suma R + F + M desde la que un cliente se considera premium
+SUMA_PREMIUM = 12
+
+# Se reprocesa un poco antes de la marca de agua por si una venta se guardó
+# con fecha anterior pero terminó su transacción durante la corrida pasada
+MARGEN_CORTE = timedelta(minutes=5)
+
+CAMPOS = [
+    'ultima_compra', 'frecuencia', 'monto',
+    'recencia_score', 'frecuencia_score', 'monto_score', 'segmento', 'fecha_calculo',
+]
+
+
+def agregados_ventas(clientes=None):
+    """
+    {cliente_id: (última compra, número de compras, monto total)} con una
+    consulta agrupada por partición (vigente y archivo). `clientes` limita
+    la consulta (queryset o lista de ids).
+    """
+    agregados = {}
+    for modelo in (Venta, VentaArchivada):
+        ventas = modelo.objects.filter(estado='completada')
+        if clientes is not None:
+            ventas = ventas.filter(cliente_id__in=clientes)
+        filas = (
+            ventas.order_by()
+            .values('cliente_id')
+            .annotate(ultima_compra=Max('fecha_venta'), frecuencia=Count('id'), monto=Sum('total'))
+            .values_list('cliente_id', 'ultima_compra', 'frecuencia', 'monto')
+        )
+        for cliente_id, ultima_compra, frecuencia, monto in filas:
+            if cliente_id in agregados:
+                anterior = agregados[cliente_id]
+                ultima_compra = max(ultima_compra, anterior[0])
+                frecuencia += anterior[1]
+                monto += anterior[2]
+            agregados[cliente_id] = (ultima_compra, frecuencia, monto)
+    return agregados
+
+
+def calificar(valores):
+    """Quintil de cada valor (1-5); los empates quedan en el mismo quintil"""
+    if len(valores) == 0:
+        return np.empty(0, dtype=np.int64)
+    limites = np.quantile(valores, CORTES)
+    return 1 + np.searchsorted(limites, valores, side='left')
+
+
+def clasificar(recencia, frecuencia, monto):
+    """Nombre del segmento de cada cliente según sus calificaciones"""
+    return np.select(
+        [
+            (recencia >= 4) & (frecuencia >= 4),
+            frecuencia >= 4,
+            (recencia >= 4) & (frecuencia <= 2),
+            (recencia <= 2) & (frecuencia >= 3),
+            recencia <= 2,
+        ],
+        ['campeon', 'leal', 'nuevo', 'en_riesgo', 'perdido'],
+        default='potencial'
+    )
+
+
+def tipo_sugerido(recencia, frecuencia, monto):
+    return np.where(recencia + frecuencia + monto >= SUMA_PREMIUM, 'premium', 'regular')
+
+
+def segmentar_clientes(completo=False, actualizar_tipo=False, tamano_lote=500):
+    """
+    Recalcula la segmentación. Sin `completo` solo consulta las ventas de
+    los clientes con movimientos desde la última corrida. Con
+    `actualizar_tipo` ajusta Cliente.tipo_cliente entre regular y premium
+    (los corporativos no se tocan). Las ventas borradas no dejan marca:
+    después de borrar ventas conviene una corrida completa. Devuelve un
+    resumen de la corrida.
+    """
+    corte = timezone.now()
+    anterior = EjecucionSegmentacion.objects.first()
+    completo = completo or anterior is None
+
+    if completo:
+        afectados = None
+        nuevos = agregados_ventas()
+    else:
+        afectados = set(
+            Venta.objects.filter(fecha_actualizacion__gte=anterior.fecha_corte - MARGEN_CORTE)
+            .order_by()
+            .values_list('cliente_id', flat=True)
+            .distinct()
+        )
+        nuevos = agregados_ventas(afectados) if afectados else {}
+
+    # Valores y calificaciones guardados de todos los clientes
+    guardados = {
+        fila[0]: fila[1:]
+        for fila in SegmentoCliente.objects.order_by().values_list('cliente_id', *CAMPOS[:-1])
+    }
+    # Clientes que ya no tienen compras completadas (ventas canceladas)
+    revisados = set(guardados) if completo else afectados & set(guardados)
+    sin_compras = revisados - set(nuevos)
+    for cliente_id in sin_compras:
+        del guardados[cliente_id]
+
+    valores = {cliente_id: fila[:3] for cliente_id, fila in guardados.items()}
+    valores.update(nuevos)
+
+    ids = np.fromiter(valores, dtype=np.int64, count=len(valores))
+    filas = list(valores.values())
+    dias = np.fromiter(((corte - fila[0]).total_seconds() / 86400 for fila in filas),
+                       dtype=np.float64, count=len(filas))
+    frecuencias = np.fromiter((fila[1] for fila in filas), dtype=np.float64, count=len(filas))
+    montos = np.fromiter((fila[2] for fila in filas), dtype=np.float64, count=len(filas))
+
+    # Menos días desde la última compra es mejor: se califica el negativo
+    recencia_s = calificar(-dias)
+    frecuencia_s = calificar(frecuencias)
+    monto_s = calificar(montos)
+    segmentos = clasificar(recencia_s, frecuencia_s, monto_s)
+
+    cambiados = []
+    columnas = zip(ids.tolist(), filas, recencia_s.tolist(), frecuencia_s.tolist(),
+                   monto_s.tolist(), segmentos.tolist())
+    for cliente_id, (ultima_compra, frecuencia, monto), r, f, m, segmento in columnas:
+        fila = (ultima_compra, frecuencia, monto, r, f, m, segmento)
+        if guardados.get(cliente_id) == fila:
+            continue
+        cambiados.append(SegmentoCliente(
+            cliente_id=cliente_id,
+            ultima_compra=ultima_compra,
+            frecuencia=frecuencia,
+            monto=monto,
+            recencia_score=r,
+            frecuencia_score=f,
+            monto_score=m,
+            segmento=segmento,
+            fecha_calculo=corte
+        ))
+
+    with transaction.atomic():
+        SegmentoCliente.objects.filter(cliente_id__in=list(sin_compras)).delete()
+        # Mismo upsert por lotes que los pronósticos: crea y actualiza en una sentencia
+        SegmentoCliente.objects.bulk_create(
+            cambiados,
+            batch_size=tamano_lote,
+            update_conflicts=True,
+            unique_fields=['cliente'],
+            update_fields=CAMPOS
+        )
+        tipos = 0
+        if actualizar_tipo:
+            tipos = actualizar_tipos(ids, tipo_sugerido(recencia_s, frecuencia_s, monto_s), tamano_lote)
+        ejecucion = EjecucionSegmentacion.objects.create(
+            fecha_corte=corte,
+            completa=completo,
+            clientes_procesados=len(nuevos),
+            segmentos_cambiados=len(cambiados) + len(sin_compras),
+            tipos_actualizados=tipos
+        )
+
+    return {
+        'completa': ejecucion.completa,
+        'clientes_procesados': ejecucion.clientes_procesados,
+        'segmentos_cambiados': ejecucion.segmentos_cambiados,
+        'tipos_actualizados': ejecucion.tipos_actualizados,
+        'clientes_segmentados': len(ids),
+    }
+
+
+def actualizar_tipos(ids, tipos, tamano_lote=500):
+    """
+    Cambia tipo_cliente donde difiere del sugerido, leyendo y escribiendo
+    por lotes con bulk_update. Devuelve cuántos clientes cambiaron.
+    """
+    sugeridos = dict(zip(ids.tolist(), tipos.tolist()))
+    lista = list(sugeridos)
+    ahora = timezone.now()
+    actualizados = []
+    cambios = []
+
+    for inicio in range(0, len(lista), tamano_lote):
+        clientes = (
+            Cliente.objects.filter(pk__in=lista[inicio:inicio + tamano_lote])
+            .exclude(tipo_cliente='corporativo')
+            .only('id', 'tipo_cliente')
+        )
+        lote = []
+        for cliente in clientes:
+            if cliente.tipo_cliente != sugeridos[cliente.pk]:
+                cambios.append((cliente.pk, {'tipo_cliente': [cliente.tipo_cliente, sugeridos[cliente.pk]]}))
+                cliente.tipo_cliente = sugeridos[cliente.pk]
+                # bulk_update no aplica auto_now
+                cliente.fecha_actualizacion = ahora
+                lote.append(cliente)
+        Cliente.objects.bulk_update(lote, ['tipo_cliente', 'fecha_actualizacion'])
+        actualizados.extend(cliente.pk for cliente in lote)
+
+    # bulk_update no dispara señales: registrar en el registro de cambios
+    registrar_guardados_masivos(Cliente, actualizados, tamano_lote)
+    auditoria.registrar_varios(Cliente, 'modificado', cambios)
+    return len(actualizados)
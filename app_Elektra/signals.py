@@ -0,0 +1,152 @@
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete
+
+from .models import Proveedor, Categoria, Producto, Vendedor, Venta, PrecioHistorico
+from .alertas import evaluar_producto, recalcular_alertas
+from .desempeno import invalidar_tablas
+from .cambios import MODELOS_SINCRONIZADOS, registrar_guardado, registrar_borrado, serializar_objeto
+from . import auditoria
+from .eventos import central
+from .opciones import LISTAS, invalidar_opciones
+
+
+# ==================== REGISTRO DE CAMBIOS ====================
+def cambio_guardado(sender, instance, raw=False, **kwargs):
+    # Las cargas de fixtures (raw) no generan cambios
+    if not raw:
+        registrar_guardado(instance)
+
+
+def cambio_borrado(sender, instance, **kwargs):
+    registrar_borrado(instance)
+
+
+for modelo in MODELOS_SINCRONIZADOS.values():
+    post_save.connect(cambio_guardado, sender=modelo, dispatch_uid=f'cambio_guardado_{modelo.__name__}')
+    post_delete.connect(cambio_borrado, sender=modelo, dispatch_uid=f'cambio_borrado_{modelo.__name__}')
+
+
+# ==================== AUDITORÍA ====================
+def auditoria_antes(sender, instance, raw=False, **kwargs):
+    # Una lectura por llave primaria para conocer los valores anteriores
+    instance.__dict__.pop('_auditoria_antes', None)
+    if not auditoria.ACTIVA or raw or instance._state.adding or instance.pk is None:
+        return
+    instance._auditoria_antes = auditoria.valores_guardados(sender, instance.pk)
+
+
+def auditoria_guardado(sender, instance, created=False, raw=False, update_fields=None, **kwargs):
+    if raw or not auditoria.ACTIVA:
+        return
+    if created:
+        auditoria.registrar(sender, instance.pk, 'creado', auditoria.valores(instance))
+        return
+    despues = serializar_objeto(instance)
+    if update_fields:
+        guardados = {sender._meta.get_field(campo).attname for campo in update_fields}
+        despues = {campo: valor for campo, valor in despues.items() if campo in guardados}
+    cambios = auditoria.diferencias(getattr(instance, '_auditoria_antes', {}), despues)
+    if cambios:
+        auditoria.registrar(sender, instance.pk, 'modificado', cambios)
+
+
+def auditoria_borrado(sender, instance, **kwargs):
+    auditoria.registrar(sender, instance.pk, 'borrado', auditoria.valores(instance))
+
+
+for modelo in MODELOS_SINCRONIZADOS.values():
+    pre_save.connect(auditoria_antes, sender=modelo, dispatch_uid=f'auditoria_antes_{modelo.__name__}')
+    post_save.connect(auditoria_guardado, sender=modelo, dispatch_uid=f'auditoria_guardado_{modelo.__name__}')
+    post_delete.connect(auditoria_borrado, sender=modelo, dispatch_uid=f'auditoria_borrado_{modelo.__name__}')
+
+
+# ==================== ALERTAS DE REORDEN ====================
+def umbral_categoria(sender, instance, raw=False, created=False, **kwargs):
+    # El stock mínimo de la categoría aplica a sus productos sin umbral propio
+    if raw or created:
+        return
+    recalcular_alertas(Producto.objects.filter(categoria=instance, stock_minimo__isnull=True))
+
+
+post_save.connect(umbral_categoria, sender=Categoria, dispatch_uid='umbral_categoria')
+
+
+# ==================== DESEMPEÑO DE VENDEDORES ====================
+def venta_modificada(sender, instance, raw=False, **kwargs):
+    if not raw:
+        invalidar_tablas(instance.fecha_venta)
+
+
+post_save.connect(venta_modificada, sender=Venta, dispatch_uid='desempeno_venta_guardada')
+post_delete.connect(venta_modificada, sender=Venta, dispatch_uid='desempeno_venta_borrada')
+
+
+# ==================== OPCIONES DE FORMULARIOS ====================
+def opciones_modificadas(sender, raw=False, **kwargs):
+    if not raw:
+        transaction.on_commit(lambda: invalidar_opciones(sender))
+
+
+for modelo, _ in LISTAS.values():
+    post_save.connect(opciones_modificadas, sender=modelo, dispatch_uid=f'opciones_guardado_{modelo.__name__}')
+    post_delete.connect(opciones_modificadas, sender=modelo, dispatch_uid=f'opciones_borrado_{modelo.__name__}')
+
+
+# ==================== HISTORIAL DE PRECIOS ====================
+def precio_antes(sender, instance, raw=False, **kwargs):
+    # Con la auditoría activa auditoria_antes (conectada antes) ya leyó la fila
+    instance.__dict__.pop('_precio_antes', None)
+    if raw or instance._state.adding or instance.pk is None or hasattr(instance, '_auditoria_antes'):
+        return
+    instance._precio_antes = auditoria.valores_guardados(sender, instance.pk).get('precio')
+
+
+def precio_guardado(sender, instance, created=False, raw=False, update_fields=None, **kwargs):
+    if raw or (update_fields and 'precio' not in update_fields):
+        return
+    if created:
+        anterior = None
+    elif hasattr(instance, '_auditoria_antes'):
+        anterior = instance._auditoria_antes.get('precio')
+    else:
+        anterior = getattr(instance, '_precio_antes', None)
+    if created or anterior is None or Decimal(str(anterior)) != Decimal(str(instance.precio)):
+        PrecioHistorico.objects.create(producto_id=instance.pk, precio=instance.precio)
+
+
+pre_save.connect(precio_antes, sender=Producto, dispatch_uid='precio_antes')
+post_save.connect(precio_guardado, sender=Producto, dispatch_uid='precio_guardado')
+
+
+# ==================== EVENTOS EN VIVO ====================
+def publicar_stock(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    # La alerta se actualiza en la misma transacción que el producto
+    umbral = evaluar_producto(instance)
+    datos = {
+        'id': instance.pk,
+        'nombre': instance.nombre_producto,
+        'stock': instance.stock,
+        'umbral': umbral,
+    }
+    transaction.on_commit(lambda: central.publicar('stock', datos))
+
+
+def publicar_venta(sender, instance, created=False, raw=False, **kwargs):
+    if raw or not created:
+        return
+    datos = {
+        'id': instance.pk,
+        'folio': instance.folio,
+        'total': instance.total,
+        'producto_id': instance.producto_id,
+        'fecha_venta': instance.fecha_venta,
+    }
+    transaction.on_commit(lambda: central.publicar('venta', datos))
+
+
+post_save.connect(publicar_stock, sender=Producto, dispatch_uid='publicar_stock')
+post_save.connect(publicar_venta, sender=Venta, dispatch_uid='publicar_venta')
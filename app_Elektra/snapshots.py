@@ -0,0 +1,252 @@
+"""
+Snapshots de reportes de ventas guardados como JSON comprimido (gzip).
+
+Cada snapshot se identifica por la clave de sus filtros y guarda una marca
+de agua: la última venta incluida y el último id del registro de cambios
+revisado. Al consultarlo, los cambios de ventas posteriores a la marca
+deciden si sigue vigente, si basta con agregar las ventas nuevas o si hay
+que regenerarlo porque se modificó o borró una venta ya incluida. Las
+filas copian los nombres de producto, cliente y vendedor: renombrar o
+borrar uno que aparece en el snapshot también lo vuelve obsoleto.
+
+Consultar no escribe: las ventas nuevas se agregan en memoria y guardar
+el snapshot extendido queda como tarea (generar_snapshot_reporte).
+"""
+import gzip
+import hashlib
+import json
+import os
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Max
+from django.utils.dateparse import parse_datetime
+
+from .models import Venta, RegistroCambio, SnapshotReporte
+from .reportes import filtrar_ventas, filas_reporte, resumen_ventas, ventas_archivadas
+
+# Más cambios que esto no se aplican de forma incremental
+LIMITE_INCREMENTAL = 5000
+
+# Modelos cuyos nombres se copian en las filas: campo del nombre en la fila y en el registro
+REFERENCIAS = {
+    'producto': 'nombre_producto',
+    'cliente': 'nombre',
+    'vendedor': 'nombre',
+}
+
+VIGENTE = 'vigente'
+EXTENSIBLE = 'extensible'
+OBSOLETO = 'obsoleto'
+
+
+def clave_reporte(fecha_inicio, fecha_fin):
+    return hashlib.sha1(f"ventas|{fecha_inicio or ''}|{fecha_fin or ''}".encode()).hexdigest()
+
+
+def _ruta(nombre):
+    return os.path.join(settings.SNAPSHOTS_ROOT, nombre)
+
+
+def leer_snapshot(snapshot):
+    with gzip.open(_ruta(snapshot.archivo), 'rt', encoding='utf-8') as archivo:
+        datos = json.load(archivo)
+    for fila in datos['filas']:
+        fila['fecha_venta'] = parse_datetime(fila['fecha_venta'])
+    return datos
+
+
+def _escribir(clave, datos, ultima_venta_id, ultimo_cambio_id):
+    nombre = f"{clave}_{ultimo_cambio_id}_{ultima_venta_id}.json.gz"
+    os.makedirs(settings.SNAPSHOTS_ROOT, exist_ok=True)
+    with gzip.open(_ruta(nombre), 'wt', encoding='utf-8') as archivo:
+        json.dump(datos, archivo, cls=DjangoJSONEncoder, separators=(',', ':'))
+    return nombre
+
+
+def _guardar(snapshot, datos, ultima_venta_id, ultimo_cambio_id):
+    anterior = snapshot.archivo
+    snapshot.archivo = _escribir(snapshot.clave, datos, ultima_venta_id, ultimo_cambio_id)
+    snapshot.ultima_venta_id = ultima_venta_id
+    snapshot.ultimo_cambio_id = ultimo_cambio_id
+    snapshot.total_count = datos['resumen']['total_count']
+    snapshot.save()
+    if anterior and anterior != snapshot.archivo and os.path.exists(_ruta(anterior)):
+        os.remove(_ruta(anterior))
+    return snapshot
+
+
+def _marcas():
+    # El cambio se lee antes que la venta: lo ocurrido entre ambas
+    # lecturas se vuelve a revisar en la siguiente consulta
+    ultimo_cambio_id = RegistroCambio.objects.aggregate(Max('id'))['id__max'] or 0
+    ultima_venta_id = Venta.objects.aggregate(Max('id'))['id__max'] or 0
+    return ultima_venta_id, ultimo_cambio_id
+
+
+def estado_snapshot(snapshot):
+    """
+    Compara la marca de agua con los cambios de ventas posteriores. Los
+    nombres copiados se revisan aparte con referencias_cambiadas(). Las
+    ventas archivadas no cuentan: el reporte las sigue leyendo del archivo.
+    """
+    cambios = list(
+        RegistroCambio.objects.filter(modelo='venta', id__gt=snapshot.ultimo_cambio_id)
+        .exclude(operacion='borrado', datos__archivada=True)
+        .values_list('objeto_id', flat=True)[:LIMITE_INCREMENTAL + 1]
+    )
+    if not cambios:
+        return VIGENTE
+    if len(cambios) > LIMITE_INCREMENTAL:
+        return OBSOLETO
+    # Solo las ventas nuevas (id mayor a la marca) se pueden agregar
+    if any(objeto_id <= snapshot.ultima_venta_id for objeto_id in cambios):
+        return OBSOLETO
+    return EXTENSIBLE
+
+
+def referencias_cambiadas(snapshot, datos):
+    """
+    True si después de la marca se modificó o borró un producto, cliente o
+    vendedor cuyo nombre aparece distinto en las filas del snapshot. Los
+    cambios de stock de un producto no cuentan: el nombre sigue igual.
+    """
+    cambios = list(
+        RegistroCambio.objects.filter(modelo__in=REFERENCIAS, id__gt=snapshot.ultimo_cambio_id)
+        .values_list('modelo', 'objeto_id', 'operacion', 'datos')[:LIMITE_INCREMENTAL + 1]
+    )
+    if not cambios:
+        return False
+    if len(cambios) > LIMITE_INCREMENTAL:
+        return True
+
+    nombres = {modelo: {} for modelo in REFERENCIAS}
+    for fila in datos['filas']:
+        for modelo, campo in REFERENCIAS.items():
+            if 'id' not in fila[modelo]:
+                # Snapshot generado antes de guardar los ids: no se puede comparar
+                return True
+            nombres[modelo][fila[modelo]['id']] = fila[modelo][campo]
+
+    for modelo, objeto_id, operacion, registro in cambios:
+        if objeto_id not in nombres[modelo]:
+            continue
+        if operacion == 'borrado' or (registro or {}).get(REFERENCIAS[modelo]) != nombres[modelo][objeto_id]:
+            return True
+    return False
+
+
+def generar_snapshot(fecha_inicio, fecha_fin):
+    """Calcula el reporte completo y lo guarda como snapshot"""
+    clave = clave_reporte(fecha_inicio, fecha_fin)
+    ultima_venta_id, ultimo_cambio_id = _marcas()
+
+    ventas = filtrar_ventas(fecha_inicio, fecha_fin).filter(id__lte=ultima_venta_id)
+    # Las ventas archivadas no cambian: basta con incluirlas al generar
+    archivadas = ventas_archivadas(fecha_inicio, fecha_fin)
+    datos = {'resumen': resumen_ventas(ventas, archivadas), 'filas': filas_reporte(ventas, archivadas)}
+    # Normalizar tipos igual que al leer el archivo
+    datos = json.loads(json.dumps(datos, cls=DjangoJSONEncoder))
+
+    snapshot = SnapshotReporte.objects.filter(clave=clave).first() or SnapshotReporte(
+        clave=clave, fecha_inicio=fecha_inicio or None, fecha_fin=fecha_fin or None
+    )
+    return _guardar(snapshot, datos, ultima_venta_id, ultimo_cambio_id)
+
+
+def extender_datos(snapshot, datos, ultima_venta_id):
+    """
+    Agrega a los datos del snapshot, en memoria, las ventas creadas
+    después de su marca de agua y hasta `ultima_venta_id`.
+    """
+    nuevas = filtrar_ventas(snapshot.fecha_inicio, snapshot.fecha_fin).filter(
+        id__gt=snapshot.ultima_venta_id, id__lte=ultima_venta_id
+    )
+    filas_nuevas = json.loads(json.dumps(filas_reporte(nuevas), cls=DjangoJSONEncoder))
+    if not filas_nuevas:
+        return datos
+
+    resumen = datos['resumen']
+    total = Decimal(str(resumen['total_ventas']))
+    total += sum(Decimal(fila['total']) for fila in filas_nuevas)
+    resumen['total_count'] += len(filas_nuevas)
+    resumen['total_ventas'] = total
+    resumen['promedio_venta'] = total / resumen['total_count']
+
+    metodos = {m['nombre']: m['cantidad'] for m in resumen['metodos_pago_list']}
+    for fila in filas_nuevas:
+        metodos[fila['metodo_pago']] = metodos.get(fila['metodo_pago'], 0) + 1
+    resumen['metodos_pago_list'] = [
+        {'nombre': nombre, 'cantidad': cantidad}
+        for nombre, cantidad in sorted(metodos.items(), key=lambda m: -m[1])
+    ]
+
+    for fila in filas_nuevas:
+        fila['fecha_venta'] = parse_datetime(fila['fecha_venta'])
+    # Las ventas nuevas casi siempre son las más recientes: el
+    # ordenamiento sobre una lista casi ordenada es prácticamente lineal
+    datos['filas'] = sorted(filas_nuevas + datos['filas'], key=lambda f: f['fecha_venta'], reverse=True)
+    return datos
+
+
+def extender_snapshot(snapshot, datos):
+    """Agrega al snapshot guardado las ventas creadas después de su marca de agua"""
+    ultima_venta_id, ultimo_cambio_id = _marcas()
+    anteriores = snapshot.total_count
+    datos = extender_datos(snapshot, datos, ultima_venta_id)
+
+    if datos['resumen']['total_count'] == anteriores:
+        # Ninguna venta nueva cae en el rango: solo se adelanta la marca
+        snapshot.ultima_venta_id = ultima_venta_id
+        snapshot.ultimo_cambio_id = ultimo_cambio_id
+        snapshot.save(update_fields=['ultima_venta_id', 'ultimo_cambio_id', 'fecha_generacion'])
+        return datos
+
+    _guardar(snapshot, datos, ultima_venta_id, ultimo_cambio_id)
+    return datos
+
+
+def obtener_reporte(fecha_inicio, fecha_fin):
+    """
+    Datos del reporte desde su snapshot, con las ventas nuevas agregadas
+    en memoria; guardarlo extendido se encola. Devuelve (datos, snapshot);
+    datos es None si el snapshot no existe o hay que regenerarlo.
+    """
+    snapshot = SnapshotReporte.objects.filter(clave=clave_reporte(fecha_inicio, fecha_fin)).first()
+    if snapshot is None:
+        return None, None
+    if not os.path.exists(_ruta(snapshot.archivo)):
+        return None, snapshot
+
+    estado = estado_snapshot(snapshot)
+    if estado == OBSOLETO:
+        return None, snapshot
+
+    datos = leer_snapshot(snapshot)
+    if referencias_cambiadas(snapshot, datos):
+        return None, snapshot
+    if estado == EXTENSIBLE:
+        # Importado aquí: tareas importa este módulo
+        from .tareas import encolar
+
+        datos = extender_datos(snapshot, datos, Venta.objects.aggregate(Max('id'))['id__max'] or 0)
+        encolar('generar_snapshot_reporte', unica=True, fecha_inicio=fecha_inicio, fecha_fin=fecha_fin)
+    return datos, snapshot
+
+
+def actualizar_snapshot(fecha_inicio, fecha_fin):
+    """Deja al día el snapshot del rango: lo extiende o lo regenera según haga falta"""
+    snapshot = SnapshotReporte.objects.filter(clave=clave_reporte(fecha_inicio, fecha_fin)).first()
+    if snapshot is None or not os.path.exists(_ruta(snapshot.archivo)):
+        return generar_snapshot(fecha_inicio, fecha_fin)
+
+    estado = estado_snapshot(snapshot)
+    if estado == OBSOLETO:
+        return generar_snapshot(fecha_inicio, fecha_fin)
+    datos = leer_snapshot(snapshot)
+    if referencias_cambiadas(snapshot, datos):
+        return generar_snapshot(fecha_inicio, fecha_fin)
+    if estado == EXTENSIBLE:
+        extender_snapshot(snapshot, datos)
+    return snapshot
@@ -0,0 +1,164 @@
+"""
+Stock y reportes por sucursal.
+
+Producto.stock es la existencia total de la cadena y StockSucursal dice
+cuántas de esas unidades están en cada sucursal; el resto está en el
+almacén central. Repartir mueve unidades entre el almacén y una sucursal
+sin cambiar el total; una venta con sucursal descuenta de los dos.
+
+Las filas de StockSucursal y VentaSucursal se leen siempre con
+.using(base_sucursal(...)): con SUCURSALES_BASES viven en la base propia
+de cada sucursal (ver router.py), sin él todo queda en default.
+"""
+from collections import defaultdict
+
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import Greatest, TruncDate
+from django.utils import timezone
+
+from .models import Producto, Venta, StockSucursal, VentaSucursal
+from .router import base_sucursal, bases_sucursales
+
+# Productos que coinciden con una búsqueda cuando el stock está en otra base
+# (no hay subconsulta entre bases: los ids viajan en la consulta)
+MAX_PRODUCTOS_BUSQUEDA = 500
+
+TOP_PRODUCTOS = 10
+
+
+class StockInsuficiente(ValueError):
+    """No hay unidades suficientes para repartir"""
+
+
+def _bases():
+    return {DEFAULT_DB_ALIAS, *bases_sucursales().values()}
+
+
+def existencias(sucursal, q=''):
+    """Stock de la sucursal, filtrado por nombre o SKU del producto"""
+    base = base_sucursal(sucursal)
+    filas = StockSucursal.objects.using(base).filter(sucursal_id=sucursal.pk)
+    if q:
+        ids = Producto.objects.filter(Q(nombre_producto__icontains=q) | Q(sku__icontains=q)).values('id')
+        if base != DEFAULT_DB_ALIAS:
+            ids = list(ids.values_list('id', flat=True)[:MAX_PRODUCTOS_BUSQUEDA])
+        filas = filas.filter(producto_id__in=ids)
+    return filas.order_by('-stock', 'producto_id')
+
+
+def con_productos(filas):
+    """Asigna `producto` a cada fila con un solo in_bulk (el join no cruza bases)"""
+    filas = list(filas)
+    productos = Producto.objects.in_bulk({fila.producto_id for fila in filas})
+    for fila in filas:
+        fila.producto = productos.get(fila.producto_id)
+    return [fila for fila in filas if fila.producto is not None]
+
+
+def stock_en_sucursal(sucursal_id, producto_id):
+    return StockSucursal.objects.using(base_sucursal(sucursal_id)).filter(
+        sucursal_id=sucursal_id, producto_id=producto_id
+    ).values_list('stock', flat=True).first() or 0
+
+
+def stock_repartido(producto_id):
+    """Unidades del producto en todas las sucursales"""
+    return sum(
+        StockSucursal.objects.using(base).filter(producto_id=producto_id).aggregate(total=Sum('stock'))['total'] or 0
+        for base in _bases()
+    )
+
+
+def mover_stock(sucursal_id, producto_id, cantidad):
+    """Suma `cantidad` (negativa para restar) al stock de la sucursal, sin bajar de 0"""
+    filas = StockSucursal.objects.using(base_sucursal(sucursal_id)).filter(
+        sucursal_id=sucursal_id, producto_id=producto_id
+    )
+    actualizadas = filas.update(stock=Greatest(F('stock') + cantidad, 0), fecha_actualizacion=timezone.now())
+    if not actualizadas and cantidad > 0:
+        filas.create(sucursal_id=sucursal_id, producto_id=producto_id, stock=cantidad)
+
+
+def repartir_stock(sucursal, producto_id, cantidad):
+    """
+    Mueve `cantidad` unidades del almacén central a la sucursal, o de
+    regreso si es negativa. El producto queda bloqueado mientras se
+    revisa cuánto hay repartido.
+    """
+    base = base_sucursal(sucursal)
+    with transaction.atomic(), transaction.atomic(using=base):
+        producto = Producto.objects.select_for_update().filter(pk=producto_id).first()
+        if producto is None:
+            raise StockInsuficiente('El producto no existe')
+        if cantidad > 0:
+            almacen = producto.stock - stock_repartido(producto_id)
+            if almacen < cantidad:
+                raise StockInsuficiente(f'En el almacén central solo hay {max(almacen, 0)} unidad(es)')
+        else:
+            actual = stock_en_sucursal(sucursal.pk, producto_id)
+            if actual < -cantidad:
+                raise StockInsuficiente(f'La sucursal solo tiene {actual} unidad(es)')
+        mover_stock(sucursal.pk, producto_id, cantidad)
+    return producto
+
+
+def _por_base(sucursales):
+    grupos = defaultdict(list)
+    for sucursal in sucursales:
+        grupos[base_sucursal(sucursal)].append(sucursal.pk)
+    return grupos.items()
+
+
+def unidades_por_sucursal(sucursales):
+    """{sucursal_id: {'productos', 'unidades'}}: una consulta agrupada por base"""
+    resultado = {}
+    for base, ids in _por_base(sucursales):
+        filas = (
+            StockSucursal.objects.using(base).filter(sucursal_id__in=ids)
+            .values('sucursal_id')
+            .annotate(productos=Count('id', filter=Q(stock__gt=0)), unidades=Sum('stock'))
+            .order_by()
+        )
+        resultado.update({fila['sucursal_id']: fila for fila in filas})
+    return resultado
+
+
+def por_consolidar(sucursales):
+    """{sucursal_id: ventas capturadas en su base que aún no pasan a Venta}"""
+    resultado = {}
+    for base, ids in _por_base(sucursales):
+        if base == DEFAULT_DB_ALIAS:
+            continue
+        filas = (
+            VentaSucursal.objects.using(base).filter(sucursal_id__in=ids, estado='pendiente')
+            .values('sucursal_id').annotate(ventas=Count('id')).order_by()
+        )
+        resultado.update({fila['sucursal_id']: fila['ventas'] for fila in filas})
+    return resultado
+
+
+def reporte_sucursal(sucursal, desde, hasta):
+    """
+    Ventas de la sucursal entre `desde` y `hasta` (datetimes, hasta
+    exclusivo): totales, ventas por día y productos más vendidos. Todas
+    filtran por (sucursal, fecha_venta), el índice venta_sucursal_fecha_idx.
+    """
+    ventas = Venta.objects.filter(sucursal=sucursal, fecha_venta__gte=desde, fecha_venta__lt=hasta)
+    totales = ventas.aggregate(ventas=Count('id'), monto=Sum('total'))
+    por_dia = (
+        ventas.annotate(dia=TruncDate('fecha_venta'))
+        .values('dia').annotate(ventas=Count('id'), monto=Sum('total'))
+        .order_by('dia')
+    )
+    productos = (
+        ventas.values('producto_id', 'producto__nombre_producto')
+        .annotate(ventas=Count('id'), monto=Sum('total'))
+        .order_by('-monto')[:TOP_PRODUCTOS]
+    )
+    return {
+        'ventas': totales['ventas'],
+        'monto': totales['monto'] or 0,
+        'por_dia': list(por_dia),
+        'productos': list(productos),
+    }
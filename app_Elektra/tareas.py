@@ -0,0 +1,274 @@
+"""
+Cola de tareas en segundo plano respaldada por la tabla Tarea.
+
+Las vistas encolan trabajo con encolar('nombre', **argumentos) y el
+comando procesar_tareas lo ejecuta en un pool de hilos o procesos.
+"""
+import os
+import traceback
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.db.models import F, Q
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from . import archivo, inventario
+from .models import Tarea
+from .reportes import reporte_ventas, estadisticas_dashboard
+from .snapshots import actualizar_snapshot
+
+REGISTRO = {}
+
+# Segundos de espera antes del reintento n: ESPERA_BASE * 2**(n - 1)
+ESPERA_BASE = 10
+
+# Segundos que se consideran vigentes los contadores del dashboard
+VIGENCIA_CONTADORES = 60
+
+
+def tarea(nombre):
+    """Registra una función como tarea ejecutable por el worker"""
+    def decorador(funcion):
+        REGISTRO[nombre] = funcion
+        return funcion
+    return decorador
+
+
+def encolar(nombre, unica=False, max_intentos=3, **argumentos):
+    """
+    Crea una tarea pendiente. Con unica=True no se duplica si ya hay otra
+    pendiente con el mismo nombre y argumentos.
+    """
+    if nombre not in REGISTRO:
+        raise ValueError(f'Tarea desconocida: {nombre}')
+
+    if unica:
+        existente = Tarea.objects.filter(
+            nombre=nombre, estado='pendiente', argumentos=argumentos
+        ).first()
+        if existente:
+            return existente
+
+    return Tarea.objects.create(nombre=nombre, argumentos=argumentos, max_intentos=max_intentos)
+
+
+def encolar_imagen(instancia, campo):
+    """Encola el post-procesamiento de una imagen cuando la transacción confirme"""
+    transaction.on_commit(lambda: encolar(
+        'procesar_imagen', unica=True,
+        modelo=instancia._meta.model_name, objeto_id=instancia.pk, campo=campo
+    ))
+
+
+def reclamar_tareas(limite):
+    """
+    Marca como 'en_proceso' hasta `limite` tareas listas y devuelve sus ids.
+    El UPDATE condicionado al estado evita que dos workers tomen la misma.
+    """
+    ahora = timezone.now()
+    candidatas = (
+        Tarea.objects.filter(estado='pendiente', ejecutar_despues__lte=ahora)
+        .order_by('ejecutar_despues', 'id')
+        .values_list('id', flat=True)[:limite]
+    )
+    reclamadas = []
+    for tarea_id in candidatas:
+        tomada = Tarea.objects.filter(id=tarea_id, estado='pendiente').update(
+            estado='en_proceso',
+            fecha_inicio=ahora,
+            intentos=F('intentos') + 1,
+        )
+        if tomada:
+            reclamadas.append(tarea_id)
+    return reclamadas
+
+
+def rescatar_tareas(minutos):
+    """Devuelve a la cola las tareas abandonadas por un worker caído"""
+    limite = timezone.now() - timedelta(minutes=minutos)
+    return Tarea.objects.filter(estado='en_proceso', fecha_inicio__lt=limite).update(estado='pendiente')
+
+
+def purgar_tareas(dias):
+    """Elimina las tareas terminadas hace más de `dias` días"""
+    limite = timezone.now() - timedelta(days=dias)
+    borradas, _ = Tarea.objects.filter(
+        estado__in=['completada', 'fallida'], fecha_fin__lt=limite
+    ).delete()
+    return borradas
+
+
+def ejecutar_tarea(tarea_id):
+    """Ejecuta una tarea reclamada y guarda su resultado o error"""
+    close_old_connections()
+    try:
+        registro = Tarea.objects.get(id=tarea_id)
+        try:
+            resultado = REGISTRO[registro.nombre](**registro.argumentos)
+        except Exception:
+            registro.error = traceback.format_exc()
+            if registro.intentos < registro.max_intentos:
+                registro.estado = 'pendiente'
+                espera = ESPERA_BASE * 2 ** (registro.intentos - 1)
+                registro.ejecutar_despues = timezone.now() + timedelta(seconds=espera)
+            else:
+                registro.estado = 'fallida'
+                registro.fecha_fin = timezone.now()
+            registro.save(update_fields=['estado', 'error', 'ejecutar_despues', 'fecha_fin'])
+            return registro.estado
+
+        registro.estado = 'completada'
+        registro.resultado = resultado
+        registro.error = ''
+        registro.fecha_fin = timezone.now()
+        registro.save(update_fields=['estado', 'resultado', 'error', 'fecha_fin'])
+        return registro.estado
+    finally:
+        # Cada hilo del pool tiene su propia conexión
+        connection.close()
+
+
+# ==================== TAREAS DEL SISTEMA ====================
+TAMANO_MAXIMO_IMAGEN = 1600
+
+
+@tarea('procesar_imagen')
+def procesar_imagen(modelo, objeto_id, campo):
+    """Reduce y optimiza una imagen subida sin bloquear la petición"""
+    # PIL tarda decenas de ms en importarse: solo lo paga el worker que procesa imágenes
+    from PIL import Image
+
+    instancia = apps.get_model('app_Elektra', modelo).objects.filter(pk=objeto_id).first()
+    if instancia is None:
+        return {'omitida': 'registro inexistente'}
+
+    archivo = getattr(instancia, campo)
+    if not archivo or archivo.name == instancia._meta.get_field(campo).default:
+        return {'omitida': 'sin imagen propia'}
+
+    ruta = archivo.path
+    with Image.open(ruta) as imagen:
+        tamano_original = imagen.size
+        formato = imagen.format
+        imagen.thumbnail((TAMANO_MAXIMO_IMAGEN, TAMANO_MAXIMO_IMAGEN))
+        opciones = {'optimize': True}
+        if formato == 'JPEG':
+            opciones['quality'] = 85
+        imagen.save(ruta, formato, **opciones)
+        tamano_final = imagen.size
+
+    return {
+        'archivo': archivo.name,
+        'tamano_original': tamano_original,
+        'tamano_final': tamano_final,
+        'bytes': os.path.getsize(ruta),
+    }
+
+
+@tarea('renderizar_reporte_ventas')
+def renderizar_reporte_ventas(fecha_inicio='', fecha_fin=''):
+    """Genera el reporte de ventas como HTML estático en MEDIA_ROOT/reportes"""
+    ventas, resumen = reporte_ventas(fecha_inicio, fecha_fin)
+    contexto = {
+        'ventas': ventas,
+        'fecha_inicio': fecha_inicio,
+        'fecha_fin': fecha_fin,
+        **resumen,
+    }
+    html = render_to_string('reportes/ventas.html', contexto)
+
+    nombre = f"ventas_{fecha_inicio or 'inicio'}_{fecha_fin or 'hoy'}_{timezone.now():%Y%m%d%H%M%S}.html"
+    carpeta = os.path.join(settings.MEDIA_ROOT, 'reportes')
+    os.makedirs(carpeta, exist_ok=True)
+    with open(os.path.join(carpeta, nombre), 'w', encoding='utf-8') as archivo:
+        archivo.write(html)
+
+    return {
+        'url': f"{settings.MEDIA_URL}reportes/{nombre}",
+        'total_count': contexto['total_count'],
+        'total_ventas': contexto['total_ventas'],
+    }
+
+
+@tarea('reconstruir_contadores')
+def reconstruir_contadores():
+    """Recalcula los contadores del dashboard; el resultado queda en la tarea"""
+    # Solo interesa la reconstrucción más reciente
+    Tarea.objects.filter(nombre='reconstruir_contadores', estado='completada').delete()
+    return estadisticas_dashboard()
+
+
+def programar_contadores(vigencia=VIGENCIA_CONTADORES):
+    """
+    Encola la reconstrucción de los contadores si la última tiene más de
+    `vigencia` segundos y no hay otra pendiente o en proceso. La llama el
+    worker: el dashboard solo lee los contadores, nunca encola.
+    """
+    limite = timezone.now() - timedelta(seconds=vigencia)
+    if Tarea.objects.filter(nombre='reconstruir_contadores').filter(
+        Q(estado__in=['pendiente', 'en_proceso']) | Q(estado='completada', fecha_fin__gte=limite)
+    ).exists():
+        return None
+    return encolar('reconstruir_contadores')
+
+
+@tarea('generar_snapshot_reporte')
+def generar_snapshot_reporte(fecha_inicio='', fecha_fin=''):
+    """Genera o pone al día el snapshot comprimido de un rango de fechas"""
+    snapshot = actualizar_snapshot(fecha_inicio, fecha_fin)
+    return {'snapshot_id': snapshot.id, 'total_count': snapshot.total_count}
+
+
+@tarea('calcular_pronosticos')
+def calcular_pronosticos(dias=28):
+    """Recalcula velocidad de venta y agotamiento estimado de todos los productos"""
+    # NumPy solo se carga en el worker que ejecuta el pronóstico
+    from .pronosticos import calcular_pronosticos as calcular, guardar_pronosticos
+
+    guardados = guardar_pronosticos(calcular(dias))
+    return {'productos': guardados}
+
+
+@tarea('segmentar_clientes')
+def segmentar_clientes(completo=False, actualizar_tipo=False):
+    """Segmentación RFM incremental de los clientes"""
+    # NumPy solo se carga en el worker que ejecuta la segmentación
+    from .segmentacion import segmentar_clientes as segmentar
+
+    return segmentar(completo=completo, actualizar_tipo=actualizar_tipo)
+
+
+@tarea('archivar_ventas')
+def archivar_ventas(dias=None):
+    """Mueve las ventas cerradas más antiguas que el horizonte a la partición fría"""
+    corte = archivo.corte_archivo(dias)
+    return {'corte': corte.isoformat(), 'archivadas': archivo.archivar_ventas(corte)}
+
+
+@tarea('snapshot_inventario')
+def snapshot_inventario(descripcion=''):
+    """Guarda el valor del inventario por categoría y proveedor"""
+    snapshot = inventario.tomar_snapshot(descripcion)
+    return {'snapshot_id': snapshot.id, 'valor': snapshot.valor, 'unidades': snapshot.unidades}
+
+
+@tarea('borrar_por_lotes')
+def borrar_por_lotes(modelo, ids):
+    """Borrado en cascada demasiado grande para hacerse en la petición"""
+    # borrado importa encolar de este módulo
+    from .borrado import borrar_por_lotes as borrar
+
+    borrados = borrar(apps.get_model(modelo)._base_manager.filter(pk__in=ids))
+    return dict(borrados)
+
+
+@tarea('consolidar_sucursal')
+def consolidar_sucursal(sucursal_id):
+    """Pasa a Venta las ventas capturadas en la base propia de una sucursal"""
+    # ingesta importa encolar de este módulo
+    from .ingesta import consolidar_sucursal as consolidar
+
+    return consolidar(sucursal_id)
@@ -1,13 +1,15 @@
+from decimal import Decimal, InvalidOperation
+
 from django import template
 
 register = template.Library()
 
 @register.filter
 def multiply(value, arg):
-    """Multiplica value por arg"""
+    """Multiplica value por arg en Decimal (precio * stock sin redondeos de float)"""
     try:
-        return float(value) * float(arg)
-    except (ValueError, TypeError):
+        return Decimal(str(value)) * Decimal(str(arg))
+    except (InvalidOperation, ValueError, TypeError):
         return 0
 
 @register.filter
@@ -1,3 +1,238 @@
-from django.test import TestCase
+from datetime import datetime, timedelta
+from decimal import Decimal
+from threading import Thread
+from unittest import mock
 
-# Create your tests here.
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+
+from . import folios
+from .ajustes import AjusteInvalido, aplicar_ajuste, deshacer_ajuste
+from .archivo import archivar_ventas, corte_archivo
+from .borrado import borrar_por_lotes, cantidad_afectada, impacto_borrado
+from .folios import GeneradorFolios, NodoEnTransaccion, partes_folio
+from .ingesta import registrar_ventas
+from .models import (
+    Proveedor, Categoria, Producto, Vendedor, Cliente, Venta, VentaArchivada, PrecioHistorico, RegistroCambio
+)
+from .precios import precio_al, precios_al
+
+
+def fecha(*partes):
+    return timezone.make_aware(datetime(*partes))
+
+
+class DatosBase(TestCase):
+    """Proveedor, categoría, dos productos, vendedor y cliente para las pruebas"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.proveedor = Proveedor.objects.create(
+            nombre='Proveedor', pais='MX', direccion='-', telefono='0', email='proveedor@example.com'
+        )
+        cls.categoria = Categoria.objects.create(nombre='Categoría')
+        cls.productos = [
+            Producto.objects.create(
+                nombre_producto=f'Producto {i}', categoria=cls.categoria, proveedor=cls.proveedor,
+                precio=Decimal('100.00'), stock=50, descripcion='-', sku=f'SKU-{i}'
+            )
+            for i in range(2)
+        ]
+        cls.producto = cls.productos[0]
+        cls.vendedor = Vendedor.objects.create(nombre='Vendedor', telefono='0', email='vendedor@example.com')
+        cls.cliente = Cliente.objects.create(
+            nombre='Cliente', telefono='0', email='cliente@example.com', direccion='-'
+        )
+
+    def setUp(self):
+        # TestCase corre dentro de un atomic(): el nodo de folios va fijo
+        parche = mock.patch.object(folios, 'generador', GeneradorFolios(nodo=1))
+        parche.start()
+        self.addCleanup(parche.stop)
+
+    def venta(self, estado='completada', fecha_venta=None, producto=None):
+        return Venta.objects.create(
+            folio=folios.generar_folio(),
+            fecha_venta=fecha_venta or timezone.now(),
+            total=Decimal('100.00'),
+            metodo_pago='efectivo',
+            estado=estado,
+            vendedor=self.vendedor,
+            producto=producto or self.producto,
+            cliente=self.cliente
+        )
+
+
+# ==================== FOLIOS ====================
+class FoliosTests(SimpleTestCase):
+
+    def generar_en_hilos(self, generadores, por_hilo=2000):
+        resultados = [[] for _ in generadores]
+
+        def generar(generador, destino):
+            destino.extend(generador.folio() for _ in range(por_hilo))
+
+        hilos = [Thread(target=generar, args=par) for par in zip(generadores, resultados)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        return resultados
+
+    def test_folios_unicos_y_crecientes_entre_hilos(self):
+        generador = GeneradorFolios(nodo=5)
+        resultados = self.generar_en_hilos([generador] * 4)
+        todos = [folio for lista in resultados for folio in lista]
+        self.assertEqual(len(set(todos)), len(todos))
+        for lista in resultados:
+            self.assertEqual(lista, sorted(lista))
+        self.assertEqual(partes_folio(todos[0])[1], 5)
+
+    def test_nodos_distintos_no_chocan(self):
+        primero, segundo = self.generar_en_hilos([GeneradorFolios(nodo=1), GeneradorFolios(nodo=2)])
+        self.assertFalse(set(primero) & set(segundo))
+
+
+class FoliosEnTransaccionTests(TestCase):
+
+    def test_no_reserva_nodo_dentro_de_atomic(self):
+        with self.assertRaises(NodoEnTransaccion):
+            GeneradorFolios().folio()
+
+
+# ==================== INGESTA IDEMPOTENTE ====================
+class IngestaTests(DatosBase):
+
+    def datos(self, clave, cantidad=2):
+        return {
+            'clave': clave,
+            'producto': self.producto.pk,
+            'cliente': self.cliente.pk,
+            'vendedor': self.vendedor.pk,
+            'cantidad': cantidad,
+            'metodo_pago': 'efectivo',
+        }
+
+    def test_reintento_no_duplica_la_venta(self):
+        primera = registrar_ventas([self.datos('clave-1')])[0]
+        segunda = registrar_ventas([self.datos('clave-1')])[0]
+
+        self.assertEqual(primera['estado'], 'creada')
+        self.assertEqual(segunda['estado'], 'duplicada')
+        self.assertEqual((segunda['id'], segunda['folio']), (primera['id'], primera['folio']))
+        self.assertEqual(Venta.objects.filter(clave_idempotencia='clave-1').count(), 1)
+        self.producto.refresh_from_db()
+        self.assertEqual(self.producto.stock, 48)
+
+    def test_clave_repetida_en_el_mismo_lote(self):
+        resultados = registrar_ventas([self.datos('clave-2'), self.datos('clave-2')])
+        self.assertEqual([r['estado'] for r in resultados], ['creada', 'duplicada'])
+        self.producto.refresh_from_db()
+        self.assertEqual(self.producto.stock, 48)
+
+    def test_folios_unicos_en_un_lote(self):
+        resultados = registrar_ventas([self.datos(f'lote-{i}', cantidad=1) for i in range(40)])
+        folios_lote = [r['folio'] for r in resultados]
+        self.assertEqual(len(set(folios_lote)), 40)
+        self.assertEqual(folios_lote, sorted(folios_lote))
+
+
+# ==================== ARCHIVO ====================
+class ArchivoTests(DatosBase):
+
+    def test_archiva_cerradas_y_deja_pendientes(self):
+        antigua = timezone.now() - timedelta(days=800)
+        completada = self.venta('completada', antigua)
+        cancelada = self.venta('cancelada', antigua)
+        pendiente = self.venta('pendiente', antigua)
+        reciente = self.venta('completada')
+
+        movidas = archivar_ventas(corte_archivo(730), tamano_lote=1)
+
+        self.assertEqual(movidas, 2)
+        self.assertQuerySetEqual(
+            Venta.objects.order_by('id').values_list('id', flat=True), [pendiente.pk, reciente.pk]
+        )
+        self.assertQuerySetEqual(
+            VentaArchivada.objects.order_by('id').values_list('id', flat=True), [completada.pk, cancelada.pk]
+        )
+        self.assertQuerySetEqual(
+            RegistroCambio.objects.filter(modelo='venta', operacion='borrado').order_by('objeto_id')
+            .values_list('objeto_id', flat=True),
+            [completada.pk, cancelada.pk]
+        )
+
+
+# ==================== AJUSTES MASIVOS ====================
+class AjustesTests(DatosBase):
+
+    def test_deshacer_precio_respeta_cambios_posteriores(self):
+        ajuste = aplicar_ajuste(Producto.objects.filter(categoria=self.categoria), 'precio', 'porcentaje', 10)
+        otro = Producto.objects.get(pk=self.productos[1].pk)
+        self.assertEqual(otro.precio, Decimal('110.00'))
+        otro.precio = Decimal('150.00')
+        otro.save()
+
+        self.assertEqual(deshacer_ajuste(ajuste.pk), 1)
+        self.assertEqual(Producto.objects.get(pk=self.producto.pk).precio, Decimal('100.00'))
+        self.assertEqual(Producto.objects.get(pk=otro.pk).precio, Decimal('150.00'))
+
+    def test_deshacer_stock_conserva_ventas_posteriores(self):
+        ajuste = aplicar_ajuste(Producto.objects.filter(pk=self.producto.pk), 'stock', 'absoluto', 5)
+        Producto.objects.filter(pk=self.producto.pk).update(stock=53)
+
+        deshacer_ajuste(ajuste.pk)
+        self.assertEqual(Producto.objects.get(pk=self.producto.pk).stock, 48)
+
+    def test_no_se_deshace_dos_veces(self):
+        ajuste = aplicar_ajuste(Producto.objects.filter(pk=self.producto.pk), 'precio', 'absoluto', 5)
+        deshacer_ajuste(ajuste.pk)
+        with self.assertRaises(AjusteInvalido):
+            deshacer_ajuste(ajuste.pk)
+
+
+# ==================== BORRADO POR LOTES ====================
+class BorradoTests(DatosBase):
+
+    def test_impacto_coincide_con_lo_borrado(self):
+        for producto in self.productos:
+            for _ in range(3):
+                self.venta(producto=producto)
+        consulta = Proveedor.objects.filter(pk=self.proveedor.pk)
+        impacto = impacto_borrado(consulta)
+
+        borrados = borrar_por_lotes(consulta, tamano_lote=2)
+
+        self.assertEqual(cantidad_afectada(impacto, Producto), 2)
+        self.assertEqual(cantidad_afectada(impacto, Venta), 6)
+        self.assertEqual(
+            {fila['modelo']._meta.label: fila['cantidad'] for fila in impacto if fila['accion'] == 'eliminados'},
+            {etiqueta: cantidad for etiqueta, cantidad in borrados.items() if cantidad}
+        )
+        self.assertFalse(Venta.objects.exists())
+        self.assertTrue(Vendedor.objects.filter(pk=self.vendedor.pk).exists())
+
+
+# ==================== HISTORIAL DE PRECIOS ====================
+class PrecioAlTests(DatosBase):
+
+    def setUp(self):
+        super().setUp()
+        PrecioHistorico.objects.filter(producto=self.producto).delete()
+        PrecioHistorico.objects.bulk_create([
+            PrecioHistorico(producto=self.producto, precio=Decimal('80.00'), vigente_desde=fecha(2025, 1, 1)),
+            PrecioHistorico(producto=self.producto, precio=Decimal('90.00'), vigente_desde=fecha(2025, 6, 1)),
+        ])
+
+    def test_precio_vigente_en_la_fecha(self):
+        self.assertEqual(precio_al(self.producto.pk, fecha(2025, 3, 15)), Decimal('80.00'))
+        self.assertEqual(precio_al(self.producto.pk, fecha(2025, 6, 1)), Decimal('90.00'))
+        self.assertEqual(precio_al(self.producto.pk, fecha(2026, 1, 1)), Decimal('90.00'))
+
+    def test_sin_registro_devuelve_por_defecto(self):
+        self.assertIsNone(precio_al(self.producto.pk, fecha(2024, 12, 31)))
+        self.assertEqual(precio_al(self.producto.pk, fecha(2024, 12, 31), por_defecto=0), 0)
+
+    def test_precios_al_coincide_con_precio_al(self):
+        cuando = fecha(2025, 3, 15)
+        self.assertEqual(precios_al(cuando, [self.producto.pk, self.productos[1].pk]), {self.producto.pk: Decimal('80.00')})
@@ -10,6 +10,7 @@ urlpatterns = [
     path('proveedores/agregar/', views.proveedores_agregar, name='proveedores_agregar'),
     path('proveedores/actualizar/<int:pk>/', views.proveedores_actualizar, name='proveedores_actualizar'),
     path('proveedores/borrar/<int:pk>/', views.proveedores_borrar, name='proveedores_borrar'),
+    path('proveedores/<int:pk>/productos/', views.proveedores_productos, name='proveedores_productos'),
     
     # Categorías
     path('categorias/', views.categorias_ver, name='categorias_ver'),
@@ -22,12 +23,14 @@ urlpatterns = [
     path('productos/agregar/', views.productos_agregar, name='productos_agregar'),
     path('productos/actualizar/<int:pk>/', views.productos_actualizar, name='productos_actualizar'),
     path('productos/borrar/<int:pk>/', views.productos_borrar, name='productos_borrar'),
+    path('productos/alertas/', views.productos_alertas, name='productos_alertas'),
     
     # Vendedores
     path('vendedores/', views.vendedores_ver, name='vendedores_ver'),
     path('vendedores/agregar/', views.vendedores_agregar, name='vendedores_agregar'),
     path('vendedores/actualizar/<int:pk>/', views.vendedores_actualizar, name='vendedores_actualizar'),
     path('vendedores/borrar/<int:pk>/', views.vendedores_borrar, name='vendedores_borrar'),
+    path('vendedores/desempeno/', views.vendedores_desempeno, name='vendedores_desempeno'),
     
     # Clientes
     path('clientes/', views.clientes_ver, name='clientes_ver'),
@@ -40,7 +43,29 @@ urlpatterns = [
     path('ventas/agregar/', views.ventas_agregar, name='ventas_agregar'),
     path('ventas/actualizar/<int:pk>/', views.ventas_actualizar, name='ventas_actualizar'),
     path('ventas/borrar/<int:pk>/', views.ventas_borrar, name='ventas_borrar'),
+    path('ventas/recibo/<int:pk>/', views.ventas_recibo, name='ventas_recibo'),
+    path('ventas/recibos/', views.ventas_recibos, name='ventas_recibos'),
+    
+    # Sucursales
+    path('sucursales/', views.sucursales_ver, name='sucursales_ver'),
+    path('sucursales/<int:pk>/', views.sucursales_detalle, name='sucursales_detalle'),
+    path('sucursales/<int:pk>/repartir/', views.sucursales_repartir, name='sucursales_repartir'),
     
     # Reportes
     path('reportes/ventas/', views.reportes_ventas, name='reportes_ventas'),
+    path('reportes/ventas/exportar/', views.reportes_ventas_exportar, name='reportes_ventas_exportar'),
+    path('reportes/snapshots/<int:pk>/descargar/', views.reportes_snapshot_descargar, name='reportes_snapshot_descargar'),
+    path('reportes/inventario/', views.reportes_inventario, name='reportes_inventario'),
+    path('reportes/inventario/snapshot/', views.reportes_inventario_snapshot, name='reportes_inventario_snapshot'),
+    path('reportes/inventario/detalle/', views.reportes_inventario_detalle, name='reportes_inventario_detalle'),
+    path('reportes/precios/', views.reportes_precios, name='reportes_precios'),
+    
+    # Tareas en segundo plano
+    path('tareas/<int:pk>/', views.tareas_estado, name='tareas_estado'),
+    
+    # Sincronización
+    path('api/cambios/', views.sincronizacion_cambios, name='sincronizacion_cambios'),
+    path('api/ventas/lote/', views.api_ventas_lote, name='api_ventas_lote'),
+    path('api/buscar/<str:lista>/', views.api_buscar, name='api_buscar'),
+    path('api/eventos/', views.eventos_stream, name='eventos_stream'),
 ]
\ No newline at end of file
@@ -1,51 +1,99 @@
 from django.shortcuts import render, redirect, get_object_or_404
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse, FileResponse, Http404
 from django.urls import reverse
 from django.contrib import messages
 from django.core.paginator import Paginator
-from django.db.models import Q, Sum
+from django.db import transaction
+from django.db.models import Q, Count, Sum, Window
 from django.utils import timezone
-from .models import *
+from django.utils.html import format_html
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+from collections import Counter
+from datetime import date, datetime, time, timedelta
+import json
+import os
+import uuid
+from .models import (
+    Proveedor, Categoria, Producto, Vendedor, Cliente, Venta, Sucursal,
+    Tarea, ReporteGuardado, SnapshotReporte, AlertaStock, SnapshotInventario, VentaArchivada
+)
+from .alertas import con_umbral, sugerencias_compra
+from .borrado import borrar_o_encolar, cantidad_afectada, impacto_borrado, resumen_borrado
+from .desempeno import obtener_tabla, rango_periodo, ultimas_ventas
+from .cambios import MODELOS_SINCRONIZADOS, cambios_desde
+from .eventos import central, formato_sse, SuscripcionCerrada
+from .forms import (
+    ProveedorForm, CategoriaForm, ProductoForm, VendedorForm, ClienteForm, VentaForm, cantidad_vendida, guardar,
+    mensajes_error
+)
+from .ingesta import registrar_ventas, MAX_VENTAS_LOTE
+from .inventario import AGRUPACIONES, comparar, detalle_csv, tomar_snapshot, totales_inventario, valuacion
+from .opciones import BUSQUEDAS, buscar, opciones
+from .precios import AGRUPACIONES_MARGEN, cambios_en_rango, margen_por_precio, precio_al
+from .recibos import (
+    datos_recibos, renderizar_recibo, renderizar_recibos, zip_recibos, ventas_del_rango, procesos_para
+)
+from .reportes import reporte_ventas, estadisticas_dashboard
+from .router import base_sucursal
+from .snapshots import obtener_reporte
+from .sucursales import (
+    StockInsuficiente, con_productos, existencias, mover_stock, por_consolidar, repartir_stock,
+    reporte_sucursal, unidades_por_sucursal
+)
+from .tareas import encolar, encolar_imagen
+
+# Pasado este límite ya no se sirven los del worker: se calculan en la petición
+LIMITE_CONTADORES = 600
+
+# Productos que muestra el modal de cada proveedor
+PRODUCTOS_VISTA_PREVIA = 6
+
+# Cambios de precio que se muestran al editar un producto
+HISTORIAL_PRECIOS = 10
 
 # ==================== FUNCIONES AUXILIARES ====================
-def generar_folio_venta():
-    """Genera un folio único para ventas"""
-    import uuid
-    return f"VENTA-{uuid.uuid4().hex[:8].upper()}"
+def mostrar_errores(request, form):
+    """Un mensaje de error por cada error del formulario"""
+    for mensaje in mensajes_error(form):
+        messages.error(request, mensaje)
+
+def contadores_dashboard():
+    """
+    Contadores del dashboard leídos de la última reconstrucción hecha por
+    el worker, que la programa cada VIGENCIA_CONTADORES segundos. La vista
+    no encola nada: se calculan en la petición cuando todavía no existe
+    ninguna o cuando la última pasa de LIMITE_CONTADORES (por ejemplo, si
+    no hay worker corriendo).
+    """
+    ultima = (
+        Tarea.objects.filter(nombre='reconstruir_contadores', estado='completada')
+        .order_by('-fecha_fin')
+        .first()
+    )
+    if ultima is None or ultima.fecha_fin < timezone.now() - timedelta(seconds=LIMITE_CONTADORES):
+        return estadisticas_dashboard()
+    return ultima.resultado
 
 # ==================== VISTAS GENERALES ====================
 def inicio_elektra(request):
     """Página principal del sistema con estadísticas"""
     try:
-        # Estadísticas para el dashboard
-        total_ventas = Venta.objects.count()
-        total_productos = Producto.objects.count()
-        productos_bajo_stock = Producto.objects.filter(stock__lt=10).count()
-        productos_sin_stock = Producto.objects.filter(stock=0).count()
+        # Estadísticas para el dashboard (reconstruidas en segundo plano)
+        contadores = contadores_dashboard()
         ventas_recientes = Venta.objects.select_related('producto', 'cliente').order_by('-fecha_venta')[:5]
         
-        # Calcular total de ventas del mes actual
-        mes_actual = timezone.now().month
-        ventas_mes = Venta.objects.filter(fecha_venta__month=mes_actual)
-        total_ventas_mes = ventas_mes.aggregate(Sum('total'))['total__sum'] or 0
-        
-        # Productos con stock bajo (para mostrar en alerta)
-        productos_bajo_stock_lista = Producto.objects.filter(stock__lt=10, stock__gt=0)[:8]
+        # Productos con stock bajo (leídos del conjunto de alertas)
+        productos_bajo_stock_lista = AlertaStock.objects.filter(nivel='bajo').select_related('producto')[:8]
         
         context = {
-            'proveedores_count': Proveedor.objects.count(),
-            'productos_count': total_productos,
-            'productos_bajo_stock': productos_bajo_stock,
-            'productos_sin_stock': productos_sin_stock,
-            'ventas_count': total_ventas,
+            **contadores,
             'ventas_recientes': ventas_recientes,
-            'clientes_count': Cliente.objects.count(),
-            'vendedores_count': Vendedor.objects.count(),
-            
-            # Totales monetarios
-            'total_ventas_mes': total_ventas_mes,
             
             # Listas para templates
             'productos_bajo_stock_lista': productos_bajo_stock_lista,
+            'eventos_en_vivo': settings.EVENTOS_EN_VIVO,
         }
         return render(request, 'inicio.html', context)
     except Exception as e:
@@ -84,49 +132,56 @@ def proveedores_ver(request):
         elif estado == 'inactivo':
             proveedores = proveedores.filter(activo=False)
     
-    # Ordenar por nombre
-    proveedores = proveedores.order_by('nombre')
+    # Ordenar por nombre; el conteo de productos viene en la misma consulta
+    proveedores = proveedores.annotate(num_productos=Count('productos')).order_by('nombre')
     
     # Paginación
     paginator = Paginator(proveedores, 10)
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
     
+    # Estadísticas de todos los proveedores, no solo de la búsqueda
+    conteos = Proveedor.objects.aggregate(
+        activos=Count('id', filter=Q(activo=True)),
+        inactivos=Count('id', filter=Q(activo=False))
+    )
+    
     return render(request, 'proveedores/ver.html', {
         'page_obj': page_obj,
         'query': query,
         'estado': estado,
-        'total': proveedores.count()
+        'total': paginator.count,
+        'paises': opciones('paises'),
+        'total_productos': Producto.objects.count(),
+        **conteos,
+    })
+
+def proveedores_productos(request, pk):
+    """
+    Vista previa de los productos de un proveedor para el modal de
+    proveedores_ver. Se pide al abrir el modal: los primeros productos y el
+    total salen de una sola consulta (COUNT como función de ventana).
+    """
+    productos = list(
+        Producto.objects.filter(proveedor_id=pk)
+        .only('id', 'nombre_producto', 'precio', 'stock', 'imagen')
+        .annotate(total=Window(Count('id')))[:PRODUCTOS_VISTA_PREVIA]
+    )
+    return render(request, 'proveedores/productos.html', {
+        'productos': productos,
+        'total': productos[0].total if productos else 0,
     })
 
 def proveedores_agregar(request):
     if request.method == 'POST':
-        try:
-            # Validar email único
-            email = request.POST['email']
-            if Proveedor.objects.filter(email=email).exists():
-                messages.error(request, 'Este email ya está registrado')
-                return redirect('proveedores_agregar')
-            
-            proveedor = Proveedor.objects.create(
-                nombre=request.POST['nombre'],
-                pais=request.POST['pais'],
-                direccion=request.POST['direccion'],
-                telefono=request.POST['telefono'],
-                email=email,
-                activo='activo' in request.POST
-            )
-            
-            # Manejar logo si se subió
+        form = ProveedorForm(request.POST, request.FILES)
+        if form.is_valid() and guardar(form):
             if 'logo' in request.FILES:
-                proveedor.logo = request.FILES['logo']
-                proveedor.save()
-            
+                encolar_imagen(form.instance, 'logo')
             messages.success(request, 'Proveedor agregado exitosamente')
             return redirect('proveedores_ver')
-        except Exception as e:
-            messages.error(request, f'Error al agregar proveedor: {str(e)}')
-            return redirect('proveedores_agregar')
+        mostrar_errores(request, form)
+        return redirect('proveedores_agregar')
     
     return render(request, 'proveedores/agregar.html')
 
@@ -134,52 +189,51 @@ def proveedores_actualizar(request, pk):
     proveedor = get_object_or_404(Proveedor, id=pk)
     
     if request.method == 'POST':
-        try:
-            email = request.POST['email']
-            # Validar que el email no esté siendo usado por otro proveedor
-            if Proveedor.objects.filter(email=email).exclude(id=pk).exists():
-                messages.error(request, 'Este email ya está registrado por otro proveedor')
-                return redirect('proveedores_actualizar', pk=pk)
-            
-            proveedor.nombre = request.POST['nombre']
-            proveedor.pais = request.POST['pais']
-            proveedor.direccion = request.POST['direccion']
-            proveedor.telefono = request.POST['telefono']
-            proveedor.email = email
-            proveedor.activo = 'activo' in request.POST
-            
-            # Manejar logo si se subió
+        form = ProveedorForm(request.POST, request.FILES, instance=proveedor)
+        if form.is_valid() and guardar(form):
             if 'logo' in request.FILES:
-                proveedor.logo = request.FILES['logo']
-            
-            proveedor.save()
-            
+                encolar_imagen(proveedor, 'logo')
             messages.success(request, 'Proveedor actualizado exitosamente')
             return redirect('proveedores_ver')
-        except Exception as e:
-            messages.error(request, f'Error al actualizar: {str(e)}')
+        mostrar_errores(request, form)
+        return redirect('proveedores_actualizar', pk=pk)
     
     return render(request, 'proveedores/actualizar.html', {'proveedor': proveedor})
 
 def proveedores_borrar(request, pk):
+    """
+    Por defecto el proveedor solo se desactiva y conserva sus productos y
+    ventas. El borrado definitivo arrastra todo lo que cuelga de él y se
+    hace por lotes (en el worker si es grande).
+    """
     proveedor = get_object_or_404(Proveedor, id=pk)
     
     if request.method == 'POST':
         try:
-            # Verificar si tiene productos asociados
-            productos_count = proveedor.productos.count()
-            if productos_count > 0:
-                messages.error(request, 
-                    f'No se puede eliminar el proveedor porque tiene {productos_count} producto(s) asociado(s)')
+            # Desactivar primero: deja de aparecer aunque el borrado quede en cola
+            if proveedor.activo:
+                proveedor.activo = False
+                proveedor.save(update_fields=['activo', 'fecha_actualizacion'])
+            
+            if request.POST.get('modo') != 'definitivo':
+                messages.success(request, 'Proveedor desactivado. Sus productos y ventas se conservan')
                 return redirect('proveedores_ver')
             
-            proveedor.delete()
-            messages.success(request, 'Proveedor eliminado exitosamente')
+            borrados, tarea = borrar_o_encolar(Proveedor.objects.filter(id=pk))
+            if tarea:
+                messages.info(request, f'El borrado es grande y se hará en segundo plano (tarea #{tarea.id})')
+            else:
+                messages.success(request, f'Proveedor eliminado exitosamente: {resumen_borrado(borrados)}')
             return redirect('proveedores_ver')
         except Exception as e:
             messages.error(request, f'Error al eliminar: {str(e)}')
     
-    return render(request, 'proveedores/borrar.html', {'proveedor': proveedor})
+    impacto = impacto_borrado(Proveedor.objects.filter(id=pk))
+    return render(request, 'proveedores/borrar.html', {
+        'proveedor': proveedor,
+        'impacto': impacto,
+        'productos_count': cantidad_afectada(impacto, Producto),
+    })
 
 # ==================== CATEGORÍAS ====================
 def categorias_ver(request):
@@ -206,26 +260,14 @@ def categorias_ver(request):
 
 def categorias_agregar(request):
     if request.method == 'POST':
-        try:
-            nombre = request.POST['nombre'].strip()
-            if not nombre:
-                messages.error(request, 'El nombre es requerido')
-                return redirect('categorias_agregar')
-            
-            categoria = Categoria.objects.create(
-                nombre=nombre,
-                color=request.POST.get('color', '#6c757d')
-            )
-            
-            # Manejar icono si se subió
+        form = CategoriaForm(request.POST, request.FILES)
+        if form.is_valid() and guardar(form):
             if 'icono' in request.FILES:
-                categoria.icono = request.FILES['icono']
-                categoria.save()
-            
+                encolar_imagen(form.instance, 'icono')
             messages.success(request, 'Categoría agregada exitosamente')
             return redirect('categorias_ver')
-        except Exception as e:
-            messages.error(request, f'Error: {str(e)}')
+        mostrar_errores(request, form)
+        return redirect('categorias_agregar')
     
     return render(request, 'categorias/agregar.html')
 
@@ -233,24 +275,14 @@ def categorias_actualizar(request, pk):
     categoria = get_object_or_404(Categoria, id=pk)
     
     if request.method == 'POST':
-        try:
-            nombre = request.POST['nombre'].strip()
-            if not nombre:
-                messages.error(request, 'El nombre es requerido')
-                return redirect('categorias_actualizar', pk=pk)
-            
-            categoria.nombre = nombre
-            categoria.color = request.POST.get('color', '#6c757d')
-            
-            # Manejar icono si se subió
+        form = CategoriaForm(request.POST, request.FILES, instance=categoria)
+        if form.is_valid() and guardar(form):
             if 'icono' in request.FILES:
-                categoria.icono = request.FILES['icono']
-            
-            categoria.save()
+                encolar_imagen(categoria, 'icono')
             messages.success(request, 'Categoría actualizada exitosamente')
             return redirect('categorias_ver')
-        except Exception as e:
-            messages.error(request, f'Error: {str(e)}')
+        mostrar_errores(request, form)
+        return redirect('categorias_actualizar', pk=pk)
     
     return render(request, 'categorias/actualizar.html', {'categoria': categoria})
 
@@ -266,13 +298,18 @@ def categorias_borrar(request, pk):
                     f'No se puede eliminar la categoría porque tiene {productos_count} producto(s) asociado(s)')
                 return redirect('categorias_ver')
             
-            categoria.delete()
+            borrar_o_encolar(Categoria.objects.filter(id=pk))
             messages.success(request, 'Categoría eliminada exitosamente')
             return redirect('categorias_ver')
         except Exception as e:
             messages.error(request, f'Error: {str(e)}')
     
-    return render(request, 'categorias/borrar.html', {'categoria': categoria})
+    impacto = impacto_borrado(Categoria.objects.filter(id=pk))
+    return render(request, 'categorias/borrar.html', {
+        'categoria': categoria,
+        'impacto': impacto,
+        'productos_count': cantidad_afectada(impacto, Producto),
+    })
 
 # ==================== PRODUCTOS ====================
 def productos_ver(request):
@@ -281,7 +318,7 @@ def productos_ver(request):
     categoria_id = request.GET.get('categoria', '')
     stock_filter = request.GET.get('stock', '')
     
-    productos = Producto.objects.select_related('categoria', 'proveedor').all()
+    productos = con_umbral(Producto.objects.select_related('categoria', 'proveedor').all())
     
     if query:
         productos = productos.filter(
@@ -295,20 +332,25 @@ def productos_ver(request):
     
     if stock_filter:
         if stock_filter == 'bajo':
-            productos = productos.filter(stock__lt=10)
+            productos = productos.filter(alerta__isnull=False)
         elif stock_filter == 'sin':
-            productos = productos.filter(stock=0)
+            productos = productos.filter(alerta__nivel='agotado')
         elif stock_filter == 'suficiente':
-            productos = productos.filter(stock__gte=10)
+            productos = productos.filter(alerta__isnull=True)
     
     # Ordenar
     productos = productos.order_by('nombre_producto')
     
-    # Estadísticas
-    total_productos = productos.count()
-    productos_suficiente = productos.filter(stock__gte=10).count()
-    productos_bajo = productos.filter(stock__lt=10, stock__gt=0).count()
-    productos_sin = productos.filter(stock=0).count()
+    # Estadísticas (una sola consulta contra el conjunto de alertas)
+    estadisticas = productos.aggregate(
+        total=Count('id'),
+        bajo=Count('id', filter=Q(alerta__nivel='bajo')),
+        sin=Count('id', filter=Q(alerta__nivel='agotado')),
+    )
+    total_productos = estadisticas['total']
+    productos_bajo = estadisticas['bajo']
+    productos_sin = estadisticas['sin']
+    productos_suficiente = total_productos - productos_bajo - productos_sin
     
     # Paginación
     paginator = Paginator(productos, 15)
@@ -327,57 +369,22 @@ def productos_ver(request):
         'productos_suficiente': productos_suficiente,
         'productos_bajo': productos_bajo,
         'productos_sin': productos_sin,
+        'eventos_en_vivo': settings.EVENTOS_EN_VIVO,
     })
 
 def productos_agregar(request):
     if request.method == 'POST':
-        try:
-            # Validar SKU único
-            sku = request.POST['sku']
-            if Producto.objects.filter(sku=sku).exists():
-                messages.error(request, 'Este SKU ya está registrado')
-                return redirect('productos_agregar')
-            
-            categoria = get_object_or_404(Categoria, id=request.POST['categoria'])
-            proveedor = get_object_or_404(Proveedor, id=request.POST['proveedor'])
-            
-            # Validar stock y precio
-            stock = int(request.POST['stock'])
-            precio = float(request.POST['precio'])
-            
-            if stock < 0:
-                messages.error(request, 'El stock no puede ser negativo')
-                return redirect('productos_agregar')
-            
-            if precio <= 0:
-                messages.error(request, 'El precio debe ser mayor a 0')
-                return redirect('productos_agregar')
-            
-            # Crear producto
-            producto = Producto.objects.create(
-                nombre_producto=request.POST['nombre_producto'],
-                categoria=categoria,
-                precio=precio,
-                stock=stock,
-                descripcion=request.POST['descripcion'],
-                proveedor=proveedor,
-                sku=sku
-            )
-            
-            # Manejar imagen si se subió
+        form = ProductoForm(request.POST, request.FILES)
+        if form.is_valid() and guardar(form):
             if 'imagen' in request.FILES:
-                producto.imagen = request.FILES['imagen']
-                producto.save()
-            
+                encolar_imagen(form.instance, 'imagen')
             messages.success(request, 'Producto agregado exitosamente')
             return redirect('productos_ver')
-        except ValueError:
-            messages.error(request, 'Datos numéricos inválidos')
-        except Exception as e:
-            messages.error(request, f'Error: {str(e)}')
+        mostrar_errores(request, form)
+        return redirect('productos_agregar')
     
-    categorias = Categoria.objects.all()
-    proveedores = Proveedor.objects.filter(activo=True)
+    categorias = opciones('categorias')
+    proveedores = opciones('proveedores')
     return render(request, 'productos/agregar.html', {
         'categorias': categorias,
         'proveedores': proveedores
@@ -387,76 +394,59 @@ def productos_actualizar(request, pk):
     producto = get_object_or_404(Producto, id=pk)
     
     if request.method == 'POST':
-        try:
-            sku = request.POST['sku']
-            # Validar que el SKU no esté siendo usado por otro producto
-            if Producto.objects.filter(sku=sku).exclude(id=pk).exists():
-                messages.error(request, 'Este SKU ya está registrado por otro producto')
-                return redirect('productos_actualizar', pk=pk)
-            
-            categoria = get_object_or_404(Categoria, id=request.POST['categoria'])
-            proveedor = get_object_or_404(Proveedor, id=request.POST['proveedor'])
-            
-            # Validar stock y precio
-            stock = int(request.POST['stock'])
-            precio = float(request.POST['precio'])
-            
-            if stock < 0:
-                messages.error(request, 'El stock no puede ser negativo')
-                return redirect('productos_actualizar', pk=pk)
-            
-            if precio <= 0:
-                messages.error(request, 'El precio debe ser mayor a 0')
-                return redirect('productos_actualizar', pk=pk)
-            
-            producto.nombre_producto = request.POST['nombre_producto']
-            producto.categoria = categoria
-            producto.precio = precio
-            producto.stock = stock
-            producto.descripcion = request.POST['descripcion']
-            producto.proveedor = proveedor
-            producto.sku = sku
-            
-            # Manejar imagen si se subió una nueva
+        form = ProductoForm(request.POST, request.FILES, instance=producto)
+        if form.is_valid() and guardar(form):
             if 'imagen' in request.FILES:
-                producto.imagen = request.FILES['imagen']
-            
-            producto.save()
-            
+                encolar_imagen(producto, 'imagen')
             messages.success(request, 'Producto actualizado exitosamente')
             return redirect('productos_ver')
-        except ValueError:
-            messages.error(request, 'Datos numéricos inválidos')
-        except Exception as e:
-            messages.error(request, f'Error: {str(e)}')
+        mostrar_errores(request, form)
+        return redirect('productos_actualizar', pk=pk)
     
-    categorias = Categoria.objects.all()
-    proveedores = Proveedor.objects.filter(activo=True)
+    categorias = opciones('categorias')
+    proveedores = opciones('proveedores')
     return render(request, 'productos/actualizar.html', {
         'producto': producto,
         'categorias': categorias,
-        'proveedores': proveedores
+        'proveedores': proveedores,
+        'historial_precios': producto.historial_precios.all()[:HISTORIAL_PRECIOS]
     })
 
 def productos_borrar(request, pk):
     producto = get_object_or_404(Producto, id=pk)
     
+    # Las ventas archivadas también cuelgan del producto con CASCADE
+    impacto = impacto_borrado(Producto.objects.filter(id=pk))
+    ventas_count = cantidad_afectada(impacto, Venta) + cantidad_afectada(impacto, VentaArchivada)
+    
     if request.method == 'POST':
         try:
             # Verificar si tiene ventas asociadas
-            ventas_count = Venta.objects.filter(producto=producto).count()
             if ventas_count > 0:
                 messages.error(request, 
                     f'No se puede eliminar el producto porque tiene {ventas_count} venta(s) asociada(s)')
                 return redirect('productos_ver')
             
-            producto.delete()
+            borrar_o_encolar(Producto.objects.filter(id=pk), impacto)
             messages.success(request, 'Producto eliminado exitosamente')
             return redirect('productos_ver')
         except Exception as e:
             messages.error(request, f'Error: {str(e)}')
     
-    return render(request, 'productos/borrar.html', {'producto': producto})
+    return render(request, 'productos/borrar.html', {
+        'producto': producto,
+        'impacto': impacto,
+        'ventas_count': ventas_count,
+    })
+
+def productos_alertas(request):
+    """Panel de reorden: alertas vigentes agrupadas por proveedor"""
+    sugerencias = sugerencias_compra()
+    return render(request, 'productos/alertas.html', {
+        'sugerencias': sugerencias,
+        'total_alertas': sum(len(grupo['alertas']) for grupo in sugerencias),
+        'total_agotados': sum(grupo['agotados'] for grupo in sugerencias),
+    })
 
 # ==================== VENDEDORES ====================
 def vendedores_ver(request):
@@ -479,38 +469,59 @@ def vendedores_ver(request):
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
     
+    # Ventas de los vendedores de la página: un conteo agrupado y una
+    # consulta con las últimas 10 de cada uno (en lugar de dos por fila)
+    ids = [vendedor.id for vendedor in page_obj]
+    conteos = dict(
+        Venta.objects.filter(vendedor_id__in=ids).order_by()
+        .values('vendedor_id').annotate(cantidad=Count('id'))
+        .values_list('vendedor_id', 'cantidad')
+    )
+    recientes = ultimas_ventas(ids)
+    for vendedor in page_obj:
+        vendedor.ventas_count = conteos.get(vendedor.id, 0)
+        vendedor.ultimas_ventas = recientes.get(vendedor.id, [])
+    
+    estados = vendedores.aggregate(
+        activos=Count('id', filter=Q(activo=True)),
+        inactivos=Count('id', filter=Q(activo=False)),
+    )
+    
     return render(request, 'vendedores/ver.html', {
         'page_obj': page_obj,
         'query': query,
-        'total': vendedores.count()
+        'total': paginator.count,
+        'activos': estados['activos'],
+        'inactivos': estados['inactivos'],
+    })
+
+def vendedores_desempeno(request):
+    """Tabla de posiciones y comisiones de vendedores por periodo"""
+    periodo = request.GET.get('periodo', 'mes_actual')
+    if periodo not in ('mes_actual', 'mes_anterior', 'anio_actual'):
+        periodo = 'mes_actual'
+    
+    fecha_inicio, fecha_fin = rango_periodo(periodo)
+    tabla, filas = obtener_tabla(fecha_inicio, fecha_fin)
+    
+    return render(request, 'vendedores/desempeno.html', {
+        'periodo': periodo,
+        'periodos': [opcion for opcion in ReporteGuardado.PERIODOS if opcion[0] != 'personalizado'],
+        'tabla': tabla,
+        'filas': filas,
+        'total_comisiones': sum(fila.comision for fila in filas),
     })
 
 def vendedores_agregar(request):
     if request.method == 'POST':
-        try:
-            email = request.POST['email']
-            # Validar email único
-            if Vendedor.objects.filter(email=email).exists():
-                messages.error(request, 'Este email ya está registrado')
-                return redirect('vendedores_agregar')
-            
-            vendedor = Vendedor.objects.create(
-                nombre=request.POST['nombre'],
-                telefono=request.POST['telefono'],
-                email=email,
-                fecha_contratacion=request.POST.get('fecha_contratacion', timezone.now().date()),
-                activo='activo' in request.POST
-            )
-            
-            # Manejar foto si se subió
+        form = VendedorForm(request.POST, request.FILES)
+        if form.is_valid() and guardar(form):
             if 'foto' in request.FILES:
-                vendedor.foto = request.FILES['foto']
-                vendedor.save()
-            
+                encolar_imagen(form.instance, 'foto')
             messages.success(request, 'Vendedor agregado exitosamente')
             return redirect('vendedores_ver')
-        except Exception as e:
-            messages.error(request, f'Error: {str(e)}')
+        mostrar_errores(request, form)
+        return redirect('vendedores_agregar')
     
     return render(request, 'vendedores/agregar.html')
 
@@ -518,29 +529,14 @@ def vendedores_actualizar(request, pk):
     vendedor = get_object_or_404(Vendedor, id=pk)
     
     if request.method == 'POST':
-        try:
-            email = request.POST['email']
-            # Validar que el email no esté siendo usado por otro vendedor
-            if Vendedor.objects.filter(email=email).exclude(id=pk).exists():
-                messages.error(request, 'Este email ya está registrado por otro vendedor')
-                return redirect('vendedores_actualizar', pk=pk)
-            
-            vendedor.nombre = request.POST['nombre']
-            vendedor.telefono = request.POST['telefono']
-            vendedor.email = email
-            vendedor.fecha_contratacion = request.POST.get('fecha_contratacion', vendedor.fecha_contratacion)
-            vendedor.activo = 'activo' in request.POST
-            
-            # Manejar foto si se subió
+        form = VendedorForm(request.POST, request.FILES, instance=vendedor)
+        if form.is_valid() and guardar(form):
             if 'foto' in request.FILES:
-                vendedor.foto = request.FILES['foto']
-            
-            vendedor.save()
-            
+                encolar_imagen(vendedor, 'foto')
             messages.success(request, 'Vendedor actualizado exitosamente')
             return redirect('vendedores_ver')
-        except Exception as e:
-            messages.error(request, f'Error: {str(e)}')
+        mostrar_errores(request, form)
+        return redirect('vendedores_actualizar', pk=pk)
     
     return render(request, 'vendedores/actualizar.html', {'vendedor': vendedor})
 
@@ -569,7 +565,7 @@ def clientes_ver(request):
     """Lista de clientes con búsqueda"""
     query = request.GET.get('q', '')
     
-    clientes = Cliente.objects.all()
+    clientes = Cliente.objects.select_related('segmento')
     
     if query:
         clientes = clientes.filter(
@@ -593,30 +589,14 @@ def clientes_ver(request):
 
 def clientes_agregar(request):
     if request.method == 'POST':
-        try:
-            email = request.POST['email']
-            # Validar email único
-            if Cliente.objects.filter(email=email).exists():
-                messages.error(request, 'Este email ya está registrado')
-                return redirect('clientes_agregar')
-            
-            cliente = Cliente.objects.create(
-                nombre=request.POST['nombre'],
-                telefono=request.POST['telefono'],
-                email=email,
-                direccion=request.POST['direccion'],
-                tipo_cliente=request.POST.get('tipo_cliente', 'regular')
-            )
-            
-            # Manejar foto si se subió
+        form = ClienteForm(request.POST, request.FILES)
+        if form.is_valid() and guardar(form):
             if 'foto' in request.FILES:
-                cliente.foto = request.FILES['foto']
-                cliente.save()
-            
+                encolar_imagen(form.instance, 'foto')
             messages.success(request, 'Cliente agregado exitosamente')
             return redirect('clientes_ver')
-        except Exception as e:
-            messages.error(request, f'Error: {str(e)}')
+        mostrar_errores(request, form)
+        return redirect('clientes_agregar')
     
     return render(request, 'clientes/agregar.html')
 
@@ -624,29 +604,14 @@ def clientes_actualizar(request, pk):
     cliente = get_object_or_404(Cliente, id=pk)
     
     if request.method == 'POST':
-        try:
-            email = request.POST['email']
-            # Validar que el email no esté siendo usado por otro cliente
-            if Cliente.objects.filter(email=email).exclude(id=pk).exists():
-                messages.error(request, 'Este email ya está registrado por otro cliente')
-                return redirect('clientes_actualizar', pk=pk)
-            
-            cliente.nombre = request.POST['nombre']
-            cliente.telefono = request.POST['telefono']
-            cliente.email = email
-            cliente.direccion = request.POST['direccion']
-            cliente.tipo_cliente = request.POST.get('tipo_cliente', 'regular')
-            
-            # Manejar foto si se subió
+        form = ClienteForm(request.POST, request.FILES, instance=cliente)
+        if form.is_valid() and guardar(form):
             if 'foto' in request.FILES:
-                cliente.foto = request.FILES['foto']
-            
-            cliente.save()
-            
+                encolar_imagen(cliente, 'foto')
             messages.success(request, 'Cliente actualizado exitosamente')
             return redirect('clientes_ver')
-        except Exception as e:
-            messages.error(request, f'Error: {str(e)}')
+        mostrar_errores(request, form)
+        return redirect('clientes_actualizar', pk=pk)
     
     return render(request, 'clientes/actualizar.html', {'cliente': cliente})
 
@@ -677,8 +642,9 @@ def ventas_ver(request):
     estado = request.GET.get('estado', '')
     fecha_inicio = request.GET.get('fecha_inicio', '')
     fecha_fin = request.GET.get('fecha_fin', '')
+    sucursal = request.GET.get('sucursal', '')
     
-    ventas = Venta.objects.select_related('vendedor', 'producto', 'cliente').all()
+    ventas = Venta.objects.select_related('vendedor', 'producto', 'cliente', 'sucursal').all()
     
     if query:
         ventas = ventas.filter(
@@ -691,6 +657,9 @@ def ventas_ver(request):
     if estado:
         ventas = ventas.filter(estado=estado)
     
+    if sucursal.isdigit():
+        ventas = ventas.filter(sucursal_id=sucursal)
+    
     if fecha_inicio:
         ventas = ventas.filter(fecha_venta__date__gte=fecha_inicio)
     
@@ -714,6 +683,8 @@ def ventas_ver(request):
         'estado': estado,
         'fecha_inicio': fecha_inicio,
         'fecha_fin': fecha_fin,
+        'sucursal': sucursal,
+        'sucursales': opciones('sucursales'),
         'total_ventas': total_ventas,
         'total_count': ventas.count()
     })
@@ -721,110 +692,63 @@ def ventas_ver(request):
 def ventas_agregar(request):
     if request.method == 'POST':
         try:
-            folio = generar_folio_venta()
-            vendedor = get_object_or_404(Vendedor, id=request.POST['vendedor'])
-            producto = get_object_or_404(Producto, id=request.POST['producto'])
-            cliente = get_object_or_404(Cliente, id=request.POST['cliente'])
-            
-            # Validar cantidad
-            cantidad = int(request.POST.get('cantidad', 1))
-            if cantidad <= 0:
-                messages.error(request, 'La cantidad debe ser mayor a 0')
-                return redirect('ventas_agregar')
+            # La clave viene del formulario: reenviarlo no duplica la venta
+            resultado = registrar_ventas([{
+                'clave': request.POST.get('clave_idempotencia') or uuid.uuid4().hex,
+                'vendedor': request.POST.get('vendedor'),
+                'producto': request.POST.get('producto'),
+                'cliente': request.POST.get('cliente'),
+                'sucursal': request.POST.get('sucursal'),
+                'cantidad': request.POST.get('cantidad', 1),
+                'metodo_pago': request.POST.get('metodo_pago'),
+                'notas': request.POST.get('notas', ''),
+            }])[0]
             
-            # Validar stock disponible
-            if producto.stock < cantidad:
-                messages.error(request, f'Stock insuficiente. Disponible: {producto.stock}')
+            if resultado['estado'] == 'rechazada':
+                messages.error(request, resultado['error'])
                 return redirect('ventas_agregar')
             
-            # Calcular total
-            total = float(producto.precio) * cantidad
-            
-            # Crear venta
-            venta = Venta.objects.create(
-                folio=folio,
-                total=total,
-                metodo_pago=request.POST['metodo_pago'],
-                estado='completada',
-                vendedor=vendedor,
-                producto=producto,
-                cliente=cliente,
-                notas=request.POST.get('notas', '')
-            )
-            
-            # Actualizar stock del producto
-            producto.stock -= cantidad
-            producto.save()
-            
-            messages.success(request, f'Venta registrada exitosamente. Folio: {folio}')
+            if resultado['estado'] == 'duplicada':
+                messages.info(request, f"Esta venta ya estaba registrada. Folio: {resultado['folio']}")
+            elif resultado['id'] is None:
+                # Capturada en la base de la sucursal: el recibo existe al consolidarse
+                messages.success(request, f"Venta registrada en la sucursal. Folio: {resultado['folio']}")
+            else:
+                messages.success(request, format_html(
+                    'Venta registrada exitosamente. Folio: {} <a href="{}" target="_blank" class="alert-link ms-2">Imprimir recibo</a>',
+                    resultado['folio'], reverse('ventas_recibo', args=[resultado['id']])
+                ))
             return redirect('ventas_ver')
-        except ValueError:
-            messages.error(request, 'Datos numéricos inválidos')
         except Exception as e:
             messages.error(request, f'Error: {str(e)}')
     
-    vendedores = Vendedor.objects.all()
-    productos = Producto.objects.filter(stock__gt=0)
-    clientes = Cliente.objects.all()
-    
+    # Clientes y productos se buscan con el autocompletado. El folio se
+    # asigna al registrar la venta: mostrar el formulario no escribe nada
     return render(request, 'ventas/agregar.html', {
-        'vendedores': vendedores,
-        'productos': productos,
-        'clientes': clientes,
-        'folio': generar_folio_venta()
+        'vendedores': opciones('vendedores'),
+        'sucursales': opciones('sucursales'),
+        'clave_idempotencia': uuid.uuid4().hex
     })
 
 def ventas_actualizar(request, pk):
-    venta = get_object_or_404(Venta, id=pk)
+    venta = get_object_or_404(Venta.objects.select_related('producto', 'cliente'), id=pk)
     
     if request.method == 'POST':
-        try:
-            # Restaurar stock anterior si cambia el producto
-            producto_anterior = venta.producto
-            cantidad_anterior = venta.total / venta.producto.precio if venta.producto.precio > 0 else 0
-            
-            producto_nuevo = get_object_or_404(Producto, id=request.POST['producto'])
-            cantidad_nueva = int(request.POST.get('cantidad', 1))
-            
-            # Si cambió el producto, restaurar stock del anterior
-            if producto_anterior.id != producto_nuevo.id:
-                producto_anterior.stock += int(cantidad_anterior)
-                producto_anterior.save()
-            
-            # Validar stock del nuevo producto
-            if producto_nuevo.stock < cantidad_nueva:
-                messages.error(request, f'Stock insuficiente. Disponible: {producto_nuevo.stock}')
-                return redirect('ventas_actualizar', pk=pk)
-            
-            # Actualizar venta
-            venta.folio = request.POST['folio']
-            venta.total = float(producto_nuevo.precio) * cantidad_nueva
-            venta.metodo_pago = request.POST['metodo_pago']
-            venta.estado = request.POST['estado']
-            venta.vendedor = get_object_or_404(Vendedor, id=request.POST['vendedor'])
-            venta.producto = producto_nuevo
-            venta.cliente = get_object_or_404(Cliente, id=request.POST['cliente'])
-            venta.notas = request.POST.get('notas', '')
-            venta.save()
-            
-            # Actualizar stock del nuevo producto
-            producto_nuevo.stock -= cantidad_nueva
-            producto_nuevo.save()
-            
+        form = VentaForm(request.POST, instance=venta)
+        # El formulario bloquea los productos al validar: validar y guardar
+        # en la misma transacción para que el stock no cambie entre ambos
+        with transaction.atomic():
+            guardada = form.is_valid() and guardar(form)
+        if guardada:
             messages.success(request, 'Venta actualizada exitosamente')
             return redirect('ventas_ver')
-        except Exception as e:
-            messages.error(request, f'Error: {str(e)}')
-    
-    vendedores = Vendedor.objects.all()
-    productos = Producto.objects.all()
-    clientes = Cliente.objects.all()
+        mostrar_errores(request, form)
+        return redirect('ventas_actualizar', pk=pk)
     
+    # El cliente y el producto actuales ya vienen en la venta; los demás se buscan
     return render(request, 'ventas/actualizar.html', {
         'venta': venta,
-        'vendedores': vendedores,
-        'productos': productos,
-        'clientes': clientes
+        'vendedores': opciones('vendedores')
     })
 
 def ventas_borrar(request, pk):
@@ -832,13 +756,18 @@ def ventas_borrar(request, pk):
     
     if request.method == 'POST':
         try:
-            # Restaurar stock del producto
-            producto = venta.producto
-            cantidad = venta.total / producto.precio if producto.precio > 0 else 0
-            producto.stock += int(cantidad)
-            producto.save()
-            
-            venta.delete()
+            # El stock de la sucursal puede vivir en otra base: las dos transacciones juntas
+            with transaction.atomic(), transaction.atomic(using=base_sucursal(venta.sucursal_id)):
+                # Restaurar stock del producto
+                producto = venta.producto
+                # El total se cobró con el precio vigente en la fecha de la venta
+                cantidad = cantidad_vendida(venta.total, precio_al(producto.pk, venta.fecha_venta, producto.precio))
+                producto.stock += cantidad
+                producto.save()
+                if venta.sucursal_id:
+                    mover_stock(venta.sucursal_id, producto.pk, cantidad)
+
+                venta.delete()
             messages.success(request, 'Venta eliminada exitosamente')
             return redirect('ventas_ver')
         except Exception as e:
@@ -846,31 +775,372 @@ def ventas_borrar(request, pk):
     
     return render(request, 'ventas/borrar.html', {'venta': venta})
 
+def ventas_recibo(request, pk):
+    """Recibo imprimible de una venta"""
+    fila = get_object_or_404(datos_recibos(Venta.objects.filter(id=pk)))
+    return HttpResponse(renderizar_recibo(fila))
+
+def ventas_recibos(request):
+    """
+    Recibos de un rango de fechas (hoy si no se indica) en un zip que se
+    genera mientras se descarga
+    """
+    try:
+        fecha_fin = date.fromisoformat(request.GET.get('fecha_fin') or timezone.localdate().isoformat())
+        fecha_inicio = date.fromisoformat(request.GET.get('fecha_inicio') or fecha_fin.isoformat())
+    except ValueError:
+        messages.error(request, 'Fechas inválidas')
+        return redirect('ventas_ver')
+    
+    ventas = ventas_del_rango(fecha_inicio, fecha_fin, request.GET.get('estado', ''))
+    total = ventas.count()
+    if not total:
+        messages.info(request, 'No hay ventas en ese rango para imprimir')
+        return redirect('ventas_ver')
+    
+    recibos = renderizar_recibos(ventas, procesos_para(total))
+    response = StreamingHttpResponse(zip_recibos(recibos), content_type='application/zip')
+    response['Content-Disposition'] = f'attachment; filename="recibos_{fecha_inicio}_{fecha_fin}.zip"'
+    return response
+
+# ==================== SUCURSALES ====================
+def sucursales_ver(request):
+    """Sucursales con sus ventas del mes y el stock que tiene cada una"""
+    sucursales = list(Sucursal.objects.order_by('nombre'))
+    inicio_mes = timezone.make_aware(datetime.combine(timezone.localdate().replace(day=1), time.min))
+    
+    # Una consulta agrupada por el rango de fechas, no un conteo por sucursal
+    ventas_mes = {
+        fila['sucursal_id']: fila
+        for fila in Venta.objects.filter(sucursal__isnull=False, fecha_venta__gte=inicio_mes)
+        .values('sucursal_id').annotate(ventas=Count('id'), monto=Sum('total')).order_by()
+    }
+    unidades = unidades_por_sucursal(sucursales)
+    pendientes = por_consolidar(sucursales)
+    for sucursal in sucursales:
+        sucursal.ventas_mes = ventas_mes.get(sucursal.pk, {}).get('ventas', 0)
+        sucursal.monto_mes = ventas_mes.get(sucursal.pk, {}).get('monto') or 0
+        sucursal.productos = unidades.get(sucursal.pk, {}).get('productos', 0)
+        sucursal.unidades = unidades.get(sucursal.pk, {}).get('unidades') or 0
+        sucursal.por_consolidar = pendientes.get(sucursal.pk, 0)
+    
+    return render(request, 'sucursales/ver.html', {
+        'sucursales': sucursales,
+        'total_monto_mes': sum(sucursal.monto_mes for sucursal in sucursales),
+    })
+
+def sucursales_detalle(request, pk):
+    """Stock de la sucursal y su reporte de ventas (últimos 30 días por defecto)"""
+    sucursal = get_object_or_404(Sucursal, id=pk)
+    query = request.GET.get('q', '').strip()
+    try:
+        fecha_fin = date.fromisoformat(request.GET.get('fecha_fin') or timezone.localdate().isoformat())
+        fecha_inicio = date.fromisoformat(
+            request.GET.get('fecha_inicio') or (fecha_fin - timedelta(days=29)).isoformat()
+        )
+    except ValueError:
+        messages.error(request, 'Fechas inválidas')
+        return redirect('sucursales_detalle', pk=pk)
+    
+    desde = timezone.make_aware(datetime.combine(fecha_inicio, time.min))
+    hasta = timezone.make_aware(datetime.combine(fecha_fin + timedelta(days=1), time.min))
+    
+    # Paginación del stock; los productos de la página con un in_bulk
+    paginator = Paginator(existencias(sucursal, query), 15)
+    page_obj = paginator.get_page(request.GET.get('page'))
+    page_obj.object_list = con_productos(page_obj.object_list)
+    
+    return render(request, 'sucursales/detalle.html', {
+        'sucursal': sucursal,
+        'page_obj': page_obj,
+        'query': query,
+        'fecha_inicio': fecha_inicio.isoformat(),
+        'fecha_fin': fecha_fin.isoformat(),
+        'reporte': reporte_sucursal(sucursal, desde, hasta),
+        'unidades': unidades_por_sucursal([sucursal]).get(sucursal.pk, {}),
+        'por_consolidar': por_consolidar([sucursal]).get(sucursal.pk, 0),
+        'ventas_recientes': sucursal.ventas.select_related('producto', 'cliente').order_by('-fecha_venta')[:10],
+    })
+
+@require_POST
+def sucursales_repartir(request, pk):
+    """Envía unidades del almacén central a la sucursal o las devuelve"""
+    sucursal = get_object_or_404(Sucursal, id=pk)
+    try:
+        producto_id = int(request.POST.get('producto', ''))
+        cantidad = int(request.POST.get('cantidad', ''))
+    except ValueError:
+        messages.error(request, 'Selecciona un producto y una cantidad entera')
+        return redirect('sucursales_detalle', pk=pk)
+    if cantidad <= 0:
+        messages.error(request, 'La cantidad debe ser mayor a 0')
+        return redirect('sucursales_detalle', pk=pk)
+    
+    devolver = request.POST.get('movimiento') == 'devolver'
+    try:
+        producto = repartir_stock(sucursal, producto_id, -cantidad if devolver else cantidad)
+    except StockInsuficiente as e:
+        messages.error(request, str(e))
+    else:
+        accion = 'devueltas al almacén desde' if devolver else 'enviadas a'
+        messages.success(request, f'{cantidad} unidad(es) de {producto} {accion} {sucursal}')
+    return redirect('sucursales_detalle', pk=pk)
+
 # ==================== REPORTES ====================
 def reportes_ventas(request):
     """Reporte de ventas por fecha"""
     fecha_inicio = request.GET.get('fecha_inicio', '')
     fecha_fin = request.GET.get('fecha_fin', '')
-    
-    ventas = Venta.objects.select_related('producto', 'cliente', 'vendedor').all()
-    
-    if fecha_inicio:
-        ventas = ventas.filter(fecha_venta__date__gte=fecha_inicio)
-    
-    if fecha_fin:
-        ventas = ventas.filter(fecha_venta__date__lte=fecha_fin)
-    
-    ventas = ventas.order_by('-fecha_venta')
-    
-    # Calcular estadísticas
-    total_ventas = sum(v.total for v in ventas)
-    promedio_venta = total_ventas / len(ventas) if ventas else 0
+    reporte_id = request.GET.get('reporte', '')
+    
+    # Los reportes guardados definen su propio rango de fechas
+    reporte = None
+    if reporte_id.isdigit():
+        reporte = get_object_or_404(ReporteGuardado, id=reporte_id, activo=True)
+        inicio, fin = reporte.rango()
+        fecha_inicio = inicio.isoformat() if inicio else ''
+        fecha_fin = fin.isoformat() if fin else ''
+    
+    # Servir desde el snapshot precalculado cuando sigue vigente
+    datos, snapshot = obtener_reporte(fecha_inicio, fecha_fin)
+    if datos is not None:
+        contexto = {'ventas': datos['filas'], **datos['resumen']}
+    else:
+        snapshot = None
+        if reporte:
+            encolar('generar_snapshot_reporte', unica=True, fecha_inicio=fecha_inicio, fecha_fin=fecha_fin)
+        # Vigentes y, si el rango llega hasta ellas, archivadas
+        ventas, resumen = reporte_ventas(fecha_inicio, fecha_fin)
+        contexto = {'ventas': ventas, **resumen}
+    
+    # Exportaciones generadas en segundo plano
+    exportaciones = Tarea.objects.filter(nombre='renderizar_reporte_ventas').order_by('-id')[:5]
     
     return render(request, 'reportes/ventas.html', {
-        'ventas': ventas,
+        **contexto,
         'fecha_inicio': fecha_inicio,
         'fecha_fin': fecha_fin,
-        'total_ventas': total_ventas,
-        'total_count': ventas.count(),
-        'promedio_venta': promedio_venta
-    })
\ No newline at end of file
+        'exportaciones': exportaciones,
+        'reporte': reporte,
+        'reportes_guardados': ReporteGuardado.objects.filter(activo=True),
+        'snapshot': snapshot,
+    })
+
+def reportes_snapshot_descargar(request, pk):
+    """Descarga el archivo comprimido de un snapshot"""
+    snapshot = get_object_or_404(SnapshotReporte, id=pk)
+    ruta = os.path.join(settings.SNAPSHOTS_ROOT, snapshot.archivo)
+    if not os.path.exists(ruta):
+        raise Http404('El snapshot ya no está disponible')
+    
+    nombre = f"reporte_ventas_{snapshot.fecha_inicio or 'inicio'}_{snapshot.fecha_fin or 'hoy'}.json.gz"
+    return FileResponse(open(ruta, 'rb'), as_attachment=True, filename=nombre,
+                        content_type='application/gzip')
+
+def reportes_ventas_exportar(request):
+    """Encola la generación del reporte como archivo HTML"""
+    fecha_inicio = request.POST.get('fecha_inicio', '')
+    fecha_fin = request.POST.get('fecha_fin', '')
+    
+    if request.method == 'POST':
+        tarea = encolar('renderizar_reporte_ventas', fecha_inicio=fecha_inicio, fecha_fin=fecha_fin)
+        messages.success(request, f'Reporte #{tarea.id} en preparación. Aparecerá en Exportaciones al terminar.')
+    
+    url = reverse('reportes_ventas')
+    if fecha_inicio or fecha_fin:
+        url += f'?fecha_inicio={fecha_inicio}&fecha_fin={fecha_fin}'
+    return redirect(url)
+
+def productos_filtrados(request):
+    """Productos de la categoría y el proveedor indicados en la URL"""
+    productos = Producto.objects.all()
+    if request.GET.get('categoria', '').isdigit():
+        productos = productos.filter(categoria_id=request.GET['categoria'])
+    if request.GET.get('proveedor', '').isdigit():
+        productos = productos.filter(proveedor_id=request.GET['proveedor'])
+    return productos
+
+def reportes_inventario(request):
+    """
+    Valor del inventario por categoría, proveedor o ambos, calculado en
+    SQL. Con ?snapshot=<id> se compara contra ese snapshot.
+    """
+    agrupacion = request.GET.get('agrupacion', 'categoria')
+    if agrupacion not in AGRUPACIONES:
+        agrupacion = 'categoria'
+    
+    snapshot = None
+    if request.GET.get('snapshot', '').isdigit():
+        snapshot = get_object_or_404(SnapshotInventario, id=request.GET['snapshot'])
+        grupos = comparar(snapshot, agrupacion)
+    else:
+        grupos = valuacion(agrupacion)
+    
+    totales = totales_inventario()
+    return render(request, 'reportes/inventario.html', {
+        'grupos': grupos,
+        'totales': totales,
+        'agrupacion': agrupacion,
+        'snapshot': snapshot,
+        'diferencia_total': totales['valor'] - snapshot.valor if snapshot else None,
+        'snapshots': SnapshotInventario.objects.all()[:20],
+    })
+
+@require_POST
+def reportes_inventario_snapshot(request):
+    """Guarda el valor actual del inventario para compararlo más adelante"""
+    snapshot = tomar_snapshot(request.POST.get('descripcion', '').strip()[:200])
+    messages.success(request, f'Snapshot del inventario guardado: ${snapshot.valor}')
+    return redirect(f"{reverse('reportes_inventario')}?snapshot={snapshot.id}")
+
+def reportes_inventario_detalle(request):
+    """Detalle por SKU en CSV, generado mientras se descarga"""
+    response = StreamingHttpResponse(detalle_csv(productos_filtrados(request)), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="inventario_{timezone.localdate()}.csv"'
+    return response
+
+def reportes_precios(request):
+    """
+    Ventas del rango (últimos 90 días por defecto) con las unidades
+    reconciliadas contra el precio vigente en cada fecha y comparadas con
+    el precio actual, por categoría, proveedor o producto.
+    """
+    agrupacion = request.GET.get('agrupacion', 'categoria')
+    if agrupacion not in AGRUPACIONES_MARGEN:
+        agrupacion = 'categoria'
+    try:
+        fecha_fin = date.fromisoformat(request.GET.get('fecha_fin') or timezone.localdate().isoformat())
+        fecha_inicio = date.fromisoformat(
+            request.GET.get('fecha_inicio') or (fecha_fin - timedelta(days=89)).isoformat()
+        )
+    except ValueError:
+        messages.error(request, 'Fechas inválidas')
+        return redirect('reportes_precios')
+    
+    desde = timezone.make_aware(datetime.combine(fecha_inicio, time.min))
+    hasta = timezone.make_aware(datetime.combine(fecha_fin + timedelta(days=1), time.min))
+    grupos = margen_por_precio(desde, hasta, agrupacion)
+    
+    return render(request, 'reportes/precios.html', {
+        'grupos': grupos,
+        'agrupacion': agrupacion,
+        'fecha_inicio': fecha_inicio.isoformat(),
+        'fecha_fin': fecha_fin.isoformat(),
+        'totales': {
+            'ventas': sum(grupo['ventas'] for grupo in grupos),
+            'unidades': sum(grupo['unidades'] for grupo in grupos),
+            'monto': sum(grupo['monto'] for grupo in grupos),
+            'monto_actual': sum(grupo['monto_actual'] for grupo in grupos),
+            'diferencia': sum(grupo['diferencia'] for grupo in grupos),
+        },
+        'cambios': cambios_en_rango(desde, hasta),
+    })
+
+# ==================== TAREAS ====================
+def tareas_estado(request, pk):
+    """Estado y resultado de una tarea en segundo plano"""
+    tarea = get_object_or_404(Tarea, id=pk)
+    return JsonResponse({
+        'id': tarea.id,
+        'nombre': tarea.nombre,
+        'estado': tarea.estado,
+        'intentos': tarea.intentos,
+        'resultado': tarea.resultado,
+        'error': tarea.error.strip().splitlines()[-1] if tarea.error else '',
+    })
+
+# ==================== SINCRONIZACIÓN ====================
+def sincronizacion_cambios(request):
+    """Cambios posteriores a un cursor (since) para clientes POS"""
+    try:
+        cursor = int(request.GET.get('since', 0))
+        limite = min(int(request.GET.get('limit', 500)), 5000)
+    except ValueError:
+        return JsonResponse({'error': 'Los parámetros since y limit deben ser enteros'}, status=400)
+    
+    modelos = [m for m in request.GET.get('modelos', '').split(',') if m]
+    desconocidos = [m for m in modelos if m not in MODELOS_SINCRONIZADOS]
+    if desconocidos:
+        return JsonResponse({'error': f'Modelos desconocidos: {", ".join(desconocidos)}'}, status=400)
+    
+    cambios, nuevo_cursor, hay_mas = cambios_desde(cursor, modelos, max(limite, 1))
+    
+    return JsonResponse({
+        'cursor': nuevo_cursor,
+        'hay_mas': hay_mas,
+        'cambios': cambios,
+    })
+
+def api_buscar(request, lista):
+    """Autocompletado de clientes y productos: ?q=prefijo del nombre"""
+    if lista not in BUSQUEDAS:
+        raise Http404('Lista desconocida')
+    filtros = {}
+    if lista == 'productos' and request.GET.get('disponibles'):
+        filtros['stock__gt'] = 0
+    return JsonResponse({'resultados': buscar(lista, request.GET.get('q', ''), **filtros)})
+
+@csrf_exempt
+@require_POST
+def api_ventas_lote(request):
+    """
+    Ventas capturadas sin conexión por las terminales, en lotes:
+    {"ventas": [{"clave", "producto", "cliente", "vendedor", "cantidad",
+    "metodo_pago", "fecha_venta", "notas"}, ...]}. Responde un resultado
+    por venta; reenviar el mismo lote no duplica nada. Sin CSRF porque las
+    terminales no tienen la cookie del sitio.
+    """
+    try:
+        cuerpo = json.loads(request.body)
+    except (ValueError, UnicodeDecodeError):
+        return JsonResponse({'error': 'El cuerpo debe ser JSON válido'}, status=400)
+    
+    ventas = cuerpo.get('ventas') if isinstance(cuerpo, dict) else None
+    if not isinstance(ventas, list):
+        return JsonResponse({'error': 'Falta la lista "ventas"'}, status=400)
+    if len(ventas) > MAX_VENTAS_LOTE:
+        return JsonResponse({'error': f'Máximo {MAX_VENTAS_LOTE} ventas por lote'}, status=400)
+    
+    resultados = registrar_ventas(ventas)
+    conteo = Counter(resultado['estado'] for resultado in resultados)
+    return JsonResponse({
+        'creadas': conteo['creada'],
+        'duplicadas': conteo['duplicada'],
+        'rechazadas': conteo['rechazada'],
+        'resultados': resultados,
+    })
+
+
+# ==================== EVENTOS EN VIVO ====================
+async def eventos_stream(request):
+    """
+    Server-Sent Events con cambios de stock y ventas nuevas.
+    Requiere un servidor ASGI de un solo proceso (EVENTOS_EN_VIVO): bajo
+    WSGI la respuesta nunca termina y ocupa un hilo del servidor. Si está
+    apagado responde 204, que hace que el navegador deje de reconectar.
+    """
+    if not settings.EVENTOS_EN_VIVO:
+        return HttpResponse(status=204)
+    tipos = [t for t in request.GET.get('tipos', '').split(',') if t]
+    
+    async def generar():
+        # La suscripción se crea en el loop que consume la respuesta
+        suscripcion = central.suscribir(tipos or None)
+        try:
+            yield 'retry: 5000\n\n'
+            while True:
+                evento = await suscripcion.siguiente(timeout=15)
+                if evento is None:
+                    # Comentario para mantener viva la conexión
+                    yield ': ping\n\n'
+                else:
+                    yield formato_sse(evento)
+        except SuscripcionCerrada:
+            return
+        finally:
+            suscripcion.cerrar()
+    
+    response = StreamingHttpResponse(generar(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
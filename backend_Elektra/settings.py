@@ -9,8 +9,10 @@ DEBUG = True
 
 ALLOWED_HOSTS = []
 
+# El admin es opcional: ELEKTRA_ADMIN=0 lo quita del arranque (workers, comandos)
+HABILITAR_ADMIN = os.environ.get('ELEKTRA_ADMIN', '1') != '0'
+
 INSTALLED_APPS = [
-    'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
     'django.contrib.sessions',
@@ -19,6 +21,9 @@ INSTALLED_APPS = [
     'app_Elektra',
 ]
 
+if HABILITAR_ADMIN:
+    INSTALLED_APPS.insert(0, 'django.contrib.admin')
+
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -27,6 +32,10 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    # Escribe en un solo INSERT la auditoría de cada petición
+    'app_Elektra.auditoria.middleware_auditoria',
+    # Repite desde memoria las consultas idénticas de una petición de lectura
+    'app_Elektra.cache_consultas.middleware_cache_consultas',
 ]
 
 ROOT_URLCONF = 'backend_Elektra.urls'
@@ -88,12 +97,43 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
-# Crear carpetas si no existen
-os.makedirs(MEDIA_ROOT, exist_ok=True)
-os.makedirs(os.path.join(MEDIA_ROOT, 'proveedores'), exist_ok=True)
-os.makedirs(os.path.join(MEDIA_ROOT, 'categorias'), exist_ok=True)
-os.makedirs(os.path.join(MEDIA_ROOT, 'productos'), exist_ok=True)
-os.makedirs(os.path.join(MEDIA_ROOT, 'vendedores'), exist_ok=True)
-os.makedirs(os.path.join(MEDIA_ROOT, 'clientes'), exist_ok=True)
+# Carpetas de imágenes: se crean una sola vez con
+# `python manage.py preparar_directorios` (el almacenamiento también las
+# crea al subir el primer archivo), no en cada importación de settings
+MEDIA_SUBCARPETAS = ['proveedores', 'categorias', 'productos', 'vendedores', 'clientes', 'reportes']
+
+DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# SNAPSHOTS DE REPORTES (JSON comprimido, fuera de MEDIA_ROOT)
+SNAPSHOTS_ROOT = os.path.join(BASE_DIR, 'snapshots')
+
+# ARCHIVO DE VENTAS: las ventas cerradas con más de estos días pasan a la
+# partición fría (`python manage.py archivar_ventas`). Debe cubrir más de un
+# año: el desempeño del año en curso solo lee ventas vigentes
+ARCHIVO_VENTAS_DIAS = 730
+
+
+# CACHÉ DE CONSULTAS POR PETICIÓN: en GET/HEAD las consultas idénticas se
+# responden desde memoria hasta la primera escritura (encabezado X-Cache-Consultas)
+CACHE_CONSULTAS = True
+
+
+# SUCURSALES CON BASE PROPIA: el stock y las ventas capturadas de cada
+# sucursal listada viven en su propia base SQLite, así las tiendas no
+# compiten por el candado de escritura de default (ver app_Elektra/router.py).
+# Código de sucursal -> alias en DATABASES, por ejemplo:
+#   DATABASES['sucursal_centro'] = {'ENGINE': 'django.db.backends.sqlite3', 'NAME': BASE_DIR / 'sucursal_centro.sqlite3'}
+#   SUCURSALES_BASES = {'CENTRO': 'sucursal_centro'}
+# y después `python manage.py migrate --database sucursal_centro`.
+# Vacío: todo en default
+SUCURSALES_BASES = {}
+DATABASE_ROUTERS = ['app_Elektra.router.RouterSucursales']
+
 
-DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
\ No newline at end of file
+# EVENTOS EN VIVO (Server-Sent Events del inicio y del listado de productos).
+# Solo con un servidor ASGI de un proceso, por ejemplo
+#   uvicorn backend_Elektra.asgi:application
+# Bajo WSGI (runserver, wsgi.py) cada pestaña abierta ocuparía un hilo para
+# siempre, y la central de eventos vive en memoria de un solo proceso
+# (ver app_Elektra/eventos.py). Apagado: las páginas no abren la conexión
+EVENTOS_EN_VIVO = False
@@ -14,16 +14,18 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
-from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 
 urlpatterns = [
-    path('admin/', admin.site.urls),
     path('', include('app_Elektra.urls')),
 ]
 
+if settings.HABILITAR_ADMIN:
+    from django.contrib import admin
+    urlpatterns.insert(0, path('admin/', admin.site.urls))
+
 # Solo en desarrollo: servir archivos media
 if settings.DEBUG:
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file